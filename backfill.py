@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Historical backfill of Brevo event exports into the handler pipeline
+
+Streams CSV or JSONL export files in chunks and parses the chunks in a
+process pool. Rows are mapped to the event names used by EVENT_HANDLERS or
+TRANSACTIONAL_EVENT_HANDLERS, and the results go straight to the app
+pipeline's dispatch_batch, skipping HTTP and signature checks. Progress is
+checkpointed after every chunk, so an interrupted run resumes where it stopped.
+
+    python backfill.py --app campaign exports/2024-*.csv
+    python backfill.py --app transactional --workers 8 events.jsonl
+"""
+import argparse
+import csv
+import importlib
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("backfill")
+
+APPS = {"campaign": "main", "transactional": "transactional_main"}
+
+# Export/API event names (normalized: lowercase, alphanumerics only) -> handler event names
+EVENT_ALIASES = {
+    "request": "sent", "requests": "sent", "sent": "sent",
+    "delivered": "delivered", "delivery": "delivered",
+    "opened": "opened", "open": "opened", "opens": "opened", "proxyopen": "opened",
+    "uniqueopened": "first_opening", "firstopening": "first_opening", "uniqueproxyopen": "first_opening",
+    "clicked": "clicked", "click": "clicked", "clicks": "clicked",
+    "hardbounce": "hard_bounced", "hardbounced": "hard_bounced", "hardbounces": "hard_bounced",
+    "softbounce": "soft_bounced", "softbounced": "soft_bounced", "softbounces": "soft_bounced",
+    "deferred": "soft_bounced",
+    "spam": "spam", "complaint": "spam", "spamreport": "spam",
+    "unsubscribe": "unsubscribe", "unsubscribed": "unsubscribed", "unsubscription": "unsubscribed",
+    "blocked": "blocked",
+    "invalid": "invalid_email", "invalidemail": "invalid_email",
+    "error": "error",
+}
+
+# Events named differently by the two apps
+APP_EVENT_FALLBACKS = {"unsubscribed": "unsubscribe", "unsubscribe": "unsubscribed", "first_opening": "opened"}
+
+# Export column names (normalized) -> handler payload fields
+FIELD_ALIASES = {
+    "email": "email", "recipient": "email", "emailaddress": "email",
+    "date": "timestamp", "ts": "timestamp", "timestamp": "timestamp", "eventdate": "timestamp",
+    "messageid": "message_id",
+    "campaignid": "campaign_id", "campid": "campaign_id",
+    "templateid": "template_id",
+    "link": "link_url", "url": "link_url", "linkurl": "link_url",
+    "ip": "ip_address", "ipaddress": "ip_address",
+    "useragent": "user_agent",
+    "subject": "subject",
+    "tag": "tags", "tags": "tags",
+    "errorcode": "error_code", "code": "error_code",
+}
+
+# Free-text "reason" column -> the field each handler logs
+REASON_FIELDS = {
+    "hard_bounced": "bounce_reason",
+    "soft_bounced": "bounce_reason",
+    "blocked": "block_reason",
+    "invalid_email": "error_reason",
+    "error": "error_message",
+    "spam": "reason",
+}
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def map_row(row: Dict[str, Any], supported: frozenset) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Translate one export row into an (event, data) pair for the target app"""
+    event = None
+    data: Dict[str, Any] = {}
+    reason = None
+    # Captured webhook bodies nest the payload under "data"
+    if isinstance(row.get("data"), dict):
+        row = {**row["data"], "event": row.get("event")}
+    for key, value in row.items():
+        if value in (None, ""):
+            continue
+        normalized = _normalize(key)
+        if normalized in ("event", "eventtype", "type", "status"):
+            event = EVENT_ALIASES.get(_normalize(value))
+        elif normalized == "reason":
+            reason = value
+        elif normalized in FIELD_ALIASES:
+            data[FIELD_ALIASES[normalized]] = value
+        else:
+            data[key] = value
+    if event not in supported:
+        event = APP_EVENT_FALLBACKS.get(event)
+        if event not in supported:
+            return None
+    if reason is not None:
+        data[REASON_FIELDS.get(event, "reason")] = reason
+    return event, data
+
+
+def parse_chunk(lines: List[bytes], fmt: str, header: Optional[List[str]], supported: frozenset) -> Tuple[List[Tuple[str, Dict[str, Any]]], int]:
+    """Parse and map one chunk of lines (runs in a worker process); returns (events, skipped rows)"""
+    rows: Iterator[Dict[str, Any]]
+    if fmt == "csv":
+        reader = csv.reader(io.StringIO(b"".join(lines).decode("utf-8", errors="replace")))
+        rows = (dict(zip(header or [], values)) for values in reader if values)
+    else:
+        rows = (json.loads(line) for line in lines if line.strip())
+    events: List[Tuple[str, Dict[str, Any]]] = []
+    skipped = 0
+    for row in rows:
+        mapped = map_row(row, supported)
+        if mapped is None:
+            skipped += 1
+        else:
+            events.append(mapped)
+    return events, skipped
+
+
+def read_chunks(path: str, start: int, chunk_bytes: int) -> Iterator[Tuple[List[bytes], int]]:
+    """Yield (lines, offset after the chunk) from start; one record per line"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        while True:
+            lines = f.readlines(chunk_bytes)
+            if not lines:
+                return
+            yield lines, f.tell()
+
+
+def read_header(path: str) -> Tuple[List[str], int]:
+    with open(path, "rb") as f:
+        line = f.readline()
+        header = next(csv.reader([line.decode("utf-8-sig")]))
+        return header, f.tell()
+
+
+class Checkpoint:
+    """Byte offset reached per file, rewritten atomically after every chunk"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.offsets = json.load(f)
+
+    def save(self, file: str, offset: int):
+        self.offsets[os.path.abspath(file)] = offset
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.offsets, f)
+        os.replace(tmp, self.path)
+
+    def get(self, file: str) -> int:
+        return self.offsets.get(os.path.abspath(file), 0)
+
+
+def run(args) -> Dict[str, Any]:
+    module_name = APPS[args.app]
+    pipeline = importlib.import_module(module_name).pipeline
+    for name in (module_name, "pipeline"):
+        logging.getLogger(name).setLevel(args.app_log_level)
+    supported = frozenset(pipeline.handlers)
+    checkpoint = Checkpoint(args.checkpoint)
+
+    dispatched = skipped = 0
+    started = last_report = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for path in args.files:
+            fmt = args.format or ("jsonl" if path.endswith((".jsonl", ".json", ".ndjson")) else "csv")
+            header: Optional[List[str]] = None
+            start = checkpoint.get(path)
+            if fmt == "csv":
+                header, data_start = read_header(path)
+                start = max(start, data_start)
+            logger.info("📂 Backfilling %s (%s) from byte %d", path, fmt, start)
+
+            # Keep a bounded number of chunks in flight and dispatch them in file order
+            in_flight: List[Tuple[Any, int]] = []
+            chunks = read_chunks(path, start, args.chunk_bytes)
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < args.workers * 2:
+                    try:
+                        lines, offset = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight.append((pool.submit(parse_chunk, lines, fmt, header, supported), offset))
+                if not in_flight:
+                    break
+                future, offset = in_flight.pop(0)
+                events, chunk_skipped = future.result()
+                dispatched += pipeline.dispatch_batch(events)
+                skipped += chunk_skipped
+                pipeline.flush_dispatch_stages()
+                checkpoint.save(path, offset)
+
+                now = time.perf_counter()
+                if now - last_report >= args.report_every:
+                    last_report = now
+                    logger.info("⏱️ %d rows dispatched, %.0f rows/sec", dispatched, dispatched / (now - started))
+
+    elapsed = time.perf_counter() - started
+    return {
+        "dispatched": dispatched,
+        "skipped": skipped,
+        "seconds": elapsed,
+        "rows_per_sec": dispatched / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill Brevo event exports into the webhook handlers")
+    parser.add_argument("files", nargs="+", help="CSV or JSONL export files, one record per line")
+    parser.add_argument("--app", choices=sorted(APPS), default="campaign")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--chunk-bytes", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--checkpoint", default="backfill.checkpoint.json")
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--app-log-level", default="WARNING", help="log level of the handlers during the backfill")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = run(args)
+    print(
+        f"✨ Backfill complete: {result['dispatched']} rows dispatched, {result['skipped']} skipped, "
+        f"{result['rows_per_sec']:.0f} rows/sec"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-record compression of webhook bodies: zlib, plain zstd, and zstd with per-type dictionaries
+
+The corpus is either synthetic bodies generated from the SAMPLE_PAYLOADS and
+TRANSACTIONAL_SAMPLE_PAYLOADS shapes with varied recipients, IDs,
+timestamps, user agents and links, or a captured file of webhook bodies, one
+JSON document per line. Dictionaries are trained on the first half of the
+corpus and measured on the second half. For each codec the benchmark reports
+the compression ratio and compress/decompress MB/s of raw body bytes.
+
+    python bench_compression.py                          # 50k synthetic bodies
+    python bench_compression.py --corpus captured.jsonl
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from payload_compression import DictionaryCompressor, zstandard
+from test_transactional_webhook import TRANSACTIONAL_SAMPLE_PAYLOADS
+from test_webhook import SAMPLE_PAYLOADS
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36",
+    "Microsoft Office/16.0 (Windows NT 10.0; Microsoft Outlook 16.0.17425; Pro)",
+    "Mozilla/5.0 (Windows NT 5.1; rv:11.0) Gecko Firefox/11.0 (via ggpht.com GoogleImageProxy)",
+]
+DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com", "example.org", "proton.me"]
+
+
+def synthetic_corpus(count: int, seed: int = 7) -> List[Tuple[str, bytes]]:
+    random.seed(seed)
+    shapes = list(SAMPLE_PAYLOADS.values()) + list(TRANSACTIONAL_SAMPLE_PAYLOADS.values())
+    start = datetime(2024, 5, 1)
+    corpus = []
+    for index in range(count):
+        payload = json.loads(json.dumps(random.choice(shapes)))
+        data = payload["data"]
+        data["email"] = f"user{random.randint(1, 200000)}@{random.choice(DOMAINS)}"
+        data["timestamp"] = (start + timedelta(seconds=index * 3 + random.randint(0, 2))).isoformat()
+        if "campaign_id" in data:
+            data["campaign_id"] = str(random.randint(1000, 1040))
+        if "message_id" in data:
+            data["message_id"] = f"<{random.getrandbits(64):016x}.{index}@smtp-relay.mailin.fr>"
+        if "template_id" in data:
+            data["template_id"] = f"template_{random.randint(1, 30):03d}"
+        if "user_agent" in data:
+            data["user_agent"] = random.choice(USER_AGENTS)
+        if "ip_address" in data:
+            data["ip_address"] = f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+        if "link_url" in data:
+            data["link_url"] = f"https://shop.example.com/{random.choice(['product', 'cart', 'promo'])}/{random.randint(1, 500)}?utm_source=brevo&utm_medium=email&utm_campaign={data.get('campaign_id', 'tx')}"
+        corpus.append((payload["event"], json.dumps(payload).encode()))
+    return corpus
+
+
+def captured_corpus(path: str) -> List[Tuple[str, bytes]]:
+    corpus = []
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                corpus.append((str(json.loads(line).get("event")), line.rstrip(b"\n")))
+    return corpus
+
+
+def measure(name: str, records: List[Tuple[str, bytes]], compress: Callable, decompress: Callable) -> Dict[str, float]:
+    raw = sum(len(body) for _, body in records)
+    started = time.perf_counter()
+    frames = [compress(event, body) for event, body in records]
+    compress_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for frame in frames:
+        decompress(frame)
+    decompress_seconds = time.perf_counter() - started
+    stored = sum(len(frame[1]) for frame in frames)
+    return {
+        "codec": name,
+        "ratio": raw / stored,
+        "bytes_per_record": stored / len(records),
+        "compress_mb_s": raw / compress_seconds / 1e6,
+        "decompress_mb_s": raw / decompress_seconds / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-record compression of webhook bodies")
+    parser.add_argument("--corpus", help="captured webhook bodies, one JSON document per line")
+    parser.add_argument("--records", type=int, default=50_000, help="synthetic corpus size")
+    parser.add_argument("--level", type=int, default=3)
+    parser.add_argument("--dict-size", type=int, default=16 * 1024)
+    args = parser.parse_args()
+
+    if zstandard is None:
+        raise SystemExit("❌ bench_compression.py needs the zstandard package: pip install zstandard")
+    corpus = captured_corpus(args.corpus) if args.corpus else synthetic_corpus(args.records)
+    training, records = corpus[: len(corpus) // 2], corpus[len(corpus) // 2:]
+    raw = sum(len(body) for _, body in records)
+    print(f"📦 {len(records)} records, {raw / len(records):.0f} bytes/record on average, {len({e for e, _ in corpus})} event types")
+
+    plain_compressor = zstandard.ZstdCompressor(level=args.level)
+    plain_decompressor = zstandard.ZstdDecompressor()
+    with tempfile.TemporaryDirectory() as directory:
+        trained = DictionaryCompressor(directory, level=args.level, dict_size=args.dict_size, min_samples=50, samples_per_type=len(training))
+        started = time.perf_counter()
+        for event, body in training:
+            trained.compress(event, body)
+        for event in {event for event, _ in training}:
+            trained.train(event)
+        training_seconds = time.perf_counter() - started
+
+        results = [
+            measure("zlib", records, lambda e, b: (0, zlib.compress(b, 6)), lambda f: zlib.decompress(f[1])),
+            measure("zstd", records, lambda e, b: (0, plain_compressor.compress(b)), lambda f: plain_decompressor.decompress(f[1])),
+            measure("zstd+dict", records, trained.compress, lambda f: trained.decompress(*f)),
+        ]
+    print(f"🧠 Trained {len(trained.stats()['dictionaries'])} dictionaries in {training_seconds:.2f}s")
+    print(f"{'codec':<10} {'ratio':>7} {'bytes/rec':>10} {'comp MB/s':>10} {'decomp MB/s':>12}")
+    for result in results:
+        print(
+            f"{result['codec']:<10} {result['ratio']:>7.2f} {result['bytes_per_record']:>10.1f} "
+            f"{result['compress_mb_s']:>10.1f} {result['decompress_mb_s']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
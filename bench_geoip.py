@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark GeoIP lookups across several worker processes sharing one mmap'd database
+
+Reports lookups/sec per worker, with and without the per-worker LRU, and RSS
+per worker split into file-backed (shared page cache) and anonymous memory.
+
+    python bench_geoip.py                      # synthetic database with 1M ranges
+    python bench_geoip.py --db geo.db --workers 8
+"""
+import argparse
+import ipaddress
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from typing import Dict
+
+from geoip import GeoDatabase, build
+
+
+def rss_kb() -> Dict[str, int]:
+    """RSS of this process from /proc, split into file-backed and anonymous pages"""
+    fields = {"VmRSS": 0, "RssFile": 0, "RssAnon": 0}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    fields[name] = int(value.split()[0])
+    except OSError:
+        import resource
+        fields["VmRSS"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return fields
+
+
+def synthetic_database(path: str, ranges: int):
+    """Contiguous IPv4 ranges covering the address space, with a few hundred AS orgs"""
+    step = (2 ** 32) // ranges
+    rows = []
+    for index in range(ranges):
+        start = index * step
+        rows.append((
+            str(ipaddress.IPv4Address(start)),
+            str(ipaddress.IPv4Address(start + step - 1)),
+            random.choice(["US", "DE", "FR", "GB", "IN", "BR", "JP"]),
+            64512 + index % 500,
+            f"AS-ORG-{index % 500}",
+        ))
+    build(rows, path)
+
+
+def worker(path: str, lookups: int, distinct: int, seed: int, results):
+    random.seed(seed)
+    database = GeoDatabase(path)
+    pool = [str(ipaddress.IPv4Address(random.getrandbits(32))) for _ in range(distinct)]
+    ips = [random.choice(pool) for _ in range(lookups)]
+
+    started = time.perf_counter()
+    for ip in ips:
+        database._lookup(ip)
+    uncached = lookups / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for ip in ips:
+        database.lookup(ip)
+    cached = lookups / (time.perf_counter() - started)
+
+    results.put({"pid": os.getpid(), "uncached": uncached, "cached": cached, "rss": rss_kb()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GeoIP lookup benchmark")
+    parser.add_argument("--db", help="GEO1 database (a synthetic one is built when omitted)")
+    parser.add_argument("--ranges", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=20_000, help="distinct IPs, i.e. how often the LRU hits")
+    args = parser.parse_args()
+
+    path = args.db
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "geo.db")
+        print(f"🔧 Building synthetic database with {args.ranges} ranges...")
+        synthetic_database(path, args.ranges)
+    print(f"📦 Database: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, args.lookups, args.distinct, seed, results))
+        for seed in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    print(f"{'pid':>8} {'uncached/s':>12} {'cached/s':>12} {'RSS MB':>8} {'file MB':>8} {'anon MB':>8}")
+    for report in reports:
+        rss = report["rss"]
+        print(
+            f"{report['pid']:>8} {report['uncached']:>12,.0f} {report['cached']:>12,.0f} "
+            f"{rss['VmRSS'] / 1024:>8.1f} {rss['RssFile'] / 1024:>8.1f} {rss['RssAnon'] / 1024:>8.1f}"
+        )
+    total = sum(report["uncached"] for report in reports)
+    print(f"✨ {total:,.0f} uncached lookups/sec across {len(reports)} workers")
+
+
+if __name__ == "__main__":
+    main()
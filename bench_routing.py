@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark routing rule matching against rule count: compiled bitset index vs. a linear scan
+
+For each rule count, random rules are generated over event types, recipient
+domains, campaign/template IDs, error codes and tags. They are matched
+against a stream of random events, and every result is checked against a
+first-match linear scan of the same rules. The compiled index should stay
+roughly flat as the rule count grows; the scan grows with it.
+
+    python bench_routing.py                       # 100, 1000, 5000 and 10000 rules
+    python bench_routing.py --rules 20000 --events 50000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from heavy_hitters import recipient_domain
+from routing_rules import RoutingRules
+
+EVENTS = ["delivered", "opened", "clicked", "soft_bounced", "hard_bounced", "spam", "blocked", "unsubscribed"]
+DOMAINS = [f"domain{index}.com" for index in range(500)] + ["gmail.com", "yahoo.com", "outlook.com"]
+TAGS = [f"tag{index}" for index in range(50)]
+ERROR_CODES = [421, 450, 451, 452, 550, 551, 552, 553, 554]
+
+
+def random_rule(index: int) -> Dict[str, Any]:
+    match: Dict[str, Any] = {}
+    fields = random.sample(["domain", "campaign_id", "template_id", "error_code", "tags"], random.randint(1, 3))
+    for field in fields:
+        if field == "domain":
+            match[field] = random.choice(DOMAINS)
+        elif field == "campaign_id":
+            match[field] = [str(random.randint(1, 5000)) for _ in range(random.randint(1, 3))]
+        elif field == "template_id":
+            match[field] = f"template_{random.randint(1, 2000)}"
+        elif field == "error_code":
+            match[field] = random.choice(ERROR_CODES)
+        else:
+            match[field] = random.choice(TAGS)
+    rule: Dict[str, Any] = {"name": f"rule{index}", "match": match, "action": random.choice(["drop", "sink"])}
+    if rule["action"] == "sink":
+        rule["sinks"] = ["event_store"]
+    if random.random() < 0.8:
+        rule["events"] = random.sample(EVENTS, random.randint(1, 2))
+    return rule
+
+
+def random_event() -> Dict[str, Any]:
+    data: Dict[str, Any] = {
+        "email": f"user{random.randint(1, 100000)}@{random.choice(DOMAINS)}",
+        "campaign_id": str(random.randint(1, 5000)),
+        "template_id": f"template_{random.randint(1, 2000)}",
+        "tags": random.sample(TAGS, random.randint(0, 2)),
+    }
+    if random.random() < 0.3:
+        data["error_code"] = random.choice(ERROR_CODES)
+    return {"event": random.choice(EVENTS), "data": data}
+
+
+def linear_match(rules: List[Dict[str, Any]], event: str, data: Dict[str, Any]) -> Optional[int]:
+    """Reference first-match evaluation, rule by rule"""
+    for position, rule in enumerate(rules):
+        if rule.get("events") is not None and event not in rule["events"]:
+            continue
+        for field, wanted in rule["match"].items():
+            wanted = {str(value).lower() if field == "domain" else str(value) for value in (wanted if isinstance(wanted, list) else [wanted])}
+            value = recipient_domain(data.get("email")) if field == "domain" else data.get(field)
+            values = value if isinstance(value, list) else ([] if value is None else [value])
+            if not any(str(element) in wanted for element in values):
+                break
+        else:
+            return position
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare compiled routing rules with a linear scan")
+    parser.add_argument("--rules", default="100,1000,5000,10000", help="comma-separated rule counts")
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--linear-events", type=int, default=2_000, help="events timed with the linear scan")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    events = [random_event() for _ in range(args.events)]
+    print(f"{'rules':>7} {'compile ms':>11} {'compiled us/event':>18} {'linear us/event':>16} {'matched':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.json")
+        for count in (int(value) for value in args.rules.split(",")):
+            rules = [random_rule(index) for index in range(count)]
+            with open(path, "w") as f:
+                json.dump({"rules": rules}, f)
+            started = time.perf_counter()
+            routing = RoutingRules(path, reload_interval=3600)
+            compile_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            results = [routing.match(event["event"], event["data"]) for event in events]
+            compiled_us = (time.perf_counter() - started) / len(events) * 1e6
+
+            sample = events[: args.linear_events]
+            started = time.perf_counter()
+            expected = [linear_match(rules, event["event"], event["data"]) for event in sample]
+            linear_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+            for event, rule, position in zip(sample, results, expected):
+                got = int(rule.name[4:]) if rule is not None else None
+                if got != position:
+                    raise SystemExit(f"❌ Mismatch for {event}: compiled {got}, linear {position}")
+            matched = sum(rule is not None for rule in results) / len(results)
+            print(f"{count:>7} {compile_ms:>11.1f} {compiled_us:>18.2f} {linear_us:>16.2f} {matched:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark of the webhook apps, with a regression gate for CI
+
+Each run is a fresh interpreter that imports the app, runs its startup
+handlers and sends one signed webhook straight through the ASGI app (no
+server or HTTP client imports are added to the measurement). It reports:
+
+- import_ms:         importing the app module
+- first_webhook_ms:  interpreter ready -> first 200 response to a signed webhook
+- idle_rss_mb:       resident memory after the first webhook and a short idle
+
+Every run also measures a reference interpreter that only imports fastapi,
+so the baseline holds machine-independent numbers: timings as a ratio to the
+reference import time and RSS as megabytes above the reference RSS. The
+medians over ``--runs`` are turned back into this machine's terms with the
+reference of the same run. Any metric above ``expected * (1 + tolerance) +
+slack`` fails the run with exit code 1.
+
+    python bench_startup.py                      # compare with bench_startup.json
+    python bench_startup.py --save-baseline      # record a new baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+APPS = {
+    "campaign": ("main", "/webhook/brevo", "BREVO_WEBHOOK_SECRET"),
+    "transactional": ("transactional_main", "/webhook/brevo/transactional", "BREVO_TRANSACTIONAL_WEBHOOK_SECRET"),
+}
+SECRET = "bench-startup-secret"
+METRICS = ("import_ms", "first_webhook_ms", "idle_rss_mb")
+REFERENCE = "reference"
+
+# Runs in a fresh interpreter; only stdlib imports happen before the app's own
+CHILD = r"""
+import time
+started = time.perf_counter()
+import asyncio, hashlib, hmac, importlib, json, sys
+
+module_name, path, secret, idle = sys.argv[1], sys.argv[2], sys.argv[3].encode(), float(sys.argv[4])
+module = importlib.import_module(module_name)
+imported = time.perf_counter()
+
+body = json.dumps({"event": "delivered", "data": {"email": "bench@example.com", "message_id": "<bench@example.com>",
+                   "campaign_id": "1", "timestamp": "2024-05-01T00:00:00Z"}}).encode()
+signature = hmac.new(secret, body, hashlib.sha256).hexdigest()
+
+async def post():
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response = {}
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.sleep(3600)
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"x-brevo-signature", signature.encode()),
+                    (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 3000),
+    }
+    await module.app(scope, receive, send)
+    return response.get("status")
+
+async def main():
+    await module.app.router.startup()
+    status = await post()
+    first_webhook = time.perf_counter()
+    if status != 200:
+        raise SystemExit(f"first webhook answered {status}")
+    await asyncio.sleep(idle)
+    rss_kb = 0
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+    await module.app.router.shutdown()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "first_webhook_ms": (first_webhook - started) * 1000,
+        "idle_rss_mb": rss_kb / 1024,
+    }))
+
+asyncio.run(main())
+"""
+
+# The framework alone, measured the same way: the yardstick the baseline is relative to
+REFERENCE_CHILD = r"""
+import time
+started = time.perf_counter()
+import asyncio, json, sys
+import fastapi
+imported = time.perf_counter()
+time.sleep(float(sys.argv[1]))
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print(json.dumps({"import_ms": (imported - started) * 1000, "idle_rss_mb": rss_kb / 1024}))
+"""
+
+
+def run_once(app: str, idle: float) -> Dict[str, float]:
+    if app == REFERENCE:
+        argv, env = [REFERENCE_CHILD, str(idle)], dict(os.environ)
+    else:
+        module, path, secret_variable = APPS[app]
+        argv, env = [CHILD, module, path, SECRET, str(idle)], dict(os.environ, **{secret_variable: SECRET})
+    result = subprocess.run(
+        [sys.executable, "-c", *argv],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"❌ {app} cold start failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def relative(result: Dict[str, float], reference: Dict[str, float]) -> Dict[str, float]:
+    """Timings as a ratio to the reference import, RSS as MB above the reference"""
+    return {
+        metric: value - reference["idle_rss_mb"] if metric.endswith("_mb") else value / reference["import_ms"]
+        for metric, value in result.items()
+    }
+
+
+def measure(apps: List[str], runs: int, idle: float) -> Tuple[Dict[str, Dict[str, float]], Dict[str, Dict[str, float]]]:
+    """Medians of the raw metrics and of the metrics relative to the reference run next to them"""
+    samples: Dict[str, List[Dict[str, float]]] = {app: [] for app in [REFERENCE, *apps]}
+    paired: Dict[str, List[Dict[str, float]]] = {app: [] for app in apps}
+    for _ in range(runs):
+        # Each reference run is paired with the app runs right after it, so machine drift cancels out
+        reference = run_once(REFERENCE, idle)
+        samples[REFERENCE].append(reference)
+        for app in apps:
+            result = run_once(app, idle)
+            samples[app].append(result)
+            paired[app].append(relative(result, reference))
+
+    def medians(rows: List[Dict[str, float]]) -> Dict[str, float]:
+        return {metric: statistics.median(row[metric] for row in rows) for metric in rows[0]}
+
+    return {app: medians(rows) for app, rows in samples.items()}, {app: medians(rows) for app, rows in paired.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start of the webhook apps and compare with a baseline")
+    parser.add_argument("--apps", default="campaign,transactional")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--idle", type=float, default=1.0, help="seconds idle before reading RSS")
+    parser.add_argument("--baseline", default="bench_startup.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=30.0, help="allowed absolute regression of the timings")
+    parser.add_argument("--slack-mb", type=float, default=5.0, help="allowed absolute regression of RSS")
+    args = parser.parse_args()
+
+    results, relatives = measure(args.apps.split(","), args.runs, args.idle)
+    reference = results.pop(REFERENCE)
+    print(f"📏 {'fastapi':<13} import {reference['import_ms']:7.1f} ms | idle RSS {reference['idle_rss_mb']:6.1f} MB (reference)")
+    for app, result in results.items():
+        print(
+            f"🚀 {app:<13} import {result['import_ms']:7.1f} ms | first webhook {result['first_webhook_ms']:7.1f} ms "
+            f"| idle RSS {result['idle_rss_mb']:6.1f} MB"
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {app: {metric: round(value, 3) for metric, value in result.items()} for app, result in relatives.items()},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"💾 Saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = []
+    for app, result in relatives.items():
+        for metric in METRICS:
+            expected = baseline.get(app, {}).get(metric)
+            if expected is None:
+                continue
+            if metric.endswith("_mb"):
+                limit, unit, scale = expected * (1 + args.tolerance) + args.slack_mb, "MB above the reference", 1.0
+            else:
+                # The absolute slack is converted to this machine's reference import time
+                scale = reference["import_ms"]
+                limit, unit = expected * (1 + args.tolerance) + args.slack_ms / scale, "x the reference import"
+            if result[metric] > limit:
+                regressions.append(
+                    f"{app} {metric}: {result[metric]:.2f} > {limit:.2f} {unit} "
+                    f"(baseline {expected:.2f}, ~{(result[metric] - expected) * scale:.1f} over)"
+                )
+    if regressions:
+        print("❌ Cold start regressed:\n  " + "\n  ".join(regressions))
+        return 1
+    print("✅ Cold start within the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Soft-bounce escalation: "N soft bounces within D days" for any number of recipients
+
+Every soft bounce is added to a count-min sketch with forward exponential
+decay: a bounce weighs 1 when it happens and less as it ages. An address
+escalates when its decayed count reaches N - 0.5. The half-life is chosen from
+N and D so that N bounces within D days always get there, while N - 1 bounces
+never can. N bounces spread over somewhat more than D days may also escalate;
+that is the price of O(1) decay instead of a per-address window.
+
+The sketch has a fixed size no matter how many addresses bounce. Each update
+touches one cell per row and uses conservative update, so collisions inflate
+the counts as little as possible. The sketch never undercounts.
+
+An address whose sketch estimate reaches ``promote_at`` moves into a small
+exact table, which from then on counts its bounces exactly. Its earlier
+bounces are carried over from the sketch, clipped to ``promote_at - 1``, so
+collisions can add at most that many. The exact count decides escalation:
+crossing the threshold emits one escalation event per address until its
+count decays below the threshold again.
+
+Snapshots hold the sketch cells and the exact table in one file, written
+atomically, so a restart keeps counting where it left off.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import struct
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_HEADER = struct.Struct(">4sIIdd")
+SNAPSHOT_MAGIC = b"CMS1"
+# Cells hold weights scaled by 2 ** (age of the landmark in half-lives); rescale before float32 overflows
+RESCALE_AFTER = 64.0
+
+
+def _event_time(data: Dict[str, Any], now: float) -> float:
+    """Epoch seconds of the event's own timestamp, never later than now"""
+    timestamp = data.get("timestamp")
+    if timestamp is None:
+        return now
+    try:
+        return min(now, datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return now
+
+
+class BounceTracker:
+    """Decayed soft-bounce counts per email: count-min sketch, exact confirmation table, escalation callback"""
+
+    def __init__(
+        self,
+        threshold: int = 3,
+        window_days: float = 7.0,
+        width: int = 1 << 21,
+        depth: int = 4,
+        promote_at: Optional[int] = None,
+        exact_capacity: int = 100_000,
+        escalate: Optional[Callable[[Dict[str, Any]], None]] = None,
+        snapshot_path: Optional[str] = None,
+    ):
+        self.threshold = threshold
+        self.window = window_days * 86400
+        # N bounces within the window weigh at least 1 + (N - 1) * 2 ** (-window / half_life) >= N - 0.5
+        self.half_life = self.window if threshold < 2 else self.window / -math.log2((threshold - 1.5) / (threshold - 1))
+        self.level = threshold - 0.5
+        self.width = width
+        self.depth = depth
+        self.promote_at = promote_at if promote_at is not None else max(1, threshold - 1)
+        self.exact_capacity = exact_capacity
+        self.escalate = escalate
+        self.snapshot_path = snapshot_path
+        self._cells = array("f", bytes(4 * width * depth))
+        self.landmark = time.time()
+        # email -> [weight scaled to updated_at, updated_at, escalated]
+        self._exact: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self.observed = 0
+        self.promoted = 0
+        self.escalations = 0
+        if snapshot_path:
+            os.makedirs(os.path.dirname(snapshot_path) or ".", exist_ok=True)
+            if os.path.exists(snapshot_path):
+                self._load(snapshot_path)
+
+    def _slots(self, email: str) -> List[int]:
+        """One cell index per row, from two halves of a single hash"""
+        digest = hashlib.blake2b(email.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [row * self.width + (first + row * second) % self.width for row in range(self.depth)]
+
+    def _scale(self, at: float) -> float:
+        return 2.0 ** ((at - self.landmark) / self.half_life)
+
+    def _rescale(self, now: float):
+        """Move the landmark to now; O(cells), once every RESCALE_AFTER half-lives"""
+        factor = 1.0 / self._scale(now)
+        self._cells = array("f", (cell * factor for cell in self._cells))
+        self.landmark = now
+
+    def estimate(self, email: str, now: Optional[float] = None) -> float:
+        """Upper bound of the decayed soft-bounce count of an email"""
+        if now is None:
+            now = time.time()
+        cells = self._cells
+        return min(cells[slot] for slot in self._slots(email.strip().lower())) / self._scale(now)
+
+    def observe(self, event: str, data: Dict[str, Any], now: Optional[float] = None):
+        if event != "soft_bounced":
+            return
+        email = data.get("email")
+        if not isinstance(email, str) or not email:
+            return
+        email = email.strip().lower()
+        if now is None:
+            now = time.time()
+        at = _event_time(data, now)
+        if (now - self.landmark) / self.half_life > RESCALE_AFTER:
+            self._rescale(now)
+        self.observed += 1
+
+        # Conservative update: raise each cell only as far as the new minimum needs
+        cells, slots = self._cells, self._slots(email)
+        before = min(cells[slot] for slot in slots)
+        after = before + self._scale(at)
+        for slot in slots:
+            if cells[slot] < after:
+                cells[slot] = after
+        scale_now = self._scale(now)
+
+        entry = self._exact.get(email)
+        if entry is None:
+            if after / scale_now < self.promote_at - 0.5:
+                return
+            # Earlier bounces come from the sketch, clipped so collisions alone cannot escalate
+            prior = min(before / scale_now, self.promote_at - 1)
+            entry = self._exact[email] = [prior, now, False]
+            self.promoted += 1
+            if len(self._exact) > self.exact_capacity:
+                self._exact.popitem(last=False)
+        else:
+            self._exact.move_to_end(email)
+            entry[0] *= 2.0 ** ((entry[1] - now) / self.half_life)
+            entry[1] = now
+        entry[0] += 2.0 ** ((at - now) / self.half_life)
+
+        if entry[0] < self.level:
+            entry[2] = False
+        elif not entry[2]:
+            entry[2] = True
+            self.escalations += 1
+            escalation = {
+                "email": email,
+                "soft_bounces": round(entry[0], 3),
+                "threshold": self.threshold,
+                "window_days": self.window / 86400,
+                "timestamp": now,
+            }
+            for field in ("campaign_id", "template_id", "message_id", "bounce_reason", "error_code"):
+                if data.get(field) is not None:
+                    escalation[field] = data[field]
+            logger.warning("🚫 Soft-bounce escalation for %s: %.2f soft bounces", email, entry[0])
+            if self.escalate is not None:
+                try:
+                    self.escalate(escalation)
+                except Exception as e:
+                    logger.error("❌ Soft-bounce escalation callback failed: %s", str(e))
+
+    def lookup(self, email: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Sketch estimate and, for candidates, the exact decayed count of one email"""
+        if now is None:
+            now = time.time()
+        email = email.strip().lower()
+        result: Dict[str, Any] = {"email": email, "estimate": self.estimate(email, now), "threshold": self.threshold}
+        entry = self._exact.get(email)
+        if entry is not None:
+            result["exact"] = entry[0] * 2.0 ** ((entry[1] - now) / self.half_life)
+            result["escalated"] = entry[2]
+        return result
+
+    def snapshot_bytes(self) -> bytes:
+        """Serialized state; cheap enough to take under the dispatch lock, write elsewhere"""
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.width, self.depth, self.landmark, self.half_life)
+        return header + self._cells.tobytes() + json.dumps(self._exact, separators=(",", ":")).encode()
+
+    def write_snapshot(self, state: bytes):
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(state)
+        os.replace(tmp, self.snapshot_path)
+
+    def _load(self, path: str):
+        with open(path, "rb") as f:
+            state = f.read()
+        magic, width, depth, landmark, half_life = SNAPSHOT_HEADER.unpack_from(state)
+        if magic != SNAPSHOT_MAGIC or (width, depth) != (self.width, self.depth):
+            logger.warning("⚠️ Ignoring soft-bounce snapshot %s: written with a different sketch size", path)
+            return
+        end = SNAPSHOT_HEADER.size + 4 * width * depth
+        self._cells = array("f")
+        self._cells.frombytes(state[SNAPSHOT_HEADER.size:end])
+        self.landmark = landmark
+        if not math.isclose(half_life, self.half_life):
+            # Keep the counts; the new decay applies from the landmark on
+            logger.info("🔁 Soft-bounce half-life changed from %.1f to %.1f days", half_life / 86400, self.half_life / 86400)
+        self._exact = OrderedDict(json.loads(state[end:]))
+        logger.info("📥 Loaded soft-bounce snapshot with %d exact entries", len(self._exact))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "observed": self.observed,
+            "candidates": len(self._exact),
+            "promoted": self.promoted,
+            "escalations": self.escalations,
+            "sketch_bytes": self._cells.itemsize * len(self._cells),
+        }
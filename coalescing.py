@@ -0,0 +1,191 @@
+"""
+Per-recipient coalescing of repeated high-volume events (opens, clicks)
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from response_cache import ReadinessSignals
+
+logger = logging.getLogger(__name__)
+
+CoalesceKey = Tuple[Any, Any, Any, str]
+
+
+def parse_windows(spec: str) -> Dict[str, float]:
+    """Parse "opened=5,clicked=2.5" into {"opened": 5.0, "clicked": 2.5}"""
+    windows: Dict[str, float] = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        event, _, seconds = part.partition("=")
+        windows[event.strip()] = float(seconds)
+    return windows
+
+
+class HashedTimingWheel:
+    """Hashed timing wheel whose span covers the longest delay, so a tick only touches expired keys"""
+
+    def __init__(self, tick: float, max_delay: float, now: Optional[float] = None):
+        self.tick = tick
+        self._slots = int(math.ceil(max_delay / tick)) + 2
+        self._buckets: List[Dict[Hashable, float]] = [{} for _ in range(self._slots)]
+        self._origin = time.monotonic() if now is None else now
+        self._cursor = 0  # next tick index to expire
+
+    def _tick_index(self, when: float) -> int:
+        return int((when - self._origin) / self.tick)
+
+    def schedule(self, key: Hashable, delay: float, now: float):
+        """Schedule key to expire delay seconds after now"""
+        self._insert(key, now + delay)
+
+    def _insert(self, key: Hashable, deadline: float):
+        index = max(self._tick_index(deadline) + 1, self._cursor)
+        self._buckets[index % self._slots][key] = deadline
+
+    def advance(self, now: float) -> List[Tuple[Hashable, float]]:
+        """Pop every (key, deadline) whose deadline is at or before now"""
+        expired: List[Tuple[Hashable, float]] = []
+        early: List[Tuple[Hashable, float]] = []
+        target = self._tick_index(now)
+        # Never sweep more than one revolution; later ticks map to the same buckets
+        start = max(self._cursor, target - self._slots + 1)
+        for index in range(start, target + 1):
+            bucket = self._buckets[index % self._slots]
+            if bucket:
+                for key, deadline in bucket.items():
+                    # Keys scheduled while the wheel lagged a full revolution behind
+                    if deadline > now:
+                        early.append((key, deadline))
+                    else:
+                        expired.append((key, deadline))
+                bucket.clear()
+        self._cursor = max(self._cursor, target + 1)
+        for key, deadline in early:
+            self._insert(key, deadline)
+        return expired
+
+    def drain(self) -> List[Hashable]:
+        """Pop every scheduled key regardless of deadline"""
+        expired: List[Hashable] = []
+        for bucket in self._buckets:
+            expired.extend(bucket)
+            bucket.clear()
+        return expired
+
+
+class EventCoalescer:
+    """Collapses repeats of (tenant, campaign_id, email, event) inside a per-event window into one record"""
+
+    def __init__(
+        self,
+        windows: Dict[str, float],
+        emit: Callable[[str, Dict[str, Any]], None],
+        group_field: str = "campaign_id",
+        tick: float = 0.1,
+        signals: Optional[ReadinessSignals] = None,
+    ):
+        self.windows = windows
+        self.emit = emit
+        self.group_field = group_field
+        self.signals = signals
+        self.absorbed = 0
+        self.emitted = 0
+        self._records: Dict[CoalesceKey, Dict[str, Any]] = {}
+        # (tenant, group, email) -> keys of its pending records, in arrival order
+        self._held: Dict[Tuple[Any, Any, Any], List[CoalesceKey]] = {}
+        self._wheel = HashedTimingWheel(tick, max(windows.values(), default=tick))
+
+    @property
+    def pending(self) -> int:
+        return len(self._records)
+
+    def offer(self, event: str, data: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Take ownership of the event if its type is coalesced; returns False otherwise
+
+        Any other event first emits the records held for the same recipient and
+        group, so it never overtakes an earlier open or click.
+        """
+        recipient = (data.get("tenant_id"), data.get(self.group_field), data.get("email"))
+        window = self.windows.get(event)
+        if window is None:
+            held = self._held.pop(recipient, None)
+            if held:
+                self._emit(held)
+            return False
+        if now is None:
+            now = time.monotonic()
+        timestamp = data.get("timestamp") or datetime.now().isoformat()
+        key = recipient + (event,)
+        record = self._records.get(key)
+        if record is None:
+            self._held.setdefault(recipient, []).append(key)
+            self._records[key] = {
+                "event": event,
+                "deadline": now + window,
+                "data": data,
+                "count": 1,
+                "first_timestamp": timestamp,
+                "last_timestamp": timestamp,
+            }
+            self._wheel.schedule(key, window, now)
+            if self.signals is not None:
+                self.signals.adjust_depth(1)
+        else:
+            record["count"] += 1
+            record["last_timestamp"] = timestamp
+            self.absorbed += 1
+        return True
+
+    def _emit(self, keys: List[CoalesceKey]) -> int:
+        emitted = 0
+        for key in keys:
+            record = self._records.pop(key, None)
+            if record is None:
+                continue
+            held = self._held.get(key[:3])
+            if held is not None and key in held:
+                held.remove(key)
+                if not held:
+                    del self._held[key[:3]]
+            emitted += 1
+            if self.signals is not None:
+                self.signals.adjust_depth(-1)
+            data = dict(record["data"])
+            data["count"] = record["count"]
+            data["first_timestamp"] = record["first_timestamp"]
+            data["last_timestamp"] = record["last_timestamp"]
+            self.emitted += 1
+            try:
+                self.emit(record["event"], data)
+            except Exception as e:
+                logger.error("❌ Error emitting coalesced %s event: %s", record["event"], str(e))
+        return emitted
+
+    def flush_expired(self, now: Optional[float] = None) -> int:
+        """Emit every record whose window has closed"""
+        expired = self._wheel.advance(time.monotonic() if now is None else now)
+        # Keys flushed early by a later event stay on the wheel; a record opened
+        # again since then has a later deadline and waits for its own entry
+        return self._emit([
+            key for key, deadline in expired
+            if key in self._records and self._records[key]["deadline"] == deadline
+        ])
+
+    def flush_all(self) -> int:
+        """Emit every pending record, e.g. on shutdown"""
+        return self._emit(self._wheel.drain())
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": self.pending, "absorbed": self.absorbed, "emitted": self.emitted}
+
+    async def run(self):
+        """Flush expired windows once per tick until cancelled"""
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            self.flush_expired()
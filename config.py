@@ -0,0 +1,55 @@
+"""
+Settings shared by the campaign and transactional webhook apps and the router
+
+The environment (and .env) is read once, when this module is first imported;
+every app in the process reuses the same parsed values. Settings that differ
+per app (port, webhook secret, shed events) stay in the app modules.
+"""
+import os
+
+from dotenv import load_dotenv
+
+from coalescing import parse_windows
+from deliverability import parse_thresholds
+from rate_limit import parse_rate
+
+# Load environment variables
+load_dotenv()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+RELOAD = os.getenv("RELOAD", "false").lower() == "true"  # `python main.py` auto-reload, for development
+HANDLER_PLUGINS = os.getenv("HANDLER_PLUGINS", "false").lower() == "true"  # load handlers from installed entry points
+
+HEALTH_MAX_QUEUE_DEPTH = int(os.getenv("HEALTH_MAX_QUEUE_DEPTH", 0))  # 0 disables the readiness check
+TENANTS_FILE = os.getenv("TENANTS_FILE", "")  # JSON tenant registry; empty runs single-tenant
+SOURCE_RATE_LIMIT = parse_rate(os.getenv("SOURCE_RATE_LIMIT", ""))  # "rate,burst" per source IP; empty disables
+SHED_TARGET_MS = float(os.getenv("SHED_TARGET_MS", 20))
+SHED_INTERVAL_MS = float(os.getenv("SHED_INTERVAL_MS", 500))
+SHED_MODE = os.getenv("SHED_MODE", "defer")  # "defer" answers 503 so Brevo retries, "drop" acks without dispatch
+HANDLER_BUDGET_MS = float(os.getenv("HANDLER_BUDGET_MS", 100))  # handler invocations over this are flagged; 0 disables
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", 100))
+EVENT_STORE_DIR = os.getenv("EVENT_STORE_DIR", "")  # per-recipient event history; empty disables
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # required by the /events admin endpoints
+HEAVY_HITTERS_CAPACITY = int(os.getenv("HEAVY_HITTERS_CAPACITY", 64))  # counters per top-K sketch
+DELIVERABILITY_THRESHOLDS = parse_thresholds(os.getenv("DELIVERABILITY_THRESHOLDS", "hard_bounced=0.05,spam=0.003,blocked=0.05"))
+DELIVERABILITY_MIN_VOLUME = int(os.getenv("DELIVERABILITY_MIN_VOLUME", 50))  # events in the window before alerting
+DELIVERABILITY_MAX_DOMAINS = int(os.getenv("DELIVERABILITY_MAX_DOMAINS", 2000))  # about 7.5 KB each
+DELIVERABILITY_ALERT_URL = os.getenv("DELIVERABILITY_ALERT_URL", "")  # alerts are only logged when empty
+GEOIP_DB = os.getenv("GEOIP_DB", "")  # GEO1 database built with geoip.py; empty disables enrichment
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", 65536))
+COALESCE_WINDOWS = parse_windows(os.getenv("COALESCE_WINDOWS", ""))  # e.g. "opened=5,clicked=5" (seconds)
+DISPATCH_LANES = int(os.getenv("DISPATCH_LANES", 0))  # ordered handler threads keyed by recipient/message; 0 dispatches inline
+DISPATCH_MAX_PENDING = int(os.getenv("DISPATCH_MAX_PENDING", 10000))  # events queued on the lanes before webhooks get 503
+ROUTER_TRUST_TOKEN = os.getenv("ROUTER_TRUST_TOKEN", "")  # X-Router-Token of a front router that already verified the signature
+EVENT_STREAM_BUFFER = int(os.getenv("EVENT_STREAM_BUFFER", 4096))  # events a /events/stream subscriber may fall behind
+EVENT_STREAM_MAX_SUBSCRIBERS = int(os.getenv("EVENT_STREAM_MAX_SUBSCRIBERS", 50))
+BODY_ARCHIVE_DIR = os.getenv("BODY_ARCHIVE_DIR", "")  # zstd-compressed raw webhook bodies (needs zstandard); empty disables
+BODY_ARCHIVE_RETRAIN_S = float(os.getenv("BODY_ARCHIVE_RETRAIN_S", 600))  # seconds between dictionary retraining passes
+SOFT_BOUNCE_THRESHOLD = int(os.getenv("SOFT_BOUNCE_THRESHOLD", 0))  # decayed soft bounces that escalate an address; 0 disables
+SOFT_BOUNCE_WINDOW_DAYS = float(os.getenv("SOFT_BOUNCE_WINDOW_DAYS", 7))  # a bounce's weight halves every window
+SOFT_BOUNCE_SKETCH_WIDTH = int(os.getenv("SOFT_BOUNCE_SKETCH_WIDTH", 1 << 21))  # cells per row; 4 rows of float32
+SOFT_BOUNCE_EXACT_CAPACITY = int(os.getenv("SOFT_BOUNCE_EXACT_CAPACITY", 100000))  # candidates counted exactly
+SOFT_BOUNCE_SNAPSHOT_DIR = os.getenv("SOFT_BOUNCE_SNAPSHOT_DIR", "")  # tracker state survives restarts; empty keeps it in memory
+SOFT_BOUNCE_SNAPSHOT_S = float(os.getenv("SOFT_BOUNCE_SNAPSHOT_S", 300))
+SOFT_BOUNCE_ALERT_URL = os.getenv("SOFT_BOUNCE_ALERT_URL", "")  # escalations are POSTed here as JSON; empty only logs and streams them
+ROUTING_RULES_FILE = os.getenv("ROUTING_RULES_FILE", "")  # JSON drop/handler/sink rules, hot-reloaded; empty disables
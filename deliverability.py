@@ -0,0 +1,233 @@
+"""
+Sliding-window deliverability monitor per recipient domain
+
+Each domain keeps a fixed ring of 10-second buckets covering the longest
+window, plus a running sum per window. A new event advances the ring and
+adds to the sums, and buckets that fall out of a window are subtracted from
+its sum. Every update is therefore O(1), and memory is fixed per domain:
+the ring and sums are flat ``array('I')`` buffers, about 7 KB per domain with
+the default 10-second buckets. The domain table itself is capped: the least
+recently seen domain is evicted first, together with its alert cooldowns.
+"""
+import asyncio
+import logging
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from heavy_hitters import recipient_domain
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ("delivered", "soft_bounced", "hard_bounced", "spam", "blocked")
+OUTCOME_INDEX = {outcome: index for index, outcome in enumerate(OUTCOMES)}
+WINDOWS: Tuple[Tuple[str, int], ...] = (("1m", 60), ("5m", 300), ("60m", 3600))
+_WIDTH = len(OUTCOMES)
+_EMPTY_BUCKET = array("I", [0]) * _WIDTH
+
+
+def parse_thresholds(spec: str) -> Dict[str, float]:
+    """Parse "hard_bounced=0.05,spam=0.001" into outcome -> rate"""
+    thresholds: Dict[str, float] = {}
+    for part in spec.split(","):
+        outcome, _, rate = part.strip().partition("=")
+        if outcome:
+            if outcome not in OUTCOME_INDEX:
+                raise ValueError(f"Unknown deliverability outcome: {outcome}")
+            thresholds[outcome] = float(rate)
+    return thresholds
+
+
+class WebhookAlert:
+    """Alert callback that POSTs each alert as JSON to url without blocking dispatch
+
+    Alerts raised on a dispatch lane thread are handed to the loop passed to
+    bind(), which the app captures at startup.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Set[Any] = set()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    async def post(self, alert: Dict[str, Any]):
+        import httpx
+        try:
+            async with httpx.AsyncClient() as client:
+                await client.post(self.url, json=alert, timeout=5.0)
+        except httpx.HTTPError as e:
+            logger.error("❌ Failed to deliver alert to %s: %s", self.url, str(e))
+
+    def __call__(self, alert: Dict[str, Any]):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            future = loop.create_task(self.post(alert))
+        elif self.loop is not None and not self.loop.is_closed():
+            future = asyncio.run_coroutine_threadsafe(self.post(alert), self.loop)
+        else:
+            logger.warning("⚠️ No event loop to deliver alert to %s", self.url)
+            return
+        # Keep a reference until the POST is done
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+
+class DomainWindow:
+    """Outcome counts of one domain in a ring of buckets with running per-window sums
+
+    ring holds one row of len(OUTCOMES) counts per bucket and sums one row per
+    window, both flattened; last_alert holds the time of the last alert per outcome.
+    """
+
+    __slots__ = ("ring", "sums", "bucket", "last_alert")
+
+    def __init__(self, slots: int, bucket: int):
+        self.ring = array("I", [0]) * (slots * _WIDTH)
+        self.sums = array("I", [0]) * (len(WINDOWS) * _WIDTH)
+        self.bucket = bucket
+        self.last_alert = array("d", [float("-inf")]) * _WIDTH
+
+    def window_sums(self, position: int) -> array:
+        return self.sums[position * _WIDTH:(position + 1) * _WIDTH]
+
+
+class DeliverabilityMonitor:
+    """Per-domain delivered/bounce/spam/blocked rates over 1, 5 and 60 minute windows"""
+
+    def __init__(
+        self,
+        thresholds: Optional[Dict[str, float]] = None,
+        alert: Optional[Callable[[Dict[str, Any]], None]] = None,
+        alert_window: str = "5m",
+        min_volume: int = 50,
+        cooldown: float = 300.0,
+        max_domains: int = 2_000,
+        bucket_seconds: int = 10,
+    ):
+        self.thresholds = thresholds or {}
+        self.alert = alert
+        self.alert_window = [name for name, _ in WINDOWS].index(alert_window)
+        self.min_volume = min_volume
+        self.cooldown = cooldown
+        self.max_domains = max_domains
+        self.bucket_seconds = bucket_seconds
+        self._lengths = [seconds // bucket_seconds for _, seconds in WINDOWS]
+        self._slots = max(self._lengths)
+        self._domains: "OrderedDict[str, DomainWindow]" = OrderedDict()
+        self.alerts_fired = 0
+
+    def observe(self, event: str, data: Dict[str, Any], now: Optional[float] = None):
+        index = OUTCOME_INDEX.get(event)
+        if index is None:
+            return
+        domain = recipient_domain(data.get("email"))
+        if domain is None:
+            return
+        if now is None:
+            now = time.time()
+        bucket = int(now // self.bucket_seconds)
+        window = self._domain(domain, bucket)
+        self._advance(window, bucket)
+        window.ring[(bucket % self._slots) * _WIDTH + index] += 1
+        for position in range(len(WINDOWS)):
+            window.sums[position * _WIDTH + index] += 1
+        if self.thresholds and self.alert is not None:
+            self._check(domain, window, now)
+
+    def _domain(self, domain: str, bucket: int) -> DomainWindow:
+        window = self._domains.get(domain)
+        if window is None:
+            window = self._domains[domain] = DomainWindow(self._slots, bucket)
+            if len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+        else:
+            self._domains.move_to_end(domain)
+        return window
+
+    def _advance(self, window: DomainWindow, bucket: int):
+        """Move the ring forward to bucket, retiring buckets that leave each window"""
+        steps = bucket - window.bucket
+        if steps <= 0:
+            return
+        if steps >= self._slots:
+            window.ring = array("I", [0]) * len(window.ring)
+            window.sums = array("I", [0]) * len(window.sums)
+            window.bucket = bucket
+            return
+        ring, sums, slots = window.ring, window.sums, self._slots
+        for current in range(window.bucket + 1, bucket + 1):
+            for position, length in enumerate(self._lengths):
+                leaving = ((current - length) % slots) * _WIDTH
+                base = position * _WIDTH
+                for index in range(_WIDTH):
+                    count = ring[leaving + index]
+                    if count:
+                        sums[base + index] -= count
+            # The slot being reused held the bucket that just left the longest window
+            start = (current % slots) * _WIDTH
+            ring[start:start + _WIDTH] = _EMPTY_BUCKET
+        window.bucket = bucket
+
+    def _check(self, domain: str, window: DomainWindow, now: float):
+        sums = window.window_sums(self.alert_window)
+        total = sum(sums)
+        if total < self.min_volume:
+            return
+        for outcome, threshold in self.thresholds.items():
+            index = OUTCOME_INDEX[outcome]
+            rate = sums[index] / total
+            if rate < threshold:
+                continue
+            if now - window.last_alert[index] < self.cooldown:
+                continue
+            window.last_alert[index] = now
+            self.alerts_fired += 1
+            alert = {
+                "domain": domain,
+                "outcome": outcome,
+                "rate": rate,
+                "threshold": threshold,
+                "window": WINDOWS[self.alert_window][0],
+                "volume": total,
+                "timestamp": now,
+            }
+            logger.warning("📉 Deliverability alert for %s: %s rate %.2f%% over %s", domain, outcome, rate * 100, alert["window"])
+            try:
+                self.alert(alert)
+            except Exception as e:
+                logger.error("❌ Deliverability alert callback failed: %s", str(e))
+
+    def domain_stats(self, domain: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        window = self._domains.get(domain.lower())
+        if window is None:
+            return None
+        self._advance(window, int((time.time() if now is None else now) // self.bucket_seconds))
+        stats: Dict[str, Any] = {"domain": domain.lower()}
+        for position, (name, _) in enumerate(WINDOWS):
+            sums = window.window_sums(position)
+            total = sum(sums)
+            stats[name] = {
+                "volume": total,
+                "counts": dict(zip(OUTCOMES, sums)),
+                "rates": {outcome: (count / total if total else 0.0) for outcome, count in zip(OUTCOMES, sums)},
+            }
+        return stats
+
+    def busiest(self, limit: int = 20, window: str = "5m") -> List[Dict[str, Any]]:
+        """Stats of the domains with the most events in the given window"""
+        position = [name for name, _ in WINDOWS].index(window)
+        now = time.time()
+        for entry in self._domains.values():
+            self._advance(entry, int(now // self.bucket_seconds))
+        ranked = sorted(self._domains.items(), key=lambda item: sum(item[1].window_sums(position)), reverse=True)[:limit]
+        return [self.domain_stats(domain, now) for domain, _ in ranked]
+
+    def stats(self) -> Dict[str, int]:
+        return {"domains": len(self._domains), "alerts_fired": self.alerts_fired}
@@ -0,0 +1,335 @@
+"""
+Append-only store of dispatched events with a per-recipient index
+
+Each app appends its dispatched events to its own log file,
+``{directory}/{source}.log``, one JSON record per line. A SQLite index shared
+by both apps (``{directory}/index.sqlite3``, WAL mode) maps the normalized
+email address to the (source, offset, length) of each record. Per-email
+history is therefore an indexed lookup plus one read per record.
+
+Several processes may share a directory: both apps, ``uvicorn --workers``,
+replicas, backfill.py. Each process buffers its records and writes a batch
+at the current end of the log while holding an exclusive lock on
+``{directory}/store.lock``. The batch's offsets come from that position, and
+its index rows are committed before the lock is released. Reads take the
+lock shared, so they never see an offset that a compaction has moved.
+
+The index also records the idempotency key of every event an app accepted
+(acknowledged to Brevo), whether or not it reached the log: coalesced
+repeats, events dropped by routing rules or shedding, and tenants without
+the event-store sink. Reconciliation diffs against these keys.
+
+Erasure removes the index rows at once and remembers the address; rows
+that another process flushes later for records stored before the erasure
+are filtered out of history until compaction drops them. A compaction pass
+rewrites the log without the erased records. It copies the bulk of the log
+without the store lock; only the records appended meanwhile are copied under
+it, before the new log replaces the old one. Compactions of one log are
+serialized by ``{directory}/{source}.compact.lock``.
+
+An EventStore may be shared by threads: appends only touch the buffers, and
+flushes, lookups and erasure take turns on the SQLite connection, so the app
+runs the blocking calls in worker threads.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    email TEXT NOT NULL,
+    source TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    event TEXT,
+    stored_at REAL NOT NULL,
+    ikey TEXT
+);
+CREATE INDEX IF NOT EXISTS events_email ON events (email, stored_at);
+CREATE INDEX IF NOT EXISTS events_ikey ON events (ikey);
+CREATE TABLE IF NOT EXISTS accepted (
+    ikey TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    accepted_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS erased (
+    email TEXT PRIMARY KEY,
+    erased_at REAL NOT NULL
+);
+"""
+
+
+def normalize_email(email: Any) -> str:
+    return str(email or "").strip().lower()
+
+
+def _timestamp_key(timestamp: Any) -> str:
+    """Epoch seconds for ISO timestamps, so webhook and API spellings of one instant match"""
+    if timestamp is None:
+        return ""
+    try:
+        return str(int(datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp()))
+    except ValueError:
+        return str(timestamp)
+
+
+def idempotency_key(event: str, data: Dict[str, Any]) -> str:
+    """Stable key for one provider event, used to detect events already ingested"""
+    parts = [
+        str(event),
+        normalize_email(data.get("email")),
+        str(data.get("message_id") or data.get("campaign_id") or ""),
+        _timestamp_key(data.get("timestamp")),
+    ]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+IndexRow = Tuple[str, str, int, int, str, float, str]
+
+
+class EventStore:
+    """Append-only event log for one app plus the shared email index"""
+
+    def __init__(self, directory: str, source: str, batch_size: int = 500):
+        self.directory = directory
+        self.source = source
+        self.batch_size = batch_size
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, f"{source}.log")
+        self.lock_path = os.path.join(directory, "store.lock")
+        self.index_path = os.path.join(directory, "index.sqlite3")
+        self.compact_lock_path = os.path.join(directory, f"{source}.compact.lock")
+        # Buffered records: encoded lines and their index rows without an offset yet
+        self._buffer_lock = threading.Lock()
+        self._lines: List[bytes] = []
+        self._pending: List[Tuple[str, int, str, float, str]] = []
+        self._accepted: List[Tuple[str, str, float]] = []
+        # Held while using the connection, and across a flush so batches keep their order
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._locked(fcntl.LOCK_EX):
+            self._db.executescript(SCHEMA)
+        self.appended = 0
+        self.compactions = 0
+
+    @contextmanager
+    def _locked(self, operation: int, path: Optional[str] = None) -> Iterator[None]:
+        """Hold the directory lock (or the lock file at path); a fresh descriptor per call also excludes other threads"""
+        with open(path or self.lock_path, "a") as lock:
+            fcntl.flock(lock, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def append(self, event: str, data: Dict[str, Any]) -> str:
+        """Buffer one dispatched event and its index row; returns its idempotency key"""
+        email = normalize_email(data.get("email"))
+        stored_at = time.time()
+        key = idempotency_key(event, data)
+        line = json.dumps({
+            "source": self.source,
+            "event": event,
+            "email": email,
+            "stored_at": stored_at,
+            "ikey": key,
+            "data": data,
+        }, separators=(",", ":"), default=str).encode() + b"\n"
+        with self._buffer_lock:
+            self._lines.append(line)
+            self._pending.append((email, len(line), event, stored_at, key))
+            self.appended += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        return key
+
+    def accept(self, event: str, data: Dict[str, Any]) -> str:
+        """Buffer the idempotency key of an acknowledged event, whichever sinks it reaches"""
+        key = idempotency_key(event, data)
+        with self._buffer_lock:
+            self._accepted.append((key, self.source, time.time()))
+            full = len(self._accepted) >= self.batch_size
+        if full:
+            self.flush()
+        return key
+
+    def flush(self):
+        """Write buffered records at the end of the log and commit their index rows and accepted keys"""
+        with self._db_lock:
+            with self._buffer_lock:
+                lines, self._lines = self._lines, []
+                pending, self._pending = self._pending, []
+                accepted, self._accepted = self._accepted, []
+            if accepted:
+                with self._db:
+                    self._db.executemany("INSERT OR IGNORE INTO accepted (ikey, source, accepted_at) VALUES (?, ?, ?)", accepted)
+            if not pending:
+                return
+            with self._locked(fcntl.LOCK_EX):
+                # Opened per batch, so a log replaced by compaction is never written through a stale handle
+                with open(self.log_path, "ab") as log:
+                    offset = os.fstat(log.fileno()).st_size
+                    log.write(b"".join(lines))
+                rows: List[IndexRow] = []
+                for email, length, event, stored_at, key in pending:
+                    rows.append((email, self.source, offset, length, event, stored_at, key))
+                    offset += length
+                with self._db:
+                    self._db.executemany(
+                        "INSERT INTO events (email, source, offset, length, event, stored_at, ikey) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+
+    def contains(self, keys: List[str]) -> set:
+        """Subset of the given idempotency keys that were already accepted or stored"""
+        self.flush()
+        found = set()
+        with self._db_lock:
+            for start in range(0, len(keys), 400):
+                chunk = keys[start:start + 400]
+                placeholders = ",".join("?" * len(chunk))
+                # Stored events count too, for logs written before keys were recorded on acceptance
+                rows = self._db.execute(
+                    f"SELECT ikey FROM accepted WHERE ikey IN ({placeholders}) UNION SELECT ikey FROM events WHERE ikey IN ({placeholders})",
+                    chunk + chunk,
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def history(self, email: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Every stored event for an address across both apps, oldest first"""
+        self.flush()
+        records: List[Dict[str, Any]] = []
+        handles: Dict[str, BinaryIO] = {}
+        # The connection lock is always taken before the directory lock
+        with self._db_lock, self._locked(fcntl.LOCK_SH):
+            # Rows flushed after an erasure for records stored before it are not history any more
+            rows = self._db.execute(
+                "SELECT e.source, e.offset, e.length FROM events e LEFT JOIN erased x ON x.email = e.email"
+                " WHERE e.email = ? AND (x.erased_at IS NULL OR e.stored_at > x.erased_at)"
+                " ORDER BY e.stored_at LIMIT ?",
+                (normalize_email(email), limit),
+            ).fetchall()
+            try:
+                for source, offset, length in rows:
+                    handle = handles.get(source)
+                    if handle is None:
+                        handle = handles[source] = open(os.path.join(self.directory, f"{source}.log"), "rb")
+                    handle.seek(offset)
+                    records.append(json.loads(handle.read(length)))
+            finally:
+                for handle in handles.values():
+                    handle.close()
+        return records
+
+    def erase(self, email: str) -> int:
+        """Drop an address from the index immediately; compaction removes its records from the logs"""
+        self.flush()
+        email = normalize_email(email)
+        with self._db_lock, self._locked(fcntl.LOCK_EX), self._db:
+            removed = self._db.execute("DELETE FROM events WHERE email = ?", (email,)).rowcount
+            self._db.execute(
+                "INSERT OR REPLACE INTO erased (email, erased_at) VALUES (?, ?)", (email, time.time())
+            )
+        logger.info("🧹 Erased %d indexed events for one address", removed)
+        return removed
+
+    def compact(self) -> Dict[str, int]:
+        """Rewrite this app's log without erased records and re-point the index
+
+        Runs on its own SQLite connection and never touches the buffered records,
+        so it can run in a worker thread while this process keeps appending.
+        """
+        with self._locked(fcntl.LOCK_EX, self.compact_lock_path):
+            return self._compact()
+
+    def _compact(self) -> Dict[str, int]:
+        db = sqlite3.connect(self.index_path)
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{self.source}.log.", suffix=".compact", dir=self.directory)
+        os.close(fd)
+        kept: List[IndexRow] = []
+        try:
+            erased = dict(db.execute("SELECT email, erased_at FROM erased"))
+            with open(tmp_path, "wb") as dst:
+                # Bulk copy without the lock, up to the last complete line
+                copied, dropped = self._copy_records(dst, 0, erased, kept)
+                with self._locked(fcntl.LOCK_EX):
+                    # Records appended meanwhile; writers are held off from here on
+                    _, tail_dropped = self._copy_records(dst, copied, erased, kept)
+                    dropped += tail_dropped
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                    # Addresses erased during the bulk copy keep their bytes until the next pass, not their index rows
+                    erased = dict(db.execute("SELECT email, erased_at FROM erased"))
+                    rows = [row for row in kept if not (row[0] in erased and row[5] <= erased[row[0]])]
+                    with db:
+                        db.execute("DELETE FROM events WHERE source = ?", (self.source,))
+                        db.executemany(
+                            "INSERT INTO events (email, source, offset, length, event, stored_at, ikey) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            rows,
+                        )
+                        os.replace(tmp_path, self.log_path)
+        finally:
+            db.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.compactions += 1
+        logger.info("🗜️ Compacted %s event log: kept %d, dropped %d", self.source, len(kept), dropped)
+        return {"kept": len(kept), "dropped": dropped}
+
+    def _copy_records(self, dst: BinaryIO, start: int, erased: Dict[str, float], kept: List[IndexRow]) -> Tuple[int, int]:
+        """Copy complete lines from start that were not erased; returns (end position, dropped)"""
+        if not os.path.exists(self.log_path):
+            return start, 0
+        dropped = 0
+        position = start
+        offset = dst.tell()
+        with open(self.log_path, "rb") as src:
+            src.seek(start)
+            for line in src:
+                if not line.endswith(b"\n"):
+                    # A batch still being written by another process
+                    break
+                position += len(line)
+                record = json.loads(line)
+                erased_at: Optional[float] = erased.get(record["email"])
+                if erased_at is not None and record["stored_at"] <= erased_at:
+                    dropped += 1
+                    continue
+                dst.write(line)
+                kept.append((record["email"], self.source, offset, len(line), record["event"], record["stored_at"], record["ikey"]))
+                offset += len(line)
+        return position, dropped
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            log_bytes = os.path.getsize(self.log_path)
+        except OSError:
+            log_bytes = 0
+        with self._buffer_lock:
+            pending, accepted = len(self._pending), len(self._accepted)
+        return {
+            "appended": self.appended,
+            "pending_index_rows": pending,
+            "pending_accepted_keys": accepted,
+            "log_bytes": log_bytes,
+            "compactions": self.compactions,
+        }
@@ -0,0 +1,115 @@
+"""
+Live tail of dispatched events for Server-Sent Events subscribers
+
+Dispatch publishes into a fixed ring of slots under a sequence number, and
+schedules at most one wakeup per event-loop iteration. That cost is the same
+whether one client or fifty are listening. Each subscriber keeps its own
+cursor into the ring, and filters and encodes on its own time. A subscriber
+that falls more than a ring behind gets a final ``dropped`` event and is
+disconnected; ingest never waits for it.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from heavy_hitters import recipient_domain
+
+
+class StreamFilter:
+    """Server-side filter on event type, campaign_id/template_id and recipient domain"""
+
+    def __init__(
+        self,
+        events: Optional[str] = None,
+        scope_field: str = "campaign_id",
+        scope: Optional[str] = None,
+        domain: Optional[str] = None,
+    ):
+        self.events = frozenset(e.strip() for e in events.split(",") if e.strip()) if events else None
+        self.scope_field = scope_field
+        self.scope = scope
+        self.domain = domain.strip().lower() if domain else None
+
+    def matches(self, event: str, data: Dict[str, Any]) -> bool:
+        if self.events is not None and event not in self.events:
+            return False
+        if self.scope is not None and str(data.get(self.scope_field)) != self.scope:
+            return False
+        if self.domain is not None and recipient_domain(data.get("email")) != self.domain:
+            return False
+        return True
+
+
+class EventStream:
+    """Single-writer ring of recent events with one shared wakeup for all subscribers"""
+
+    def __init__(self, capacity: int = 4096, max_subscribers: int = 50, keepalive: float = 15.0):
+        self.capacity = capacity
+        self.max_subscribers = max_subscribers
+        self.keepalive = keepalive
+        # slot: [sequence, event, data, encoded frame or None]
+        self._ring: List[Optional[list]] = [None] * capacity
+        self.published = 0
+        self.subscribers = 0
+        self.dropped = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed = asyncio.Event()
+        self._wake_pending = False
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """Make an event visible to subscribers; callers serialize publishes"""
+        if not self.subscribers:
+            return
+        sequence = self.published
+        self._ring[sequence % self.capacity] = [sequence, event, data, None]
+        self.published = sequence + 1
+        if not self._wake_pending and self._loop is not None:
+            self._wake_pending = True
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self._wake_pending = False
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def full(self) -> bool:
+        return self.subscribers >= self.max_subscribers
+
+    def subscribe(self, stream_filter: StreamFilter) -> AsyncIterator[bytes]:
+        """SSE frames of the events published from now on that pass the filter"""
+        self._loop = asyncio.get_running_loop()
+        return self._follow(stream_filter)
+
+    async def _follow(self, stream_filter: StreamFilter) -> AsyncIterator[bytes]:
+        # Counted only once iterated: a response cancelled before its first frame holds no slot
+        self.subscribers += 1
+        try:
+            cursor = self.published
+            yield b": connected\n\n"
+            while True:
+                # Take the wakeup before reading, so a publish in between is not missed
+                changed = self._changed
+                while cursor < self.published:
+                    slot = self._ring[cursor % self.capacity]
+                    if self.published - cursor > self.capacity or slot is None or slot[0] != cursor:
+                        self.dropped += 1
+                        yield b'event: dropped\ndata: {"reason":"consumer too slow"}\n\n'
+                        return
+                    cursor += 1
+                    if not stream_filter.matches(slot[1], slot[2]):
+                        continue
+                    if slot[3] is None:
+                        slot[3] = (
+                            f"id: {slot[0]}\nevent: {slot[1]}\ndata: "
+                            f"{json.dumps(slot[2], separators=(',', ':'), default=str)}\n\n"
+                        ).encode()
+                    yield slot[3]
+                try:
+                    await asyncio.wait_for(changed.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.subscribers -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"subscribers": self.subscribers, "published": self.published, "dropped": self.dropped}
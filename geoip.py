@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+GeoIP/ASN lookups from a memory-mapped range database shared by all workers
+
+The database is a flat file of IP ranges sorted by start address. It is
+opened with mmap, so every uvicorn worker on a host shares one copy in the
+page cache instead of loading its own. Lookups binary-search the ranges, and
+recent IPs are cached per worker.
+
+File layout (all integers big-endian):
+
+    header   b"GEO1" | u32 record count | u32 string table offset
+    records  start (16 bytes) | end (16 bytes) | country (2 ASCII bytes) | asn u32 | org offset u32
+    strings  u16 length | UTF-8 bytes, one per distinct AS organisation
+
+Addresses are stored as 16-byte IPv6, with IPv4 in its IPv4-mapped form.
+Build a database from CSV rows of ``start_ip,end_ip,country,asn,as_org``:
+
+    python geoip.py build ranges.csv geo.db
+"""
+import csv
+import mmap
+import socket
+import struct
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"GEO1"
+HEADER = struct.Struct(">4sII")
+RECORD = struct.Struct(">16s16s2sII")
+LENGTH = struct.Struct(">H")
+IPV4_MAPPED = b"\x00" * 10 + b"\xff\xff"
+
+
+def ip_key(ip: str) -> bytes:
+    """16-byte big-endian key; IPv4 addresses are IPv4-mapped"""
+    ip = ip.strip()
+    try:
+        return IPV4_MAPPED + socket.inet_pton(socket.AF_INET, ip)
+    except OSError:
+        pass
+    try:
+        return socket.inet_pton(socket.AF_INET6, ip)
+    except OSError:
+        raise ValueError(f"Invalid IP address: {ip}")
+
+
+def build(rows: Iterable[Tuple[str, str, str, int, str]], path: str) -> int:
+    """Write a database from (start_ip, end_ip, country, asn, as_org) rows"""
+    records: List[Tuple[bytes, bytes, bytes, int, str]] = []
+    for start, end, country, asn, org in rows:
+        records.append((ip_key(start), ip_key(end), (country or "--").encode()[:2].ljust(2), int(asn or 0), org or ""))
+    records.sort(key=lambda record: record[0])
+
+    strings = bytearray()
+    offsets: Dict[str, int] = {}
+    for record in records:
+        org = record[4]
+        if org not in offsets:
+            offsets[org] = len(strings)
+            encoded = org.encode()[:65535]
+            strings += LENGTH.pack(len(encoded)) + encoded
+
+    string_table = HEADER.size + RECORD.size * len(records)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), string_table))
+        for start, end, country, asn, org in records:
+            f.write(RECORD.pack(start, end, country, asn, offsets[org]))
+        f.write(strings)
+    return len(records)
+
+
+class GeoDatabase:
+    """Read-only view of a GEO1 file with a per-process LRU of recent lookups"""
+
+    def __init__(self, path: str, cache_size: int = 65536):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._strings = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a GEO1 database")
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _start(self, index: int) -> bytes:
+        offset = HEADER.size + index * RECORD.size
+        return self._map[offset:offset + 16]
+
+    def _lookup(self, ip: str) -> Optional[Dict[str, Any]]:
+        try:
+            key = ip_key(ip)
+        except ValueError:
+            return None
+        # Rightmost range starting at or before the address
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._start(middle) <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        start, end, country, asn, org_offset = RECORD.unpack_from(self._map, HEADER.size + (low - 1) * RECORD.size)
+        if key > end:
+            return None
+        position = self._strings + org_offset
+        (length,) = LENGTH.unpack_from(self._map, position)
+        org = self._map[position + LENGTH.size:position + LENGTH.size + length].decode()
+        return {"country": country.decode(), "asn": asn, "as_org": org}
+
+    def cache_info(self) -> Dict[str, int]:
+        info = self.lookup.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class GeoEnricher:
+    """Attaches ``geo`` (country, ASN, AS org) to events that carry an ip_address"""
+
+    def __init__(self, database: GeoDatabase, events: Iterable[str]):
+        self.database = database
+        self.events = frozenset(events)
+
+    def enrich(self, event: str, data: Dict[str, Any]):
+        if event not in self.events or "geo" in data:
+            return
+        ip = data.get("ip_address")
+        if isinstance(ip, str) and ip:
+            geo = self.database.lookup(ip)
+            # Copy so handlers cannot mutate the cached entry
+            data["geo"] = dict(geo) if geo is not None else None
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) == 4 and argv[1] == "build":
+        with open(argv[2], newline="") as f:
+            rows = [(row[0], row[1], row[2], int(row[3] or 0), row[4] if len(row) > 4 else "") for row in csv.reader(f) if row and not row[0].startswith("#") and row[0] != "start_ip"]
+        count = build(rows, argv[3])
+        print(f"✅ Wrote {count} ranges to {argv[3]}")
+        return 0
+    if len(argv) == 4 and argv[1] == "lookup":
+        print(GeoDatabase(argv[2]).lookup(argv[3]))
+        return 0
+    print("Usage: python geoip.py build ranges.csv geo.db | python geoip.py lookup geo.db IP")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
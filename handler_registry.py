@@ -0,0 +1,94 @@
+"""
+Handler registry shared by the campaign and transactional webhook apps
+
+Handlers can be registered as callables, as "module:function" references or
+as installed entry points. References are imported the first time their
+event is dispatched, so unused plugins cost nothing at startup. A package
+contributes handlers by declaring entry points in the app's group, e.g.
+
+    [project.entry-points."brevo_webhooks.handlers"]
+    hard_bounced = "acme_hooks:on_hard_bounce"
+"""
+import importlib
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+def import_handler(target: str) -> Handler:
+    """Resolve a "module:function" reference"""
+    module_name, _, attr = target.partition(":")
+    handler = importlib.import_module(module_name)
+    for part in attr.split("."):
+        handler = getattr(handler, part)
+    return handler
+
+
+class HandlerRegistry(dict):
+    """Event name -> handler mapping that tracks a version on every change"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def __getitem__(self, key: str) -> Handler:
+        value = super().__getitem__(key)
+        if not callable(value):
+            value = import_handler(value) if isinstance(value, str) else value.load()
+            # Cache the import without bumping the version: the set of events is unchanged
+            super().__setitem__(key, value)
+        return value
+
+    def get(self, key: str, default: Optional[Handler] = None) -> Optional[Handler]:
+        return self[key] if key in self else default
+
+    def __setitem__(self, key: str, value: Any):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def load_entry_points(self, group: str) -> List[str]:
+        """Register every handler installed under an entry point group; imported on first use"""
+        # importlib.metadata scans every installed distribution, so it is only imported when plugins are enabled
+        from importlib.metadata import entry_points
+
+        loaded = []
+        for entry_point in entry_points(group=group):
+            self[entry_point.name] = entry_point
+            loaded.append(entry_point.name)
+        if loaded:
+            logger.info("🔌 Handler plugins from %s: %s", group, ", ".join(loaded))
+        return loaded
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def pop(self, key, *default):
+        value = super().pop(key, *default)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def clear(self):
+        super().clear()
+        self._changed()
@@ -0,0 +1,222 @@
+"""
+Streaming top-K of clicked links, error codes, bounce/block reasons and recipient domains
+
+Counts are kept in Space-Saving sketches: at most ``capacity`` counters each,
+with a guaranteed overestimate bound per item. Sketches merge, so the exports
+of several workers can be combined into one answer (see ``merge_exports``).
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# dimension -> (events it applies to, payload fields tried in order)
+DIMENSIONS: Dict[str, Tuple[Optional[frozenset], Tuple[str, ...]]] = {
+    "link": (frozenset({"clicked"}), ("link_url",)),
+    "error_code": (
+        frozenset({"hard_bounced", "soft_bounced", "invalid_email", "error", "blocked"}),
+        ("error_code",),
+    ),
+    "reason": (
+        frozenset({"hard_bounced", "soft_bounced", "invalid_email", "error", "blocked", "spam"}),
+        ("bounce_reason", "block_reason", "error_reason", "error_message", "reason"),
+    ),
+    "domain": (None, ("email",)),
+}
+
+
+def recipient_domain(email: Any) -> Optional[str]:
+    if not isinstance(email, str) or "@" not in email:
+        return None
+    return email.rsplit("@", 1)[1].strip().lower() or None
+
+
+class SpaceSaving:
+    """Space-Saving sketch: item -> [count, overestimate], never more than capacity items"""
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.total = 0
+        self._counters: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def add(self, item: str, count: int = 1):
+        self.total += count
+        counter = self._counters.get(item)
+        if counter is not None:
+            counter[0] += count
+            return
+        if len(self._counters) < self.capacity:
+            self._counters[item] = [count, 0]
+            return
+        # Replace the smallest counter; its count becomes the newcomer's error bound
+        victim = min(self._counters, key=lambda key: self._counters[key][0])
+        floor = self._counters.pop(victim)[0]
+        self._counters[item] = [floor + count, floor]
+
+    def min_count(self) -> int:
+        if len(self._counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self._counters.values())
+
+    def top(self, k: int = 10) -> List[Dict[str, Any]]:
+        ranked = sorted(self._counters.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [{"item": item, "count": count, "error": error} for item, (count, error) in ranked]
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Combined sketch; items missing on one side are charged that side's minimum"""
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        merged.total = self.total + other.total
+        own_floor, other_floor = self.min_count(), other.min_count()
+        combined: Dict[str, List[int]] = {}
+        for item in set(self._counters) | set(other._counters):
+            mine = self._counters.get(item, [own_floor, own_floor])
+            theirs = other._counters.get(item, [other_floor, other_floor])
+            combined[item] = [mine[0] + theirs[0], mine[1] + theirs[1]]
+        ranked = sorted(combined.items(), key=lambda item: item[1][0], reverse=True)[:merged.capacity]
+        merged._counters = dict(ranked)
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "total": self.total, "counters": self._counters}
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "SpaceSaving":
+        sketch = cls(raw["capacity"])
+        sketch.total = raw["total"]
+        sketch._counters = {item: list(counter) for item, counter in raw["counters"].items()}
+        return sketch
+
+
+def merge_all(sketches: Iterable[SpaceSaving], capacity: int) -> SpaceSaving:
+    merged = SpaceSaving(capacity)
+    for sketch in sketches:
+        merged = merged.merge(sketch)
+    return merged
+
+
+class HeavyHitters:
+    """Per-scope (campaign_id / template_id) and global sliding-window top-K for every dimension"""
+
+    def __init__(
+        self,
+        scope_field: str,
+        capacity: int = 64,
+        max_scopes: int = 10_000,
+        bucket_seconds: int = 300,
+        buckets: int = 288,
+    ):
+        self.scope_field = scope_field
+        self.capacity = capacity
+        self.max_scopes = max_scopes
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        # (scope, dimension) -> sketch, least recently touched scopes evicted first
+        self._scoped: "OrderedDict[Tuple[str, str], SpaceSaving]" = OrderedDict()
+        # dimension -> ring of (bucket index, sketch)
+        self._windows: Dict[str, List[Tuple[int, SpaceSaving]]] = {
+            dimension: [(-1, SpaceSaving(capacity)) for _ in range(buckets)] for dimension in DIMENSIONS
+        }
+
+    def observe(self, event: str, data: Dict[str, Any], now: Optional[float] = None):
+        """Count the event's values in every dimension it carries"""
+        if now is None:
+            now = time.time()
+        bucket = int(now // self.bucket_seconds)
+        scope = data.get(self.scope_field)
+        for dimension, (events, fields) in DIMENSIONS.items():
+            if events is not None and event not in events:
+                continue
+            value = None
+            for field in fields:
+                value = data.get(field)
+                if value:
+                    break
+            if dimension == "domain":
+                value = recipient_domain(value)
+            if not value:
+                continue
+            value = str(value)
+            self._window_sketch(dimension, bucket).add(value)
+            if scope is not None:
+                self._scope_sketch(str(scope), dimension).add(value)
+
+    def _window_sketch(self, dimension: str, bucket: int) -> SpaceSaving:
+        ring = self._windows[dimension]
+        slot = bucket % self.buckets
+        index, sketch = ring[slot]
+        if index != bucket:
+            sketch = SpaceSaving(self.capacity)
+            ring[slot] = (bucket, sketch)
+        return sketch
+
+    def _scope_sketch(self, scope: str, dimension: str) -> SpaceSaving:
+        key = (scope, dimension)
+        sketch = self._scoped.get(key)
+        if sketch is None:
+            sketch = self._scoped[key] = SpaceSaving(self.capacity)
+            if len(self._scoped) > self.max_scopes * len(DIMENSIONS):
+                self._scoped.popitem(last=False)
+        else:
+            self._scoped.move_to_end(key)
+        return sketch
+
+    def window(self, dimension: str, window_minutes: int, now: Optional[float] = None) -> SpaceSaving:
+        """Merged sketch of the buckets covering the last window_minutes"""
+        if now is None:
+            now = time.time()
+        current = int(now // self.bucket_seconds)
+        count = min(self.buckets, max(1, -(-window_minutes * 60 // self.bucket_seconds)))
+        live = [sketch for index, sketch in self._windows[dimension] if current - count < index <= current]
+        return merge_all(live, self.capacity)
+
+    def scoped(self, scope: str, dimension: str) -> SpaceSaving:
+        return self._scoped.get((scope, dimension)) or SpaceSaving(self.capacity)
+
+    def query(self, dimension: str, scope: Optional[str] = None, window_minutes: int = 60, k: int = 10) -> Dict[str, Any]:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dimension}")
+        sketch = self.scoped(scope, dimension) if scope is not None else self.window(dimension, window_minutes)
+        result: Dict[str, Any] = {"dimension": dimension, "total": sketch.total, "top": sketch.top(k)}
+        if scope is not None:
+            result[self.scope_field] = scope
+        else:
+            result["window_minutes"] = window_minutes
+        return result
+
+    def export(self, window_minutes: int = 60) -> Dict[str, Any]:
+        """Serializable sketches for merging with other workers' exports"""
+        return {
+            "scope_field": self.scope_field,
+            "window_minutes": window_minutes,
+            "windows": {dimension: self.window(dimension, window_minutes).to_dict() for dimension in DIMENSIONS},
+            "scoped": [
+                {"scope": scope, "dimension": dimension, "sketch": sketch.to_dict()}
+                for (scope, dimension), sketch in self._scoped.items()
+            ],
+        }
+
+
+def merge_exports(exports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge several workers' export() documents into one of the same shape"""
+    windows: Dict[str, SpaceSaving] = {}
+    scoped: Dict[Tuple[str, str], SpaceSaving] = {}
+    for export in exports:
+        for dimension, raw in export["windows"].items():
+            sketch = SpaceSaving.from_dict(raw)
+            windows[dimension] = windows[dimension].merge(sketch) if dimension in windows else sketch
+        for entry in export["scoped"]:
+            key = (entry["scope"], entry["dimension"])
+            sketch = SpaceSaving.from_dict(entry["sketch"])
+            scoped[key] = scoped[key].merge(sketch) if key in scoped else sketch
+    first = exports[0] if exports else {}
+    return {
+        "scope_field": first.get("scope_field"),
+        "window_minutes": first.get("window_minutes"),
+        "windows": {dimension: sketch.to_dict() for dimension, sketch in windows.items()},
+        "scoped": [
+            {"scope": scope, "dimension": dimension, "sketch": sketch.to_dict()}
+            for (scope, dimension), sketch in scoped.items()
+        ],
+    }
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Run a local cluster: N webhook nodes behind one consistent-hash router
+
+Every process is a separate uvicorn server on 127.0.0.1. The nodes and the
+router share a generated ROUTER_TRUST_TOKEN, so nodes accept forwarded
+events without checking the signature again. The nodes share
+EVENT_STORE_DIR, so one history lookup sees every node's events.
+
+    python launch_cluster.py --app campaign --nodes 3
+    python launch_cluster.py --app transactional --nodes 4 --port 3001
+"""
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+
+MODULES = {"campaign": "main", "transactional": "transactional_main"}
+
+
+def spawn(module: str, port: int, env: dict, log_level: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", log_level],
+        env=env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start webhook nodes and a consistent-hash router in front of them")
+    parser.add_argument("--app", choices=sorted(MODULES), default="campaign")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--port", type=int, default=3000, help="router port")
+    parser.add_argument("--node-port", type=int, default=3100, help="port of the first node")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("ROUTER_TRUST_TOKEN", secrets.token_hex(16))
+    processes = []
+    nodes = []
+    for index in range(args.nodes):
+        port = args.node_port + index
+        processes.append(spawn(MODULES[args.app], port, env, args.log_level))
+        nodes.append(f"http://127.0.0.1:{port}")
+
+    router_env = dict(env, ROUTER_APP=args.app, ROUTER_NODES=",".join(nodes))
+    processes.append(spawn("router", args.port, router_env, args.log_level))
+    print(f"🧭 Router on http://127.0.0.1:{args.port} in front of {args.nodes} {args.app} nodes: {', '.join(nodes)}")
+    print("   Press Ctrl+C to stop the cluster")
+
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(0.5)
+        print("❌ A cluster process exited; stopping the others")
+    except KeyboardInterrupt:
+        print("\n👋 Stopping the cluster")
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Event-loop lag monitor and slow-handler watchdog
+
+Without dispatch lanes, handlers run inline on the event loop and one slow
+handler delays every other request; with lanes, they run on lane threads
+and a slow one holds up the events queued behind it on its lane.
+LoopLagMonitor measures how late the loop wakes up from a fixed sleep.
+HandlerWatchdog runs a background thread that notices any handler invocation
+past its budget, on whichever thread it runs, and captures that handler's
+stack while it is still running.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Shortest wait between watchdog checks, in seconds
+MIN_WATCH_INTERVAL = 0.005
+
+
+class LatencyWindow:
+    """Most recent samples in a fixed-size ring, summarised as percentiles on demand"""
+
+    def __init__(self, size: int = 2048):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, value: float):
+        self._samples.append(value)
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self._samples:
+            return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0, "samples": 0}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return {
+            "p50": ordered[int(last * 0.50)],
+            "p90": ordered[int(last * 0.90)],
+            "p99": ordered[int(last * 0.99)],
+            "max": ordered[last],
+            "samples": len(ordered),
+        }
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag as the overshoot of a periodic sleep, in milliseconds"""
+
+    def __init__(self, interval: float = 0.1, window: int = 2048):
+        self.interval = interval
+        self.lag = LatencyWindow(window)
+        self.last_lag_ms = 0.0
+
+    async def run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag_ms = max(0.0, (time.monotonic() - expected) * 1000)
+            self.lag.add(self.last_lag_ms)
+
+    def stats(self) -> Dict[str, float]:
+        stats = self.lag.percentiles()
+        stats["last"] = self.last_lag_ms
+        return stats
+
+
+class _Invocation:
+    __slots__ = ("event", "handler", "data", "thread_id", "started", "stack")
+
+    def __init__(self, event: str, handler: Callable, data: Dict[str, Any]):
+        self.event = event
+        self.handler = handler
+        self.data = data
+        self.thread_id = threading.get_ident()
+        self.started = time.monotonic()
+        self.stack: Optional[str] = None
+
+
+def _handler_name(handler: Callable) -> str:
+    return getattr(handler, "__qualname__", None) or repr(handler)
+
+
+class HandlerWatchdog:
+    """Flags handler invocations over budget and captures their stacks from a side thread"""
+
+    def __init__(self, budget: float = 0.1, keep: int = 50, stack_depth: int = 12):
+        self.budget = budget
+        self.stack_depth = stack_depth
+        self.slow_count = 0
+        self.durations = LatencyWindow()
+        self.slow: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._active: Dict[int, _Invocation] = {}
+        self._ids = itertools.count()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the stack-capture thread; a budget of 0 disables the watchdog"""
+        if self.budget > 0 and self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._watch, name="handler-watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _watch(self):
+        # Check twice per budget so a stack is captured before the handler returns; tiny budgets must not spin
+        while not self._stopped.wait(max(self.budget / 2, MIN_WATCH_INTERVAL)):
+            now = time.monotonic()
+            for invocation in list(self._active.values()):
+                if invocation.stack is None and now - invocation.started > self.budget:
+                    frame = sys._current_frames().get(invocation.thread_id)
+                    if frame is None:
+                        continue
+                    invocation.stack = "".join(traceback.format_stack(frame, limit=self.stack_depth))
+                    logger.warning(
+                        "🐢 Handler %s for %s event still running after %.0f ms:\n%s",
+                        _handler_name(invocation.handler),
+                        invocation.event,
+                        (now - invocation.started) * 1000,
+                        invocation.stack,
+                    )
+
+    def invoke(self, event: str, handler: Callable[[Dict[str, Any]], None], data: Dict[str, Any]):
+        """Run handler(data) under the watchdog"""
+        token = next(self._ids)
+        invocation = _Invocation(event, handler, data)
+        self._active[token] = invocation
+        try:
+            handler(data)
+        finally:
+            del self._active[token]
+            elapsed = time.monotonic() - invocation.started
+            self.durations.add(elapsed * 1000)
+            if 0 < self.budget < elapsed:
+                self._record_slow(invocation, elapsed)
+
+    def _record_slow(self, invocation: _Invocation, elapsed: float):
+        self.slow_count += 1
+        try:
+            payload_size = len(json.dumps(invocation.data, default=str))
+        except (TypeError, ValueError):
+            payload_size = -1
+        report = {
+            "handler": _handler_name(invocation.handler),
+            "event": invocation.event,
+            "duration_ms": elapsed * 1000,
+            "payload_size": payload_size,
+            "stack": invocation.stack,
+        }
+        self.slow.append(report)
+        logger.warning(
+            "🐢 Slow handler %s for %s event: %.0f ms (budget %.0f ms), payload %d bytes",
+            report["handler"], invocation.event, elapsed * 1000, self.budget * 1000, payload_size,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Public summary; stacks can show payload values, so they are left to slow_reports()"""
+        return {
+            "budget_ms": self.budget * 1000,
+            "slow_count": self.slow_count,
+            "durations_ms": self.durations.percentiles(),
+            "recent_slow": [{key: value for key, value in report.items() if key != "stack"} for report in self.slow],
+        }
+
+    def slow_reports(self) -> List[Dict[str, Any]]:
+        return list(self.slow)
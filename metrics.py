@@ -0,0 +1,38 @@
+"""
+In-process counters and gauges exposed by the webhook apps on GET /metrics
+"""
+from typing import Any, Callable, Dict, Tuple
+
+LabelKey = Tuple[Tuple[str, Any], ...]
+
+
+class Metrics:
+    """Labelled counters plus gauges that are read lazily when metrics are exported"""
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """Add value to the counter identified by name and labels"""
+        series = self._counters.get(name)
+        if series is None:
+            series = self._counters[name] = {}
+        key = tuple(sorted(labels.items())) if labels else ()
+        series[key] = series.get(key, 0) + value
+
+    def get(self, name: str, **labels) -> float:
+        key = tuple(sorted(labels.items())) if labels else ()
+        return self._counters.get(name, {}).get(key, 0)
+
+    def gauge(self, name: str, read: Callable[[], Any]):
+        """Register a callable whose value is reported under name"""
+        self._gauges[name] = read
+
+    def snapshot(self) -> Dict[str, Any]:
+        counters = {
+            name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+            for name, series in self._counters.items()
+        }
+        gauges = {name: read() for name, read in self._gauges.items()}
+        return {"counters": counters, "gauges": gauges}
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Archive of raw webhook bodies, compressed with per-event-type zstd dictionaries
+
+Webhook bodies are small, repetitive JSON: the same keys, user agents and
+URL prefixes again and again. Compressed one by one without a dictionary,
+they barely shrink. The compressor keeps recent bodies of each event type as
+samples. A background thread trains a zstd dictionary per type from them and
+adopts it only if it beats the current one on held-out samples. Every record
+stores the ID of the dictionary that compressed it, and every dictionary ever
+adopted stays on disk, so old records remain readable after a retrain.
+
+Archive file layout, one record after another:
+
+    header  stored_at f64 | event name length u8 | dictionary ID u32 | body length u32 (big-endian)
+    event   UTF-8 event name
+    body    zstd frame (dictionary ID 0 means no dictionary)
+
+Several processes may append to one archive (``uvicorn --workers``). Each
+buffers its records and writes a batch with a single write at the end of
+the file while holding an exclusive lock on ``{directory}/bodies.lock``, so
+records never interleave. Erasure rewrites the archive without the bodies of
+one recipient under the same lock and swaps it in.
+
+Replay streams the file one record at a time:
+
+    python payload_compression.py replay archive/campaign.bodies [--event clicked]
+
+Requires the optional ``zstandard`` package.
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from event_store import normalize_email
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed when the archive is enabled
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+RECORD = struct.Struct(">dBII")
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("The payload archive needs the zstandard package: pip install zstandard")
+
+
+class DictionaryCompressor:
+    """Per-event-type zstd dictionaries, retrained in the background from recent samples"""
+
+    def __init__(
+        self,
+        directory: str,
+        level: int = 3,
+        dict_size: int = 16 * 1024,
+        samples_per_type: int = 4000,
+        min_samples: int = 500,
+        retrain_interval: float = 600.0,
+    ):
+        _require_zstandard()
+        self.directory = directory
+        self.level = level
+        self.dict_size = dict_size
+        self.min_samples = min_samples
+        self.retrain_interval = retrain_interval
+        self.samples_per_type = samples_per_type
+        os.makedirs(directory, exist_ok=True)
+        self._samples: Dict[str, Deque[bytes]] = {}
+        self._new_samples: Dict[str, int] = {}
+        # dictionary ID -> decompressor, for every dictionary ever adopted
+        self._decompressors: Dict[int, Any] = {0: zstandard.ZstdDecompressor()}
+        # event type -> (dictionary ID, compressor, dictionary) currently used
+        self._current: Dict[str, Tuple[int, Any, Any]] = {}
+        self._plain = zstandard.ZstdCompressor(level=level)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.retrained = 0
+        self._load()
+
+    def _current_path(self) -> str:
+        return os.path.join(self.directory, "current.json")
+
+    def _load(self):
+        """Load every stored dictionary and the per-type choice of dictionary"""
+        for name in os.listdir(self.directory):
+            if name.endswith(".zdict"):
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    dictionary = zstandard.ZstdCompressionDict(f.read())
+                self._decompressors[dictionary.dict_id()] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        if os.path.exists(self._current_path()):
+            with open(self._current_path()) as f:
+                for event, dict_id in json.load(f).items():
+                    self._adopt(event, dict_id)
+
+    def _adopt(self, event: str, dict_id: int):
+        with open(os.path.join(self.directory, f"{dict_id}.zdict"), "rb") as f:
+            dictionary = zstandard.ZstdCompressionDict(f.read())
+        self._current[event] = (dict_id, zstandard.ZstdCompressor(level=self.level, dict_data=dictionary), dictionary)
+
+    def compress(self, event: str, body: bytes) -> Tuple[int, bytes]:
+        """Compress one body with its event type's dictionary; returns (dictionary ID, frame)"""
+        with self._lock:
+            samples = self._samples.get(event)
+            if samples is None:
+                samples = self._samples[event] = deque(maxlen=self.samples_per_type)
+            samples.append(body)
+            self._new_samples[event] = self._new_samples.get(event, 0) + 1
+        current = self._current.get(event)
+        if current is None:
+            return 0, self._plain.compress(body)
+        return current[0], current[1].compress(body)
+
+    def decompressor(self, dict_id: int) -> Any:
+        decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            raise KeyError(f"Unknown zstd dictionary {dict_id}")
+        return decompressor
+
+    def decompress(self, dict_id: int, frame: bytes) -> bytes:
+        return self.decompressor(dict_id).decompress(frame)
+
+    def train(self, event: str) -> Optional[int]:
+        """Train a dictionary for one event type and adopt it if it compresses held-out samples better"""
+        with self._lock:
+            samples = list(self._samples.get(event, ()))
+            self._new_samples[event] = 0
+        if len(samples) < self.min_samples:
+            return None
+        random.shuffle(samples)
+        holdout, training = samples[: len(samples) // 10], samples[len(samples) // 10:]
+        try:
+            dictionary = zstandard.train_dictionary(self.dict_size, training, level=self.level)
+        except zstandard.ZstdError as e:
+            logger.warning("⚠️ Could not train a zstd dictionary for %s events: %s", event, str(e))
+            return None
+        candidate = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+        # Compressors are not thread-safe, so the baseline gets its own instead of sharing the ingest one
+        current = self._current.get(event)
+        baseline = zstandard.ZstdCompressor(level=self.level, dict_data=current[2] if current is not None else None)
+        candidate_size = sum(len(candidate.compress(body)) for body in holdout)
+        baseline_size = sum(len(baseline.compress(body)) for body in holdout)
+        if candidate_size >= baseline_size:
+            logger.info("🗜️ Kept the %s dictionary: retrained one is no better (%d vs %d bytes)", event, candidate_size, baseline_size)
+            return None
+
+        dict_id = dictionary.dict_id()
+        with open(os.path.join(self.directory, f"{dict_id}.zdict"), "wb") as f:
+            f.write(dictionary.as_bytes())
+        self._decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        self._current[event] = (dict_id, candidate, dictionary)
+        self._save_current()
+        self.retrained += 1
+        logger.info(
+            "🗜️ Adopted zstd dictionary %d for %s events: held-out samples %d -> %d bytes",
+            dict_id, event, baseline_size, candidate_size,
+        )
+        return dict_id
+
+    def _save_current(self):
+        tmp = self._current_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({event: current[0] for event, current in self._current.items()}, f)
+        os.replace(tmp, self._current_path())
+
+    def retrain_due(self):
+        """Retrain the event types that gathered enough new samples since their last training"""
+        for event, count in list(self._new_samples.items()):
+            if count >= self.min_samples:
+                self.train(event)
+
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._retrain_loop, name="zstd-retrain", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _retrain_loop(self):
+        # Train soon after startup, then at the configured interval
+        delay = min(60.0, self.retrain_interval)
+        while not self._stopped.wait(delay):
+            try:
+                self.retrain_due()
+            except Exception as e:
+                logger.error("❌ zstd dictionary retraining failed: %s", str(e))
+            delay = self.retrain_interval
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dictionaries": {event: current[0] for event, current in self._current.items()},
+            "stored_dictionaries": len(self._decompressors) - 1,
+            "retrained": self.retrained,
+        }
+
+
+class PayloadArchive:
+    """Append-only file of compressed raw webhook bodies for one app"""
+
+    def __init__(self, directory: str, source: str, compressor: DictionaryCompressor):
+        self.compressor = compressor
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{source}.bodies")
+        self.lock_path = os.path.join(directory, "bodies.lock")
+        self._buffer_lock = threading.Lock()
+        self._records: List[bytes] = []
+        self.records = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.erased = 0
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def append(self, event: str, body: bytes):
+        """Compress and buffer one body; flush() writes the buffered records"""
+        dict_id, frame = self.compressor.compress(event, body)
+        name = event.encode()[:255]
+        record = RECORD.pack(time.time(), len(name), dict_id, len(frame)) + name + frame
+        with self._buffer_lock:
+            self._records.append(record)
+            self.records += 1
+            self.raw_bytes += len(body)
+            self.stored_bytes += len(record)
+
+    def flush(self):
+        """Write the buffered records at the end of the archive in one write"""
+        with self._buffer_lock:
+            records, self._records = self._records, []
+        if not records:
+            return
+        with self._locked():
+            # Opened per batch, so an archive replaced by erase() is never written through a stale handle
+            with open(self.path, "ab") as f:
+                f.write(b"".join(records))
+
+    def erase(self, email: str) -> int:
+        """Rewrite the archive without the bodies addressed to email; returns how many were dropped"""
+        self.flush()
+        email = normalize_email(email)
+        dropped = 0
+        with self._locked():
+            if not os.path.exists(self.path):
+                return 0
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".erase", dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as dst:
+                    for record, dict_id, frame in _records(self.path):
+                        if _recipient(self.compressor.decompress(dict_id, frame)) == email:
+                            dropped += 1
+                            continue
+                        dst.write(record)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.replace(tmp_path, self.path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        self.erased += dropped
+        logger.info("🧹 Erased %d archived bodies for one address", dropped)
+        return dropped
+
+    def close(self):
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "records": self.records,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "ratio": self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0,
+            "erased": self.erased,
+            **self.compressor.stats(),
+        }
+
+
+def _records(path: str) -> Iterator[Tuple[bytes, int, bytes]]:
+    """Stream (raw record, dictionary ID, frame) from an archive file, one record in memory at a time"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            _, name_length, dict_id, frame_length = RECORD.unpack(header)
+            name = f.read(name_length)
+            frame = f.read(frame_length)
+            if len(frame) < frame_length:
+                logger.warning("⚠️ Truncated record at the end of %s", path)
+                return
+            yield header + name + frame, dict_id, frame
+
+
+def _recipient(body: bytes) -> str:
+    try:
+        data = json.loads(body).get("data")
+    except (ValueError, AttributeError):
+        return ""
+    return normalize_email(data.get("email")) if isinstance(data, dict) else ""
+
+
+def replay(path: str, compressor: DictionaryCompressor, event: Optional[str] = None) -> Iterator[Tuple[float, str, bytes]]:
+    """Stream (stored_at, event, raw body) from an archive file, one record in memory at a time"""
+    for record, dict_id, frame in _records(path):
+        stored_at, name_length, _, _ = RECORD.unpack_from(record)
+        name = record[RECORD.size:RECORD.size + name_length].decode()
+        if event is not None and name != event:
+            continue
+        yield stored_at, name, compressor.decompress(dict_id, frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a compressed webhook body archive as JSON lines")
+    parser.add_argument("command", choices=["replay"])
+    parser.add_argument("archive", help="a {source}.bodies file")
+    parser.add_argument("--dictionaries", help="dictionary directory (default: dictionaries/ next to the archive)")
+    parser.add_argument("--event", help="only this event type")
+    args = parser.parse_args()
+
+    directory = args.dictionaries or os.path.join(os.path.dirname(os.path.abspath(args.archive)), "dictionaries")
+    compressor = DictionaryCompressor(directory)
+    out = sys.stdout.buffer
+    for _, _, body in replay(args.archive, compressor, args.event):
+        out.write(body.rstrip(b"\n") + b"\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,608 @@
+"""
+Webhook pipeline shared by the campaign and transactional apps
+
+One WebhookPipeline per app builds the FastAPI app, the dispatch stages
+(tenants, routing rules, coalescing, dispatch lanes) and the sinks (top-K,
+deliverability, soft bounces, event stream, event store, body archive). It
+also registers the webhook, health, admin and stats routes. Everything that
+differs between the apps is a constructor argument: the source name, its
+handlers and secret, its paths, the field that scopes its stats and stream
+filters (``campaign_id`` or ``template_id``) and the fields that key
+coalescing and dispatch lanes.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, Optional, Sequence, Tuple
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from coalescing import EventCoalescer
+from config import (
+    ADMIN_TOKEN, BODY_ARCHIVE_DIR, BODY_ARCHIVE_RETRAIN_S, COALESCE_WINDOWS, DELIVERABILITY_ALERT_URL,
+    DELIVERABILITY_MAX_DOMAINS, DELIVERABILITY_MIN_VOLUME, DELIVERABILITY_THRESHOLDS, DISPATCH_LANES,
+    DISPATCH_MAX_PENDING, EVENT_STORE_DIR, EVENT_STREAM_BUFFER, EVENT_STREAM_MAX_SUBSCRIBERS, GEOIP_CACHE_SIZE, GEOIP_DB,
+    HANDLER_BUDGET_MS, HEALTH_MAX_QUEUE_DEPTH, HEAVY_HITTERS_CAPACITY, LOOP_LAG_INTERVAL_MS,
+    ROUTER_TRUST_TOKEN, ROUTING_RULES_FILE, SHED_INTERVAL_MS, SHED_MODE, SHED_TARGET_MS, SOFT_BOUNCE_ALERT_URL,
+    SOFT_BOUNCE_EXACT_CAPACITY, SOFT_BOUNCE_SKETCH_WIDTH, SOFT_BOUNCE_SNAPSHOT_DIR, SOFT_BOUNCE_SNAPSHOT_S,
+    SOFT_BOUNCE_THRESHOLD, SOFT_BOUNCE_WINDOW_DAYS, SOURCE_RATE_LIMIT, TENANTS_FILE,
+)
+from deliverability import DeliverabilityMonitor, WebhookAlert
+from event_stream import EventStream, StreamFilter
+from handler_registry import HandlerRegistry
+from heavy_hitters import HeavyHitters
+from loop_watchdog import HandlerWatchdog, LoopLagMonitor
+from metrics import Metrics
+from rate_limit import ArrivalStampMiddleware, CoDelShedder, KeyedRateLimiter, queueing_delay
+from response_cache import ReadinessSignals, ResponseCache
+from webhook_auth import resolve_tenant, verify_webhook
+
+# Optional features import their modules only when enabled, see bench_startup.py
+if TYPE_CHECKING:
+    from event_store import EventStore
+
+logger = logging.getLogger(__name__)
+
+# The unauthenticated test route only reaches the live tail, never stats, alerts or storage
+TEST_SINKS = frozenset({"stream"})
+
+
+class WebhookPipeline:
+    """FastAPI app, dispatch stages and sinks of one webhook source"""
+
+    def __init__(
+        self,
+        source: str,
+        title: str,
+        description: str,
+        handlers: HandlerRegistry,
+        secret: str,
+        webhook_path: str,
+        test_path: str,
+        scope_field: str,
+        coalesce_field: str,
+        lane_keys: Sequence[str],
+        geo_events: Sequence[str],
+        shed_events: Sequence[str],
+        ack_messages: Dict[str, str],
+        test_data_at_root: bool = False,
+    ):
+        self.source = source
+        self.handlers = handlers
+        self.secret = secret
+        self.webhook_path = webhook_path
+        self.test_path = test_path
+        self.scope_field = scope_field
+        self.test_data_at_root = test_data_at_root
+
+        # Initialize FastAPI app
+        self.app = FastAPI(title=title, description=description, version="1.0.0")
+        self.app.add_middleware(ArrivalStampMiddleware)
+
+        self.metrics = Metrics()
+        self.source_limiter = KeyedRateLimiter(*SOURCE_RATE_LIMIT) if SOURCE_RATE_LIMIT else None
+        self.shedder = CoDelShedder(shed_events, target=SHED_TARGET_MS / 1000, interval=SHED_INTERVAL_MS / 1000)
+        self.tenant_registry = None
+        if TENANTS_FILE:
+            from tenants import TenantRegistry
+            self.tenant_registry = TenantRegistry(TENANTS_FILE, source)
+
+        # Declarative drop/handler/sink rules, compiled and hot-reloaded from a file
+        self.routing_rules = None
+        if ROUTING_RULES_FILE:
+            from routing_rules import RoutingRules
+            self.routing_rules = RoutingRules(ROUTING_RULES_FILE)
+
+        # Readiness signals and precomputed responses
+        self.readiness = ReadinessSignals()
+        self.response_cache = ResponseCache(
+            service=title,
+            running_message=f"{title} is running",
+            endpoints={
+                "webhook": f"POST {webhook_path}",
+                "test_webhook": f"POST {test_path}",
+                "tenant_webhook": f"POST /tenants/{{tenant_id}}{webhook_path}",
+                "health": "GET /health",
+                "metrics": "GET /metrics",
+                "event_history": "GET|DELETE /events/history?email=",
+                "top_k": "GET /stats/top?dimension=",
+                "deliverability": "GET /stats/deliverability",
+                "event_stream": "GET /events/stream",
+                "soft_bounces": "GET /stats/soft-bounces?email=",
+                "slow_handlers": "GET /stats/slow-handlers"
+            },
+            registry=handlers,
+            ack_messages=ack_messages,
+            signals=self.readiness,
+            max_queue_depth=HEALTH_MAX_QUEUE_DEPTH
+        )
+
+        # Append-only history of dispatched events, indexed by recipient
+        self.event_store: Optional["EventStore"] = None
+        if EVENT_STORE_DIR:
+            from event_store import EventStore
+            self.event_store = EventStore(EVENT_STORE_DIR, source)
+
+        # Streaming top-K of links, error codes, reasons and domains
+        self.heavy_hitters = HeavyHitters(scope_field, capacity=HEAVY_HITTERS_CAPACITY)
+
+        # Per-domain deliverability rates and threshold alerts
+        self.deliverability_alert = WebhookAlert(DELIVERABILITY_ALERT_URL) if DELIVERABILITY_ALERT_URL else None
+        self.deliverability = DeliverabilityMonitor(
+            thresholds=DELIVERABILITY_THRESHOLDS,
+            alert=self.deliverability_alert or (lambda alert: None),
+            min_volume=DELIVERABILITY_MIN_VOLUME,
+            max_domains=DELIVERABILITY_MAX_DOMAINS
+        )
+
+        # Country/ASN enrichment of opens and clicks from a shared mmap'd database
+        self.geo_enricher = None
+        if GEOIP_DB:
+            from geoip import GeoDatabase, GeoEnricher
+            self.geo_enricher = GeoEnricher(GeoDatabase(GEOIP_DB, cache_size=GEOIP_CACHE_SIZE), list(geo_events))
+
+        # Raw webhook bodies compressed with per-event-type zstd dictionaries
+        self.body_archive = None
+        if BODY_ARCHIVE_DIR:
+            from payload_compression import DictionaryCompressor, PayloadArchive
+            self.body_archive = PayloadArchive(
+                BODY_ARCHIVE_DIR,
+                source,
+                DictionaryCompressor(os.path.join(BODY_ARCHIVE_DIR, "dictionaries"), retrain_interval=BODY_ARCHIVE_RETRAIN_S)
+            )
+
+        # Live tail of dispatched events for /events/stream subscribers
+        self.event_stream = EventStream(EVENT_STREAM_BUFFER, max_subscribers=EVENT_STREAM_MAX_SUBSCRIBERS)
+
+        # Escalation of addresses that keep soft-bouncing, from a fixed-size decayed count-min sketch
+        self.soft_bounce_alert = WebhookAlert(SOFT_BOUNCE_ALERT_URL) if SOFT_BOUNCE_ALERT_URL else None
+        self.bounce_tracker = None
+        if SOFT_BOUNCE_THRESHOLD > 0:
+            from bounce_tracker import BounceTracker
+            self.bounce_tracker = BounceTracker(
+                threshold=SOFT_BOUNCE_THRESHOLD,
+                window_days=SOFT_BOUNCE_WINDOW_DAYS,
+                width=SOFT_BOUNCE_SKETCH_WIDTH,
+                exact_capacity=SOFT_BOUNCE_EXACT_CAPACITY,
+                escalate=self.escalate_soft_bounces,
+                snapshot_path=os.path.join(SOFT_BOUNCE_SNAPSHOT_DIR, f"{source}.cms") if SOFT_BOUNCE_SNAPSHOT_DIR else None
+            )
+
+        # Event-loop lag and slow-handler watchdog
+        self.loop_monitor = LoopLagMonitor(interval=LOOP_LAG_INTERVAL_MS / 1000)
+        self.handler_watchdog = HandlerWatchdog(budget=HANDLER_BUDGET_MS / 1000)
+
+        # Stats and storage stages are shared by all dispatch lanes
+        self.stage_lock = threading.Lock()
+
+        # Ordered lanes keyed by email or message_id, so events for one key never overtake each other
+        self.dispatcher = None
+        if DISPATCH_LANES > 0:
+            from sharded_dispatch import ShardedDispatcher
+            self.dispatcher = ShardedDispatcher(
+                DISPATCH_LANES,
+                self.run_handler,
+                key_fields=tuple(lane_keys),
+                max_pending=DISPATCH_MAX_PENDING,
+                signals=self.readiness
+            )
+
+        # Collapse repeated events for the same (campaign_id|message_id, email, event) inside a window
+        self.coalescer = (
+            EventCoalescer(COALESCE_WINDOWS, self.handle_event, group_field=coalesce_field, signals=self.readiness)
+            if COALESCE_WINDOWS else None
+        )
+        self._background_tasks = []
+
+        self._register_gauges()
+        self.app.add_event_handler("startup", self.start_background_tasks)
+        self.app.add_event_handler("shutdown", self.stop_background_tasks)
+        self._add_routes()
+
+    def _register_gauges(self):
+        """Gauges read when /metrics is requested"""
+        metrics = self.metrics
+        metrics.gauge("queue_depth", lambda: self.readiness.queue_depth)
+        metrics.gauge("handler_latency_ms", lambda: self.readiness.handler_latency_ms)
+        metrics.gauge("tenants", lambda: len(self.tenant_registry) if self.tenant_registry is not None else 0)
+        metrics.gauge("loop_lag_ms", self.loop_monitor.stats)
+        metrics.gauge("handlers", self.handler_watchdog.stats)
+        metrics.gauge("deliverability", self.deliverability.stats)
+        metrics.gauge("event_stream", self.event_stream.stats)
+        metrics.gauge("shedding", lambda: {"dropping": self.shedder.dropping, "queueing_delay_ms": self.shedder.last_delay * 1000})
+        metrics.gauge("rate_limited_sources", lambda: len(self.source_limiter) if self.source_limiter is not None else 0)
+        if self.coalescer is not None:
+            metrics.gauge("coalescing", self.coalescer.stats)
+        if self.event_store is not None:
+            metrics.gauge("event_store", self.event_store.stats)
+        if self.geo_enricher is not None:
+            metrics.gauge("geoip_cache", self.geo_enricher.database.cache_info)
+        if self.dispatcher is not None:
+            metrics.gauge("dispatch_lanes", self.dispatcher.stats)
+        if self.body_archive is not None:
+            metrics.gauge("body_archive", self.body_archive.stats)
+        if self.bounce_tracker is not None:
+            metrics.gauge("soft_bounces", self.bounce_tracker.stats)
+        if self.routing_rules is not None:
+            metrics.gauge("routing_rules", self.routing_rules.stats)
+
+    def resolve_tenant(self, request: Request):
+        """Tenant named by the route path or the X-Tenant-ID header, if any"""
+        return resolve_tenant(request, self.tenant_registry, self.metrics)
+
+    async def verify_webhook_signature(self, request: Request):
+        """Verify the Brevo webhook signature with the global or the tenant's secret"""
+        # The front router already checked the signature and the rate limits
+        router_token = request.headers.get("x-router-token")
+        if ROUTER_TRUST_TOKEN and router_token and hmac.compare_digest(router_token, ROUTER_TRUST_TOKEN):
+            request.state.tenant = self.resolve_tenant(request)
+            return await request.body()
+
+        body, request.state.tenant = await verify_webhook(
+            request, self.secret, self.tenant_registry, self.metrics, self.source_limiter
+        )
+        return body
+
+    def escalate_soft_bounces(self, escalation: Dict[str, Any]):
+        """Publish an escalation on /events/stream and POST it to the alert URL, if configured"""
+        self.event_stream.publish("soft_bounce_escalated", escalation)
+        if self.soft_bounce_alert is not None:
+            self.soft_bounce_alert(escalation)
+
+    def run_handler(self, event: str, data: Dict[str, Any], sinks: Optional[FrozenSet[str]] = None):
+        """Run the handler an event routes to, record it in its sinks and record readiness signals
+
+        sinks, if given, limits the sinks the event may reach on top of its routing rule.
+        """
+        rule = self.routing_rules.match(event, data) if self.routing_rules is not None else None
+        if rule is not None and rule.action == "drop":
+            return
+        if rule is not None:
+            sinks = rule.sinks if sinks is None else sinks & rule.sinks
+
+        handler = None
+        if rule is None or rule.action == "handler":
+            handler = rule.handler if rule is not None else None
+            if handler is None and self.tenant_registry is not None and "tenant_id" in data:
+                handler = self.tenant_registry.handler_for(data["tenant_id"], event)
+            if handler is None:
+                handler = self.handlers.get(event)
+            if handler is None:
+                logger.warning("⚠️ No handler found for %s event: %s", self.source, event)
+                return
+
+        if self.geo_enricher is not None:
+            self.geo_enricher.enrich(event, data)
+
+        if handler is not None:
+            self.readiness.adjust_depth(1)
+            started = time.perf_counter()
+            try:
+                self.handler_watchdog.invoke(event, handler, data)
+            finally:
+                self.readiness.adjust_depth(-1)
+                self.readiness.observe_latency((time.perf_counter() - started) * 1000)
+
+        with self.stage_lock:
+            if sinks is None or "stats" in sinks:
+                self.heavy_hitters.observe(event, data)
+                self.deliverability.observe(event, data)
+                if self.bounce_tracker is not None:
+                    self.bounce_tracker.observe(event, data)
+            if sinks is None or "stream" in sinks:
+                self.event_stream.publish(event, data)
+            if self.event_store is not None and (sinks is None or "event_store" in sinks) and (
+                self.tenant_registry is None or self.tenant_registry.sink_enabled(data.get("tenant_id"), "event_store")
+            ):
+                self.event_store.append(event, data)
+
+    def handle_event(self, event: str, data: Dict[str, Any], block: bool = False):
+        """Run the handler inline, or queue it on its key's dispatch lane
+
+        Only callers off the event loop may block on full lanes; the webhook
+        routes check lanes_full() before dispatching instead.
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.submit(event, data, block=block)
+        else:
+            self.run_handler(event, data)
+
+    def dispatch_event(self, event: str, data: Dict[str, Any], block: bool = False):
+        """Send an event through the dispatch stages to its handler"""
+        if self.coalescer is not None and self.coalescer.offer(event, data):
+            return
+        self.handle_event(event, data, block)
+
+    def dispatch_batch(self, events: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Dispatch already-verified (event, data) pairs without going through HTTP, waiting for lane space"""
+        count = 0
+        for event, data in events:
+            self.accept_event(event, data)
+            self.dispatch_event(event, data, block=True)
+            count += 1
+        return count
+
+    def accept_event(self, event: str, data: Dict[str, Any]):
+        """Record an acknowledged event's idempotency key, before any stage can coalesce, drop or filter it"""
+        if self.event_store is not None:
+            self.event_store.accept(event, data)
+
+    def lanes_full(self) -> bool:
+        return self.dispatcher is not None and self.dispatcher.full()
+
+    def flush_dispatch_stages(self):
+        """Emit pending coalesced records, drain the dispatch lanes and commit buffered event store rows"""
+        if self.coalescer is not None:
+            self.coalescer.flush_all()
+        if self.dispatcher is not None:
+            self.dispatcher.drain()
+        if self.event_store is not None:
+            self.event_store.flush()
+
+    async def start_background_tasks(self):
+        """Start the watchdog and the periodic flushers of the dispatch stages"""
+        self.handler_watchdog.start()
+        # Alerts raised on lane threads are posted from this loop
+        loop = asyncio.get_running_loop()
+        for alert in (self.deliverability_alert, self.soft_bounce_alert):
+            if alert is not None:
+                alert.bind(loop)
+        self._background_tasks.append(asyncio.create_task(self.loop_monitor.run()))
+        if self.coalescer is not None:
+            self._background_tasks.append(asyncio.create_task(self.coalescer.run()))
+        if self.event_store is not None:
+            self._background_tasks.append(asyncio.create_task(self.flush_event_store()))
+        if self.body_archive is not None:
+            self.body_archive.compressor.start()
+            self._background_tasks.append(asyncio.create_task(self.flush_body_archive()))
+        if self.bounce_tracker is not None and self.bounce_tracker.snapshot_path:
+            self._background_tasks.append(asyncio.create_task(self.snapshot_bounce_tracker()))
+
+    async def flush_event_store(self):
+        """Commit buffered event store index rows once per second, off the event loop"""
+        while True:
+            await asyncio.sleep(1)
+            await asyncio.to_thread(self.event_store.flush)
+
+    async def flush_body_archive(self):
+        """Write buffered archive records once per second, off the event loop"""
+        while True:
+            await asyncio.sleep(1)
+            await asyncio.to_thread(self.body_archive.flush)
+
+    async def snapshot_bounce_tracker(self):
+        """Write the soft-bounce tracker state periodically, off the event loop"""
+        while True:
+            await asyncio.sleep(SOFT_BOUNCE_SNAPSHOT_S)
+            with self.stage_lock:
+                state = self.bounce_tracker.snapshot_bytes()
+            await asyncio.to_thread(self.bounce_tracker.write_snapshot, state)
+
+    async def stop_background_tasks(self):
+        """Stop the periodic flushers and emit whatever is still pending"""
+        for task in self._background_tasks:
+            task.cancel()
+        self._background_tasks.clear()
+        self.handler_watchdog.stop()
+        self.flush_dispatch_stages()
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+        if self.event_store is not None:
+            self.event_store.close()
+        if self.body_archive is not None:
+            self.body_archive.compressor.stop()
+            self.body_archive.close()
+        if self.bounce_tracker is not None and self.bounce_tracker.snapshot_path:
+            self.bounce_tracker.write_snapshot(self.bounce_tracker.snapshot_bytes())
+
+    async def verify_admin_token(self, request: Request):
+        """Require ADMIN_TOKEN in the X-Admin-Token header"""
+        token = request.headers.get("x-admin-token")
+        if not ADMIN_TOKEN or not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Admin token required")
+
+    def require_event_store(self) -> "EventStore":
+        if self.event_store is None:
+            raise HTTPException(status_code=404, detail="Event store is not enabled")
+        return self.event_store
+
+    def _add_routes(self):
+        app = self.app
+        source = self.source
+        admin = [Depends(self.verify_admin_token)]
+
+        @app.post(self.test_path)
+        async def brevo_webhook_test(request: Request):
+            """Test webhook endpoint without signature verification"""
+            try:
+                # Parse JSON body
+                webhook_data = await request.json()
+                event = webhook_data.get("event")
+                # Transactional test payloads often carry the data at the root
+                data = webhook_data.get("data", webhook_data if self.test_data_at_root else {})
+
+                logger.info("🎯 Received Brevo %s webhook test event: %s", source, event)
+                logger.info("📊 Event data: %s", json.dumps(data, indent=2))
+
+                # Run the registered handler, if any, inline and without coalescing, stats or storage
+                self.run_handler(event, data, sinks=TEST_SINKS)
+
+                # Always respond with 200 OK to acknowledge receipt
+                return self.response_cache.ack(event, "test")
+
+            except Exception as e:
+                logger.error("❌ Error processing %s test webhook: %s", source, str(e))
+                raise HTTPException(status_code=500, detail="Internal server error")
+
+        @app.post(self.webhook_path)
+        @app.post(f"/tenants/{{tenant_id}}{self.webhook_path}")
+        async def brevo_webhook(request: Request, body: bytes = Depends(self.verify_webhook_signature)):
+            """Main webhook endpoint for Brevo events"""
+            try:
+                # Parse JSON body
+                webhook_data = json.loads(body.decode())
+                event = webhook_data.get("event")
+                data = webhook_data.get("data", {})
+
+                logger.info("🎯 Received Brevo %s webhook event: %s", source, event)
+                logger.info("📊 Event data: %s", json.dumps(data, indent=2))
+
+                # Scope the event to its tenant
+                tenant = request.state.tenant
+                tenant_label = tenant.id if tenant is not None else None
+                self.metrics.incr("webhook_events", tenant=tenant_label, event=event if event in self.handlers else "unknown")
+
+                # Turn intake away rather than block the event loop while the dispatch lanes are full
+                if self.lanes_full():
+                    logger.warning("🪫 Dispatch lanes full, deferring %s event", event)
+                    self.metrics.incr("webhook_rejected", tenant=tenant_label, reason="lanes_full")
+                    return JSONResponse(status_code=503, content={"detail": "Overloaded, retry later"}, headers={"Retry-After": "5"})
+
+                # Keep the verified raw body, including events shed or filtered below
+                if self.body_archive is not None:
+                    self.body_archive.append(str(event), body)
+
+                # Shed low-priority events while the measured queueing delay says we are overloaded
+                self.shedder.observe(queueing_delay(request.scope))
+                shed = self.shedder.should_shed(event)
+                if shed:
+                    logger.warning("🪫 Shedding %s event (%s), queueing delay %.1f ms", event, SHED_MODE, self.shedder.last_delay * 1000)
+                    self.metrics.incr("webhook_shed", tenant=tenant_label, event=event, mode=SHED_MODE)
+                    if SHED_MODE == "defer":
+                        return JSONResponse(status_code=503, content={"detail": "Overloaded, retry later"}, headers={"Retry-After": "30"})
+
+                # Acknowledged from here on, so reconciliation must never inject it again
+                self.accept_event(event, data)
+                if shed:
+                    return self.response_cache.ack(event)
+
+                if tenant is not None:
+                    data["tenant_id"] = tenant.id
+                    if not tenant.accepts(event):
+                        logger.info("⏭️ Tenant %s does not handle %s event: %s", tenant.id, source, event)
+                        self.metrics.incr("webhook_filtered", tenant=tenant_label)
+                        return self.response_cache.ack(event)
+
+                # Dispatch to the registered handler, if any
+                self.dispatch_event(event, data)
+
+                # Always respond with 200 OK to acknowledge receipt
+                return self.response_cache.ack(event)
+
+            except json.JSONDecodeError as e:
+                logger.error("❌ Invalid JSON in %s webhook payload: %s", source, str(e))
+                raise HTTPException(status_code=400, detail="Invalid JSON payload")
+            except Exception as e:
+                logger.error("❌ Error processing %s webhook: %s", source, str(e))
+                raise HTTPException(status_code=500, detail="Internal server error")
+
+        @app.get("/health")
+        async def health_check():
+            """Health check endpoint with readiness signals"""
+            return self.response_cache.health()
+
+        @app.get("/events/history", dependencies=admin)
+        async def event_history(email: str, limit: int = 1000):
+            """Every stored event for one recipient, across both apps"""
+            store = self.require_event_store()
+            events = await asyncio.to_thread(store.history, email, limit)
+            return JSONResponse(status_code=200, content={"email": email, "events": events})
+
+        @app.delete("/events/history", dependencies=admin)
+        async def erase_event_history(email: str):
+            """Erase a recipient's history and archived bodies; records leave the log on the next compaction"""
+            if self.event_store is None and self.body_archive is None:
+                self.require_event_store()
+            content: Dict[str, Any] = {"email": email, "erased": 0}
+            if self.event_store is not None:
+                content["erased"] = await asyncio.to_thread(self.event_store.erase, email)
+            if self.body_archive is not None:
+                content["bodies_erased"] = await asyncio.to_thread(self.body_archive.erase, email)
+            return JSONResponse(status_code=200, content=content)
+
+        @app.post("/events/compact", dependencies=admin)
+        async def compact_event_store():
+            """Rewrite this app's event log without erased records, in a worker thread so ingest keeps running"""
+            store = self.require_event_store()
+            result = await asyncio.to_thread(store.compact)
+            return JSONResponse(status_code=200, content=result)
+
+        @app.get("/events/stream", dependencies=admin)
+        async def stream_events(
+            event: Optional[str] = None,
+            scope: Optional[str] = Query(None, alias=self.scope_field),
+            domain: Optional[str] = None,
+        ):
+            """Server-Sent Events tail of dispatched events, filtered by event type, campaign_id/template_id and recipient domain"""
+            if self.event_stream.full():
+                raise HTTPException(status_code=503, detail="Too many stream subscribers")
+            stream_filter = StreamFilter(event, self.scope_field, scope, domain)
+            return StreamingResponse(
+                self.event_stream.subscribe(stream_filter),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        @app.get("/stats/top", dependencies=admin)
+        async def top_k(
+            dimension: str,
+            scope: Optional[str] = Query(None, alias=self.scope_field),
+            window_minutes: int = 60,
+            k: int = 10,
+        ):
+            """Top-K for link, error_code, reason or domain, per campaign_id/template_id or over a sliding window"""
+            try:
+                with self.stage_lock:
+                    result = self.heavy_hitters.query(dimension, scope=scope, window_minutes=window_minutes, k=k)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return JSONResponse(status_code=200, content=result)
+
+        @app.get("/stats/top/export", dependencies=admin)
+        async def export_top_k(window_minutes: int = 60):
+            """Serialized sketches, mergeable across workers with heavy_hitters.merge_exports"""
+            with self.stage_lock:
+                export = self.heavy_hitters.export(window_minutes)
+            return JSONResponse(status_code=200, content=export)
+
+        @app.get("/stats/deliverability", dependencies=admin)
+        async def deliverability_stats(domain: Optional[str] = None, limit: int = 20):
+            """Delivered/bounce/spam/blocked rates over 1, 5 and 60 minutes for one or the busiest domains"""
+            if domain is not None:
+                with self.stage_lock:
+                    stats = self.deliverability.domain_stats(domain)
+                if stats is None:
+                    raise HTTPException(status_code=404, detail="No events for this domain")
+                return JSONResponse(status_code=200, content=stats)
+            with self.stage_lock:
+                busiest = self.deliverability.busiest(limit)
+            return JSONResponse(status_code=200, content={"domains": busiest})
+
+        @app.get("/stats/soft-bounces", dependencies=admin)
+        async def soft_bounce_stats(email: str):
+            """Decayed soft-bounce count of one recipient: sketch estimate, and the exact count once a candidate"""
+            if self.bounce_tracker is None:
+                raise HTTPException(status_code=404, detail="Soft-bounce tracking is not enabled")
+            with self.stage_lock:
+                stats = self.bounce_tracker.lookup(email)
+            return JSONResponse(status_code=200, content=stats)
+
+        @app.get("/stats/slow-handlers", dependencies=admin)
+        async def slow_handlers():
+            """Recent over-budget handler calls with the stacks captured while they ran"""
+            return JSONResponse(status_code=200, content={"slow": self.handler_watchdog.slow_reports()})
+
+        @app.get("/metrics")
+        async def metrics_endpoint():
+            """Counters and gauges, labelled per tenant where applicable"""
+            return JSONResponse(status_code=200, content=self.metrics.snapshot())
+
+        @app.get("/")
+        async def root():
+            """Root endpoint with API information"""
+            return self.response_cache.root()
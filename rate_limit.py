@@ -0,0 +1,134 @@
+"""
+Rate limiting and load shedding for inbound webhook traffic
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+
+def parse_rate(spec: str) -> Optional[Tuple[float, float]]:
+    """Parse "rate,burst" (e.g. "100,200"); an empty spec disables the limit"""
+    if not spec.strip():
+        return None
+    rate, _, burst = spec.partition(",")
+    return float(rate), float(burst or rate)
+
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, holding at most burst tokens"""
+
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def allow(self, cost: float = 1.0, now: Optional[float] = None) -> bool:
+        """Take cost tokens if available"""
+        if now is None:
+            now = time.monotonic()
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+
+class KeyedRateLimiter:
+    """One token bucket per key (source IP, tenant), least recently used keys evicted"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            # A fresh bucket is full, so evicting an idle key never loosens the limit much
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.allow(now=now)
+
+
+class CoDelShedder:
+    """CoDel-style load shedder driven by measured queueing delay
+
+    The shedder enters the dropping state once the delay has stayed above
+    target for a whole interval. While dropping, it sheds one sheddable event
+    each time the next drop time comes due. That gap shrinks with
+    interval / sqrt(drop count), so shedding ramps up until the delay falls
+    back under target. Events outside the sheddable set are never shed.
+    """
+
+    def __init__(self, sheddable: Iterable[str], target: float = 0.005, interval: float = 0.1):
+        self.sheddable = frozenset(sheddable)
+        self.target = target
+        self.interval = interval
+        self.dropping = False
+        self.shed_count = 0
+        self._first_above: Optional[float] = None
+        self._drop_next = 0.0
+        self._count = 0
+        self.last_delay = 0.0
+
+    def observe(self, delay: float, now: Optional[float] = None):
+        """Record the queueing delay of one request"""
+        if now is None:
+            now = time.monotonic()
+        self.last_delay = delay
+        if delay < self.target:
+            self._first_above = None
+            self.dropping = False
+            return
+        if self._first_above is None:
+            self._first_above = now + self.interval
+        elif not self.dropping and now >= self._first_above:
+            self.dropping = True
+            # Resume near the previous drop rate if we were dropping recently
+            self._count = self._count - 2 if self._count > 2 and now - self._drop_next < 16 * self.interval else 1
+            self._drop_next = now
+
+    def should_shed(self, event: Optional[str], now: Optional[float] = None) -> bool:
+        """Whether this event should be shed under the current delay"""
+        if not self.dropping or event not in self.sheddable:
+            return False
+        if now is None:
+            now = time.monotonic()
+        if now < self._drop_next:
+            return False
+        self._count += 1
+        self.shed_count += 1
+        self._drop_next = now + self.interval / math.sqrt(self._count)
+        return True
+
+
+class ArrivalStampMiddleware:
+    """ASGI middleware recording when a request reached the app, for queueing delay"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope["arrived_at"] = time.monotonic()
+        await self.app(scope, receive, send)
+
+
+def queueing_delay(scope) -> float:
+    """Seconds since ArrivalStampMiddleware saw the request"""
+    arrived_at = scope.get("arrived_at")
+    return time.monotonic() - arrived_at if arrived_at is not None else 0.0
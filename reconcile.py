@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Gap reconciliation against the Brevo events API
+
+Pages through ``GET /smtp/statistics/events`` for a date range, one day at a
+time, with a bounded number of requests in flight over one pooled client.
+Each page is mapped like a backfill row, and its events are diffed by
+idempotency key against the keys the servers recorded when they accepted an
+event, whichever sinks it reached. Only events never accepted are injected,
+as signed POSTs to a running server's webhook, in page order. The server
+then handles them like any other delivery, and it stays the only writer of
+its event log and stats. Progress (the next offset per day) is saved after
+every page, so an interrupted run over a large range resumes where it
+stopped.
+
+The app is not imported: its webhook secret and port come from the same
+environment variables the app reads, and the events it handles from the
+running server's root endpoint. EVENT_STORE_DIR must be the servers'
+directory, since that is what "already accepted" is checked against. With
+``--tenant`` the events go to that tenant's webhook, signed with its secret
+from TENANTS_FILE.
+
+    BREVO_API_KEY=... EVENT_STORE_DIR=store python reconcile.py --start 2024-05-01 --end 2024-05-31
+    TENANTS_FILE=tenants.json EVENT_STORE_DIR=store python reconcile.py --tenant acme --start 2024-05-01 --end 2024-05-01
+    python reconcile.py --api-url http://127.0.0.1:8099/v3 --start 2024-05-01 --end 2024-05-01 --dry-run
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from backfill import map_row
+from config import EVENT_STORE_DIR, TENANTS_FILE
+from event_store import EventStore, idempotency_key
+from tenants import TenantRegistry
+
+logger = logging.getLogger("reconcile")
+
+EVENTS_PATH = "/smtp/statistics/events"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Per app: webhook path, secret variable and default, port variable and default (as the apps read them)
+APPS = {
+    "campaign": ("/webhook/brevo", "BREVO_WEBHOOK_SECRET", "your_webhook_secret_here", "PORT", "3000"),
+    "transactional": (
+        "/webhook/brevo/transactional",
+        "BREVO_TRANSACTIONAL_WEBHOOK_SECRET",
+        "your_transactional_webhook_secret_here",
+        "TRANSACTIONAL_PORT",
+        "3001",
+    ),
+}
+
+
+def days(start: str, end: str) -> List[str]:
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    if last < first:
+        raise ValueError("--end is before --start")
+    return [(first + timedelta(days=n)).isoformat() for n in range((last - first).days + 1)]
+
+
+class Progress:
+    """Next unprocessed offset per day, and which days are finished; rewritten atomically"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.days: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.days = json.load(f)
+
+    def get(self, day: str) -> Dict[str, Any]:
+        return self.days.get(day, {"offset": 0, "done": False})
+
+    def save(self, day: str, offset: int, done: bool = False):
+        self.days[day] = {"offset": offset, "done": done}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.days, f)
+        os.replace(tmp, self.path)
+
+
+class Reconciler:
+    """Fetches, diffs and injects the events of each day in the range"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        server: httpx.AsyncClient,
+        store: EventStore,
+        webhook_path: str,
+        secret: str,
+        supported: frozenset,
+        progress: Progress,
+        args,
+    ):
+        self.client = client
+        self.server = server
+        self.store = store
+        self.webhook_path = webhook_path
+        self.secret = secret
+        self.supported = supported
+        self.progress = progress
+        self.page_size = args.page_size
+        self.concurrency = args.concurrency
+        self.retries = args.retries
+        self.dry_run = args.dry_run
+        self.event_filter = args.event
+        self._slots = asyncio.Semaphore(args.concurrency)
+        self.totals = {"pages": 0, "fetched": 0, "unmapped": 0, "present": 0, "injected": 0}
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, what: str, **kwargs) -> httpx.Response:
+        """Send one request, retrying throttling and server errors with backoff"""
+        delay = 1.0
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                wait = float(response.headers.get("Retry-After") or delay)
+                reason = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                wait, reason = delay, str(e)
+            if attempt == self.retries:
+                raise RuntimeError(f"Giving up on {what}: {reason}")
+            logger.warning("⚠️ %s failed (%s), retrying in %.1fs", what, reason, wait)
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, 30.0)
+        raise RuntimeError(f"Giving up on {what}")
+
+    async def fetch(self, day: str, offset: int) -> List[Dict[str, Any]]:
+        """One page of events"""
+        params = {"startDate": day, "endDate": day, "limit": self.page_size, "offset": offset, "sort": "asc"}
+        if self.event_filter:
+            params["event"] = self.event_filter
+        async with self._slots:
+            response = await self.request(self.client, "GET", EVENTS_PATH, f"{day} offset {offset}", params=params)
+        return response.json().get("events") or []
+
+    async def inject(self, event: str, data: Dict[str, Any]):
+        """POST one event to the server's webhook, signed with the app's or the tenant's secret"""
+        body = json.dumps({"event": event, "data": data}).encode()
+        signature = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        headers = {"content-type": "application/json", "x-brevo-signature": signature}
+        await self.request(self.server, "POST", self.webhook_path, f"injecting a {event} event", content=body, headers=headers)
+
+    async def apply(self, rows: List[Dict[str, Any]]):
+        """Inject the rows of one page that no server has accepted"""
+        events: List[Tuple[str, Dict[str, Any]]] = []
+        for row in rows:
+            mapped = map_row(row, self.supported)
+            if mapped is None:
+                self.totals["unmapped"] += 1
+            else:
+                events.append(mapped)
+        keys = [idempotency_key(event, data) for event, data in events]
+        present = self.store.contains(keys)
+        missing: List[Tuple[str, Dict[str, Any]]] = []
+        for key, pair in zip(keys, events):
+            if key not in present:
+                # Guards against the same event appearing twice within a page
+                present.add(key)
+                missing.append(pair)
+        self.totals["pages"] += 1
+        self.totals["fetched"] += len(rows)
+        self.totals["present"] += len(events) - len(missing)
+        if not self.dry_run:
+            # One at a time, so the server sees each recipient's events in page order
+            for event, data in missing:
+                await self.inject(event, data)
+        self.totals["injected"] += len(missing)
+
+    async def reconcile_day(self, day: str):
+        state = self.progress.get(day)
+        if state["done"]:
+            logger.info("⏭️ %s already reconciled", day)
+            return
+        offset = state["offset"]
+        while True:
+            # Fetch a wave of consecutive pages concurrently, then apply them in order
+            offsets = [offset + n * self.page_size for n in range(self.concurrency)]
+            pages = await asyncio.gather(*(self.fetch(day, page_offset) for page_offset in offsets))
+            for page_offset, rows in zip(offsets, pages):
+                await self.apply(rows)
+                last = len(rows) < self.page_size
+                if not self.dry_run:
+                    self.progress.save(day, page_offset + len(rows), done=last)
+                if last:
+                    logger.info("📅 %s reconciled up to offset %d", day, page_offset + len(rows))
+                    return
+            offset = offsets[-1] + self.page_size
+
+    async def run(self, range_days: List[str]):
+        await asyncio.gather(*(self.reconcile_day(day) for day in range_days))
+
+
+async def supported_events(server: httpx.AsyncClient) -> frozenset:
+    """Events the running app has handlers for, from its root endpoint"""
+    try:
+        response = await server.get("/")
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        raise SystemExit(f"❌ Cannot read the supported events from {server.base_url}: {e}")
+    return frozenset(response.json()["supported_events"])
+
+
+def webhook_target(app: str, tenant_id: Optional[str] = None) -> Tuple[str, str]:
+    """Webhook path and signing secret of the app, or of one of its tenants"""
+    webhook_path, secret_variable, default_secret, _, _ = APPS[app]
+    if not tenant_id:
+        return webhook_path, os.getenv(secret_variable, default_secret)
+    if not TENANTS_FILE:
+        raise SystemExit("❌ --tenant needs TENANTS_FILE to look up the tenant's secret")
+    tenant = TenantRegistry(TENANTS_FILE, app).get(tenant_id)
+    if tenant is None:
+        raise SystemExit(f"❌ No tenant {tenant_id} with a {app} secret in {TENANTS_FILE}")
+    return f"/tenants/{tenant.id}{webhook_path}", tenant.secret
+
+
+async def run(args) -> Dict[str, Any]:
+    if not EVENT_STORE_DIR:
+        raise SystemExit("❌ EVENT_STORE_DIR must point at the servers' event store to diff against it")
+    webhook_path, secret = webhook_target(args.app, args.tenant)
+    _, _, _, port_variable, default_port = APPS[args.app]
+    server_url = args.server_url or f"http://127.0.0.1:{os.getenv(port_variable, default_port)}"
+
+    headers = {"accept": "application/json"}
+    if args.api_key:
+        headers["api-key"] = args.api_key
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    started = time.perf_counter()
+    store = EventStore(EVENT_STORE_DIR, args.app)
+    try:
+        async with httpx.AsyncClient(base_url=args.api_url, headers=headers, limits=limits, timeout=args.timeout) as client, \
+                httpx.AsyncClient(base_url=server_url, limits=limits, timeout=args.timeout) as server:
+            supported = await supported_events(server)
+            reconciler = Reconciler(client, server, store, webhook_path, secret, supported, Progress(args.progress), args)
+            await reconciler.run(days(args.start, args.end))
+    finally:
+        store.close()
+    return {**reconciler.totals, "seconds": time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inject events the servers never accepted from the Brevo events API")
+    parser.add_argument("--start", required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="last day, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--app", choices=sorted(APPS), default="transactional")
+    parser.add_argument("--api-url", default=os.getenv("BREVO_API_URL", "https://api.brevo.com/v3"))
+    parser.add_argument("--api-key", default=os.getenv("BREVO_API_KEY", ""))
+    parser.add_argument("--server-url", help="running app to inject into; default http://127.0.0.1:<the app's port>")
+    parser.add_argument("--tenant", help="inject into this tenant's webhook, signed with its secret from TENANTS_FILE")
+    parser.add_argument("--event", help="only reconcile one API event type, e.g. hardBounces")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight")
+    parser.add_argument("--page-size", type=int, default=2500)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--progress", default="reconcile.progress.json")
+    parser.add_argument("--dry-run", action="store_true", help="count missing events without dispatching them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = asyncio.run(run(args))
+    verb = "would be injected" if args.dry_run else "injected"
+    print(
+        f"✨ Reconciliation complete: {result['fetched']} events fetched in {result['pages']} pages, "
+        f"{result['present']} already accepted, {result['injected']} {verb}, {result['unmapped']} unmapped "
+        f"({result['seconds']:.1f}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
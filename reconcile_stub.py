@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Brevo events API, for exercising reconcile.py
+
+Serves ``GET /v3/smtp/statistics/events`` from a JSONL file of API-shaped
+events (``email``, ``date``, ``messageId``, ``event``, ...), with the same
+startDate/endDate/event/limit/offset/sort parameters. ``--error-rate``
+answers a share of requests with 429 to exercise the retry path.
+
+    python reconcile_stub.py events.jsonl --port 8099
+"""
+import argparse
+import json
+import random
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+
+def create_app(events: List[Dict[str, Any]], error_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Brevo events API stub")
+    ordered = sorted(events, key=lambda row: str(row.get("date", "")))
+    app.state.requests = 0
+
+    @app.get("/v3/smtp/statistics/events")
+    async def list_events(
+        startDate: Optional[str] = None,
+        endDate: Optional[str] = None,
+        event: Optional[str] = None,
+        limit: int = Query(2500, le=5000),
+        offset: int = 0,
+        sort: str = "desc",
+    ):
+        app.state.requests += 1
+        if error_rate and random.random() < error_rate:
+            return JSONResponse(status_code=429, content={"message": "Too many requests"}, headers={"Retry-After": "0"})
+        rows = [
+            row for row in ordered
+            if (startDate is None or str(row.get("date", ""))[:10] >= startDate)
+            and (endDate is None or str(row.get("date", ""))[:10] <= endDate)
+            and (event is None or row.get("event") == event)
+        ]
+        if sort == "desc":
+            rows.reverse()
+        page = rows[offset:offset + limit]
+        # Like the real API, an empty result has no "events" key
+        return {"events": page} if page else {}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a JSONL file as the Brevo events API")
+    parser.add_argument("events", help="JSONL file of API-shaped events")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429")
+    args = parser.parse_args()
+
+    with open(args.events) as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    import uvicorn
+    uvicorn.run(create_app(events, args.error_rate), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
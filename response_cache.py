@@ -0,0 +1,121 @@
+"""
+Precomputed response bodies for the root, health and acknowledgement responses
+"""
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+from handler_registry import HandlerRegistry
+
+
+def _dumps(content: Any) -> bytes:
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class ReadinessSignals:
+    """Readiness state maintained incrementally by the dispatch path"""
+
+    def __init__(self, latency_alpha: float = 0.2):
+        self.queue_depth = 0
+        self.handler_latency_ms = 0.0
+        self.dispatched = 0
+        self._latency_alpha = latency_alpha
+        # Dispatch lanes update the signals from their own threads
+        self._lock = threading.Lock()
+
+    def adjust_depth(self, delta: int):
+        """Add delta to the number of events accepted but not yet handled"""
+        with self._lock:
+            self.queue_depth += delta
+
+    def observe_latency(self, latency_ms: float):
+        """Fold one handler call's duration into the exponentially weighted handler latency"""
+        with self._lock:
+            self.dispatched += 1
+            self.handler_latency_ms += self._latency_alpha * (latency_ms - self.handler_latency_ms)
+
+
+class ResponseCache:
+    """Serialized bytes for the static responses of one webhook app"""
+
+    def __init__(
+        self,
+        service: str,
+        running_message: str,
+        endpoints: Dict[str, str],
+        registry: HandlerRegistry,
+        ack_messages: Dict[str, str],
+        signals: ReadinessSignals,
+        max_queue_depth: int = 0,
+    ):
+        self.service = service
+        self.running_message = running_message
+        self.endpoints = endpoints
+        self.registry = registry
+        self.signals = signals
+        self.max_queue_depth = max_queue_depth
+        self._service_json = _dumps(service)
+        self._ack_prefixes = {
+            kind: _dumps({"success": True, "message": message})[:-1] + b',"event":'
+            for kind, message in ack_messages.items()
+        }
+        self._registry_version = -1
+        self._root: bytes = b""
+        self._acks: Dict[str, Dict[str, bytes]] = {}
+        self._health_second = -1
+        self._health_timestamp = ""
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute every body that depends on the handler registry"""
+        self._root = _dumps({
+            "message": self.running_message,
+            "endpoints": self.endpoints,
+            "supported_events": list(self.registry.keys()),
+        })
+        self._acks = {
+            kind: {event: self._render_ack(kind, event) for event in self.registry}
+            for kind in self._ack_prefixes
+        }
+        self._registry_version = self.registry.version
+
+    def _check_registry(self):
+        if self._registry_version != self.registry.version:
+            self.rebuild()
+
+    def _render_ack(self, kind: str, event: Optional[str]) -> bytes:
+        return self._ack_prefixes[kind] + _dumps(event) + b"}"
+
+    def root(self) -> Response:
+        self._check_registry()
+        return Response(content=self._root, media_type="application/json")
+
+    def ack(self, event: Optional[str], kind: str = "webhook") -> Response:
+        """200 acknowledgement carrying the event name"""
+        self._check_registry()
+        body = self._acks[kind].get(event) if isinstance(event, str) else None
+        if body is None:
+            body = self._render_ack(kind, event)
+        return Response(content=body, media_type="application/json")
+
+    def health(self) -> Response:
+        """Health body with readiness signals; the timestamp is formatted once per second"""
+        now = time.time()
+        second = int(now)
+        if second != self._health_second:
+            self._health_second = second
+            self._health_timestamp = datetime.fromtimestamp(second).isoformat()
+        signals = self.signals
+        ready = not self.max_queue_depth or signals.queue_depth <= self.max_queue_depth
+        body = b'{"status":"%s","timestamp":"%s","service":%s,"queue_depth":%d,"handler_latency_ms":%.3f}' % (
+            b"OK" if ready else b"DEGRADED",
+            self._health_timestamp.encode(),
+            self._service_json,
+            signals.queue_depth,
+            signals.handler_latency_ms,
+        )
+        return Response(content=body, status_code=200 if ready else 503, media_type="application/json")
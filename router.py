@@ -0,0 +1,260 @@
+"""
+Front router that spreads webhooks across app nodes by consistent hashing
+
+The router verifies the signature and applies the rate limits, once. It then
+forwards the raw body to the node that owns the event's key on a hash ring
+with virtual nodes: ``email`` for campaign events, ``message_id`` for
+transactional ones. All events for one recipient or message therefore land
+on the same node, and their per-key state stays on that node. Forwarded
+requests carry ``X-Router-Token``. Nodes started with the same
+ROUTER_TRUST_TOKEN accept them without checking the signature again.
+
+Nodes that stop answering health checks leave the ring, and they rejoin once
+they answer again. Only the keys of the node that left move. The node list
+can also be replaced at runtime through ``PUT /router/nodes``.
+
+    ROUTER_APP=campaign ROUTER_NODES=http://127.0.0.1:3100,http://127.0.0.1:3101 uvicorn router:app --port 3000
+"""
+from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi.responses import JSONResponse, Response
+import asyncio
+import bisect
+import hashlib
+import hmac
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from config import ADMIN_TOKEN, ROUTER_TRUST_TOKEN, SOURCE_RATE_LIMIT, TENANTS_FILE
+from metrics import Metrics
+from rate_limit import KeyedRateLimiter
+from tenants import TenantRegistry
+from webhook_auth import verify_webhook
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# app kind -> (webhook path, secret variable, default secret, key fields)
+ROUTED_APPS = {
+    "campaign": ("/webhook/brevo", "BREVO_WEBHOOK_SECRET", "your_webhook_secret_here", ("email",)),
+    "transactional": (
+        "/webhook/brevo/transactional",
+        "BREVO_TRANSACTIONAL_WEBHOOK_SECRET",
+        "your_transactional_webhook_secret_here",
+        ("message_id", "email"),
+    ),
+}
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes; membership changes move only the affected keys"""
+
+    def __init__(self, nodes: List[str] = (), vnodes: int = 128):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def shares(self) -> Dict[str, float]:
+        """Fraction of the hash space owned by each node"""
+        shares = {node: 0.0 for node in self.nodes}
+        full = float(1 << 64)
+        for index, point in enumerate(self._points):
+            previous = self._points[index - 1] if index else self._points[-1] - (1 << 64)
+            shares[self._owners[index]] += (point - previous) / full
+        return shares
+
+
+# Configuration
+ROUTER_APP = os.getenv("ROUTER_APP", "campaign")  # campaign or transactional
+WEBHOOK_PATH, SECRET_VARIABLE, DEFAULT_SECRET, KEY_FIELDS = ROUTED_APPS[ROUTER_APP]
+BREVO_WEBHOOK_SECRET = os.getenv(SECRET_VARIABLE, DEFAULT_SECRET)
+ROUTER_NODES = [node.strip().rstrip("/") for node in os.getenv("ROUTER_NODES", "").split(",") if node.strip()]
+ROUTER_VNODES = int(os.getenv("ROUTER_VNODES", 128))  # ring points per node
+ROUTER_HEALTH_INTERVAL = float(os.getenv("ROUTER_HEALTH_INTERVAL", 2))  # seconds between node health checks
+ROUTER_MAX_CONNECTIONS = int(os.getenv("ROUTER_MAX_CONNECTIONS", 100))  # pooled keep-alive connections
+
+if BREVO_WEBHOOK_SECRET == DEFAULT_SECRET:
+    logger.warning("⚠️ Using default webhook secret! Please set %s in your .env file or environment variables.", SECRET_VARIABLE)
+if not ROUTER_TRUST_TOKEN:
+    logger.warning("⚠️ ROUTER_TRUST_TOKEN is not set; nodes will verify every forwarded signature again.")
+
+# Initialize FastAPI app
+app = FastAPI(
+    title="Brevo Webhook Router",
+    description=f"Consistent-hash front router for the Brevo {ROUTER_APP} webhook nodes",
+    version="1.0.0"
+)
+
+metrics = Metrics()
+source_limiter = KeyedRateLimiter(*SOURCE_RATE_LIMIT) if SOURCE_RATE_LIMIT else None
+tenant_registry = TenantRegistry(TENANTS_FILE, ROUTER_APP) if TENANTS_FILE else None
+ring = HashRing(ROUTER_NODES, vnodes=ROUTER_VNODES)
+members: List[str] = list(ROUTER_NODES)  # configured nodes, healthy or not
+client: Optional[httpx.AsyncClient] = None
+_background_tasks = []
+
+metrics.gauge("ring", lambda: {"members": len(members), "healthy": len(ring.nodes)})
+
+
+def route_key(data: Dict[str, Any]) -> str:
+    for field in KEY_FIELDS:
+        value = data.get(field)
+        if value:
+            return str(value).strip().lower()
+    return ""
+
+
+async def verify_webhook_signature(request: Request):
+    """Verify Brevo webhook signature with the global or the tenant's secret"""
+    # Tenant limits are enforced here, once, rather than per node
+    body, _ = await verify_webhook(request, BREVO_WEBHOOK_SECRET, tenant_registry, metrics, source_limiter)
+    return body
+
+async def check_nodes():
+    """Take unreachable nodes off the ring and put recovered ones back"""
+    while True:
+        await asyncio.sleep(ROUTER_HEALTH_INTERVAL)
+        for node in list(members):
+            try:
+                # A degraded (503) node is still reachable and keeps its keys
+                await client.get(f"{node}/health", timeout=ROUTER_HEALTH_INTERVAL)
+                healthy = True
+            except httpx.HTTPError:
+                healthy = False
+            if healthy and node not in ring.nodes:
+                ring.add(node)
+                logger.info("🟢 Node %s rejoined the ring", node)
+            elif not healthy and node in ring.nodes:
+                ring.remove(node)
+                logger.warning("🔴 Node %s left the ring after a failed health check", node)
+
+async def start_router():
+    """Open the pooled client and start health checking the nodes"""
+    global client
+    limits = httpx.Limits(max_connections=ROUTER_MAX_CONNECTIONS, max_keepalive_connections=ROUTER_MAX_CONNECTIONS)
+    client = httpx.AsyncClient(limits=limits, timeout=10.0)
+    _background_tasks.append(asyncio.create_task(check_nodes()))
+    logger.info("🧭 Routing %s webhooks across %d nodes", ROUTER_APP, len(ring.nodes))
+
+async def stop_router():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    if client is not None:
+        await client.aclose()
+
+app.add_event_handler("startup", start_router)
+app.add_event_handler("shutdown", stop_router)
+
+async def forward(request: Request, body: bytes) -> Response:
+    """Send a verified webhook to the node owning its key and relay the node's answer"""
+    try:
+        webhook_data = json.loads(body.decode())
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    data = webhook_data.get("data") if isinstance(webhook_data, dict) else None
+    node = ring.node_for(route_key(data if isinstance(data, dict) else {}))
+    if node is None:
+        metrics.incr("webhook_forward_failed", reason="no_nodes")
+        return JSONResponse(status_code=503, content={"detail": "No webhook nodes available"}, headers={"Retry-After": "30"})
+
+    headers = {"content-type": "application/json"}
+    if ROUTER_TRUST_TOKEN:
+        headers["x-router-token"] = ROUTER_TRUST_TOKEN
+    else:
+        headers["x-brevo-signature"] = request.headers.get("x-brevo-signature", "")
+    if "x-tenant-id" in request.headers:
+        headers["x-tenant-id"] = request.headers["x-tenant-id"]
+    try:
+        response = await client.post(f"{node}{request.url.path}", content=body, headers=headers)
+    except httpx.HTTPError as e:
+        # Answer 503 so Brevo retries; failing over would split the key across nodes
+        logger.error("❌ Failed to forward webhook to %s: %s", node, str(e))
+        metrics.incr("webhook_forward_failed", node=node, reason="unreachable")
+        return JSONResponse(status_code=503, content={"detail": "Webhook node unavailable"}, headers={"Retry-After": "30"})
+    metrics.incr("webhook_forwarded", node=node, status=response.status_code)
+    relayed = {name: value for name, value in response.headers.items() if name in ("content-type", "retry-after")}
+    return Response(content=response.content, status_code=response.status_code, headers=relayed)
+
+@app.post(WEBHOOK_PATH)
+@app.post("/tenants/{tenant_id}" + WEBHOOK_PATH)
+async def route_webhook(request: Request, body: bytes = Depends(verify_webhook_signature)):
+    """Forward a verified Brevo webhook to the node that owns its key"""
+    return await forward(request, body)
+
+async def verify_admin_token(request: Request):
+    """Require ADMIN_TOKEN in the X-Admin-Token header"""
+    token = request.headers.get("x-admin-token")
+    if not ADMIN_TOKEN or not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/router/nodes", dependencies=[Depends(verify_admin_token)])
+async def list_nodes():
+    """Configured nodes, the healthy ones on the ring and each one's share of the keys"""
+    return JSONResponse(status_code=200, content={"members": members, "ring": ring.shares()})
+
+@app.put("/router/nodes", dependencies=[Depends(verify_admin_token)])
+async def replace_nodes(request: Request):
+    """Replace the node list; only keys of added or removed nodes move"""
+    try:
+        body = await request.json()
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(body, list) or not all(isinstance(node, str) and node.strip() for node in body):
+        raise HTTPException(status_code=400, detail="Expected a JSON list of node URLs")
+    nodes = [node.strip().rstrip("/") for node in body]
+    for node in list(members):
+        if node not in nodes:
+            members.remove(node)
+            ring.remove(node)
+    for node in nodes:
+        if node not in members:
+            members.append(node)
+            ring.add(node)
+    logger.info("🧭 Router membership is now %s", ", ".join(members))
+    return JSONResponse(status_code=200, content={"members": members, "ring": ring.shares()})
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Forwarded and rejected counts per node and reason"""
+    return JSONResponse(status_code=200, content=metrics.snapshot())
+
+@app.get("/health")
+async def health_check():
+    status_code = 200 if ring.nodes else 503
+    return JSONResponse(status_code=status_code, content={"status": "healthy" if ring.nodes else "NO_NODES", "nodes": len(ring.nodes)})
@@ -0,0 +1,204 @@
+"""
+Declarative routing rules: drop events, hand them to another handler, or record them in selected sinks only
+
+The rules file is JSON, re-read whenever its modification time changes:
+
+    {
+      "rules": [
+        {"name": "ignore-gmail-opens", "events": ["opened"], "match": {"domain": "gmail.com"}, "action": "drop"},
+        {"name": "vip-bounces", "events": ["hard_bounced", "soft_bounced"], "match": {"tags": "vip"},
+         "action": "handler", "handler": "acme_hooks:on_vip_bounce"},
+        {"name": "archive-550", "match": {"error_code": [550, 551]}, "action": "sink", "sinks": ["event_store"]}
+      ]
+    }
+
+Rules are tried in file order and the first match wins; events that no rule
+matches are dispatched as usual. A rule matches when every field in ``match``
+equals one of the listed values. ``domain`` is the recipient's domain, and
+list fields such as ``tags`` match when any element does. A rule without
+``events`` applies to every event type. Sinks are ``stats`` (top-K,
+deliverability, soft bounces), ``stream`` and ``event_store``.
+
+Loading compiles the rules per event type, then per field: each field maps a
+value to the bitset of rules requiring it, next to the bitset of rules that
+ignore the field. Matching ANDs one bitset per field and takes the lowest set
+bit, so the cost follows the number of fields in use, not the number of rules.
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from handler_registry import Handler, import_handler
+from heavy_hitters import recipient_domain
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("handler", "sink", "drop")
+SINKS = frozenset({"stats", "stream", "event_store"})
+
+Value = Union[str, int, float, bool]
+
+
+class RuleConfig(BaseModel):
+    name: Optional[str] = None
+    events: Optional[List[str]] = None  # None applies to every event
+    match: Dict[str, Union[Value, List[Value]]] = {}
+    action: str
+    handler: Optional[str] = None  # "module:function", for the handler action
+    sinks: Optional[List[str]] = None  # sinks that still record the event; default all
+
+
+class Rule:
+    """One compiled rule and its hit counter"""
+
+    def __init__(self, config: RuleConfig, position: int):
+        if config.action not in ACTIONS:
+            raise ValueError(f"Unknown action {config.action!r}")
+        if config.action == "handler" and not config.handler:
+            raise ValueError("The handler action needs a handler")
+        if config.action == "sink" and not config.sinks:
+            raise ValueError("The sink action needs sinks")
+        unknown = set(config.sinks or ()) - SINKS
+        if unknown:
+            raise ValueError(f"Unknown sinks: {', '.join(sorted(unknown))}")
+        self.name = config.name or f"rule{position}"
+        self.action = config.action
+        self.handler: Optional[Handler] = import_handler(config.handler) if config.action == "handler" else None
+        self.sinks = frozenset(config.sinks) if config.sinks is not None else SINKS
+        self.hits = 0
+
+
+def _key(field: str, value: Any) -> str:
+    return str(value).lower() if field == "domain" else str(value)
+
+
+def _field_value(field: str, data: Dict[str, Any]) -> Any:
+    if field == "domain":
+        return recipient_domain(data.get("email"))
+    return data.get(field)
+
+
+class EventIndex:
+    """Rules that apply to one event type, indexed by field"""
+
+    __slots__ = ("rules", "fields")
+
+    def __init__(self, rules: List[Tuple[int, RuleConfig]]):
+        self.rules = 0
+        for bit, _ in rules:
+            self.rules |= 1 << bit
+        fields: Dict[str, Tuple[Dict[str, int], int]] = {}
+        for field in {field for _, config in rules for field in config.match}:
+            values: Dict[str, int] = {}
+            unconstrained = 0
+            for bit, config in rules:
+                if field not in config.match:
+                    unconstrained |= 1 << bit
+                    continue
+                wanted = config.match[field]
+                for value in wanted if isinstance(wanted, list) else [wanted]:
+                    key = _key(field, value)
+                    values[key] = values.get(key, 0) | (1 << bit)
+            fields[field] = (values, unconstrained)
+        # Fields that most rules constrain go first; they empty the candidate set soonest
+        self.fields: List[Tuple[str, Dict[str, int], int]] = sorted(
+            ((field, values, unconstrained) for field, (values, unconstrained) in fields.items()),
+            key=lambda entry: bin(entry[2]).count("1"),
+        )
+
+    def match(self, data: Dict[str, Any]) -> int:
+        """Bitset of the rules whose every field matches"""
+        candidates = self.rules
+        for field, values, unconstrained in self.fields:
+            value = _field_value(field, data)
+            if isinstance(value, list):
+                bits = 0
+                for element in value:
+                    bits |= values.get(_key(field, element), 0)
+            else:
+                bits = values.get(_key(field, value), 0) if value is not None else 0
+            candidates &= bits | unconstrained
+            if not candidates:
+                return 0
+        return candidates
+
+
+def compile_rules(configs: List[RuleConfig]) -> Tuple[List[Rule], Dict[str, EventIndex], Optional[EventIndex]]:
+    """Compiled rules, per-event indexes and the index for events no rule names"""
+    rules = [Rule(config, position) for position, config in enumerate(configs)]
+    wildcard = [(bit, config) for bit, config in enumerate(configs) if config.events is None]
+    named = {event for config in configs for event in config.events or ()}
+    indexes = {
+        event: EventIndex([(bit, config) for bit, config in enumerate(configs) if config.events is None or event in config.events])
+        for event in named
+    }
+    return rules, indexes, EventIndex(wildcard) if wildcard else None
+
+
+class RoutingRules:
+    """First-match routing rules for one app, hot-reloaded from a file"""
+
+    def __init__(self, path: str, reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        # (rules, per-event indexes, wildcard index), replaced as a whole so lanes never see a mix
+        self._compiled: Tuple[List[Rule], Dict[str, EventIndex], Optional[EventIndex]] = ([], {}, None)
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._compiled[0])
+
+    def match(self, event: str, data: Dict[str, Any]) -> Optional[Rule]:
+        """First rule matching the event; checks the file for changes at most once per reload_interval"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.maybe_reload()
+        rules, indexes, wildcard = self._compiled
+        index = indexes.get(event, wildcard)
+        if index is None:
+            return None
+        candidates = index.match(data)
+        if not candidates:
+            return None
+        rule = rules[(candidates & -candidates).bit_length() - 1]
+        rule.hits += 1
+        return rule
+
+    def maybe_reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logger.error("❌ Cannot stat routing rules %s: %s", self.path, str(e))
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def reload(self):
+        """Recompile the rules; a broken file keeps the previous rules"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path) as f:
+                raw = json.load(f)
+            started = time.perf_counter()
+            compiled = compile_rules([RuleConfig(**entry) for entry in raw.get("rules", [])])
+        except Exception as e:
+            logger.error("❌ Failed to load routing rules %s: %s", self.path, str(e))
+            return
+        self._compiled = compiled
+        self._mtime = mtime
+        logger.info("🧭 Compiled %d routing rules from %s in %.1f ms", len(compiled[0]), self.path, (time.perf_counter() - started) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        hits: Dict[str, int] = {action: 0 for action in ACTIONS}
+        rules = self._compiled[0]
+        for rule in rules:
+            hits[rule.action] += rule.hits
+        top = sorted((rule for rule in rules if rule.hits), key=lambda rule: rule.hits, reverse=True)[:10]
+        return {"rules": len(rules), "hits": hits, "top": {rule.name: rule.hits for rule in top}}
@@ -0,0 +1,195 @@
+"""
+Key-ordered parallel dispatch across a fixed set of lane threads
+
+Every event is hashed by its key (``email`` for campaigns, ``message_id`` for
+transactional mail) into one of ``lanes * slots_per_lane`` slots. A slot is a
+FIFO queue, and at most one lane runs a slot at a time, so the events of one
+key are handled strictly in arrival order while different keys run in
+parallel. Each lane has a ready list of its slots that have work. A lane with
+nothing ready steals a whole ready slot from the busiest lane. A slot that
+still has events after a batch goes back on the ready list of the lane that
+ran it, so a stolen slot stays with the thief until it runs dry; only when new
+events arrive for an empty slot is it readied on its home lane again.
+Because stealing moves whole slot queues and never single events, it cannot
+reorder a key.
+
+Callers off the event loop (backfill, reconciliation) block in submit() while
+``max_pending`` events are queued. Callers on the loop must not block, so
+they pass ``block=False`` and check full() first to turn intake away.
+"""
+import logging
+import threading
+import zlib
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from response_cache import ReadinessSignals
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedDispatcher:
+    """Runs run(event, data) on lane threads with strict ordering per key"""
+
+    def __init__(
+        self,
+        lanes: int,
+        run: Callable[[str, Dict[str, Any]], None],
+        key_fields: Sequence[str],
+        slots_per_lane: int = 64,
+        batch: int = 32,
+        max_pending: int = 10_000,
+        signals: Optional[ReadinessSignals] = None,
+    ):
+        self.lanes = lanes
+        self.run = run
+        self.key_fields = tuple(key_fields)
+        self.slots = lanes * slots_per_lane
+        self.batch = batch
+        self.max_pending = max_pending
+        self.signals = signals
+        self._queues: List[Deque[Tuple[str, Dict[str, Any]]]] = [deque() for _ in range(self.slots)]
+        self._claimed = [False] * self.slots
+        self._ready: List[Deque[int]] = [deque() for _ in range(lanes)]
+        self._lock = threading.Lock()
+        self._wake = [threading.Condition(self._lock) for _ in range(lanes)]
+        self._space = threading.Condition(self._lock)
+        self._idle: Set[int] = set()
+        self._pending = 0
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self.submitted = [0] * lanes
+        self.processed = [0] * lanes
+        self.stolen = [0] * lanes
+        self.errors = 0
+
+    def key(self, data: Dict[str, Any]) -> str:
+        for field in self.key_fields:
+            value = data.get(field)
+            if value:
+                return str(value).strip().lower()
+        return ""
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._lane, args=(lane,), name=f"dispatch-lane-{lane}", daemon=True)
+                for lane in range(self.lanes)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def full(self) -> bool:
+        return self._pending >= self.max_pending
+
+    def submit(self, event: str, data: Dict[str, Any], block: bool = True):
+        """Queue one event on its key's slot; with block, waits while max_pending events are queued"""
+        if not self._threads:
+            self.start()
+        slot = zlib.crc32(self.key(data).encode()) % self.slots
+        with self._lock:
+            while block and self._pending >= self.max_pending:
+                self._space.wait()
+            queue = self._queues[slot]
+            queue.append((event, data))
+            self._pending += 1
+            owner = slot % self.lanes
+            self.submitted[owner] += 1
+            if len(queue) == 1 and not self._claimed[slot]:
+                self._ready[owner].append(slot)
+                # Wake the owner, or failing that any idle lane, which will steal the slot
+                if owner in self._idle:
+                    self._wake[owner].notify()
+                elif self._idle:
+                    self._wake[next(iter(self._idle))].notify()
+        if self.signals is not None:
+            self.signals.adjust_depth(1)
+
+    def _next_slot(self, lane: int) -> Optional[int]:
+        if self._ready[lane]:
+            return self._ready[lane].popleft()
+        victim = max(range(self.lanes), key=lambda other: len(self._ready[other]))
+        if not self._ready[victim]:
+            return None
+        # Take the most recently readied slot; the victim keeps working from the front
+        slot = self._ready[victim].pop()
+        self.stolen[lane] += 1
+        return slot
+
+    def _lane(self, lane: int):
+        self._lock.acquire()
+        try:
+            while True:
+                slot = self._next_slot(lane)
+                if slot is None:
+                    if self._stopping:
+                        return
+                    self._idle.add(lane)
+                    self._wake[lane].wait()
+                    self._idle.discard(lane)
+                    continue
+                self._claimed[slot] = True
+                queue = self._queues[slot]
+                batch = [queue.popleft() for _ in range(min(self.batch, len(queue)))]
+                errors = 0
+                self._lock.release()
+                try:
+                    for event, data in batch:
+                        try:
+                            self.run(event, data)
+                        except Exception as e:
+                            errors += 1
+                            logger.error("❌ Error handling %s event on lane %d: %s", event, lane, str(e))
+                    if self.signals is not None:
+                        self.signals.adjust_depth(-len(batch))
+                finally:
+                    self._lock.acquire()
+                self._claimed[slot] = False
+                self._pending -= len(batch)
+                self.processed[lane] += len(batch)
+                self.errors += errors
+                if queue:
+                    # Stays on this lane, stolen or not, until it runs dry
+                    self._ready[lane].append(slot)
+                self._space.notify_all()
+        finally:
+            self._lock.release()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued event has been handled"""
+        with self._lock:
+            return self._space.wait_for(lambda: self._pending == 0, timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """Finish the queued events and stop the lane threads"""
+        self.drain(timeout)
+        with self._lock:
+            self._stopping = True
+            for wake in self._wake:
+                wake.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            submitted = list(self.submitted)
+            processed = list(self.processed)
+            queued = [sum(len(self._queues[slot]) for slot in ready) for ready in self._ready]
+            stolen = list(self.stolen)
+            pending = self._pending
+        mean = sum(submitted) / self.lanes
+        return {
+            "lanes": self.lanes,
+            "pending": pending,
+            "submitted": submitted,
+            "processed": processed,
+            "queued": queued,
+            "stolen": stolen,
+            # Busiest home lane relative to an even split of the keys; 1.0 is perfectly balanced
+            "skew": max(submitted) / mean if mean else 1.0,
+            "errors": self.errors,
+        }
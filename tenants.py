@@ -0,0 +1,141 @@
+"""
+Tenant registry for serving many Brevo accounts from one deployment
+
+The registry is a JSON file, re-read whenever its modification time changes:
+
+    {
+      "tenants": [
+        {
+          "id": "acme",
+          "secrets": {"campaign": "...", "transactional": "..."},
+          "events": ["opened", "clicked", "hard_bounced"],
+          "handlers": {"hard_bounced": "acme_hooks:on_hard_bounce"},
+          "sink": {"event_store": false},
+          "rate_limit": {"rate": 50, "burst": 200}
+        }
+      ]
+    }
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from handler_registry import Handler, import_handler
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class RateLimitConfig(BaseModel):
+    rate: float
+    burst: float
+
+
+class TenantConfig(BaseModel):
+    id: str
+    secrets: Dict[str, str]
+    events: Optional[List[str]] = None  # None accepts every supported event
+    handlers: Dict[str, str] = {}  # event -> "module:function" overrides
+    sink: Dict[str, Any] = {}
+    rate_limit: Optional[RateLimitConfig] = None
+
+
+class Tenant:
+    """Runtime state of one tenant for one app"""
+
+    def __init__(self, config: TenantConfig, secret: str, bucket: Optional[TokenBucket]):
+        self.config = config
+        self.id = config.id
+        self.secret = secret
+        self.events = frozenset(config.events) if config.events is not None else None
+        self.sink = config.sink
+        self.bucket = bucket
+        self.handlers: Dict[str, Handler] = {
+            event: import_handler(target) for event, target in config.handlers.items()
+        }
+
+    def accepts(self, event: str) -> bool:
+        return self.events is None or event in self.events
+
+    def allow(self) -> bool:
+        """Apply the tenant's rate limit, if it has one"""
+        return self.bucket is None or self.bucket.allow()
+
+
+class TenantRegistry:
+    """Tenants of one app (campaign or transactional) keyed by id, hot-reloaded from a file"""
+
+    def __init__(self, path: str, app_kind: str, reload_interval: float = 2.0):
+        self.path = path
+        self.app_kind = app_kind
+        self.reload_interval = reload_interval
+        self._tenants: Dict[str, Tenant] = {}
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def ids(self) -> List[str]:
+        return list(self._tenants)
+
+    def get(self, tenant_id: Optional[str]) -> Optional[Tenant]:
+        """O(1) lookup; checks the file for changes at most once per reload_interval"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.maybe_reload()
+        return self._tenants.get(tenant_id) if tenant_id is not None else None
+
+    def maybe_reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logger.error("❌ Cannot stat tenant registry %s: %s", self.path, str(e))
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def reload(self):
+        """Rebuild the tenant table; a broken file keeps the previous table"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path) as f:
+                raw = json.load(f)
+            configs = [TenantConfig(**entry) for entry in raw.get("tenants", [])]
+            tenants: Dict[str, Tenant] = {}
+            for config in configs:
+                secret = config.secrets.get(self.app_kind)
+                if not secret:
+                    continue
+                tenants[config.id] = Tenant(config, secret, self._bucket_for(config))
+        except Exception as e:
+            logger.error("❌ Failed to load tenant registry %s: %s", self.path, str(e))
+            return
+        self._tenants = tenants
+        self._mtime = mtime
+        logger.info("🏢 Loaded %d %s tenants from %s", len(tenants), self.app_kind, self.path)
+
+    def _bucket_for(self, config: TenantConfig) -> Optional[TokenBucket]:
+        if config.rate_limit is None:
+            return None
+        # Keep the current fill level when the limit did not change
+        previous = self._tenants.get(config.id)
+        if previous is not None and previous.bucket is not None:
+            if (previous.bucket.rate, previous.bucket.burst) == (config.rate_limit.rate, config.rate_limit.burst):
+                return previous.bucket
+        return TokenBucket(config.rate_limit.rate, config.rate_limit.burst)
+
+    def sink_enabled(self, tenant_id: Optional[str], sink: str) -> bool:
+        """Whether a tenant's sink configuration leaves the named sink on (default on)"""
+        tenant = self._tenants.get(tenant_id) if tenant_id is not None else None
+        return tenant is None or bool(tenant.sink.get(sink, True))
+
+    def handler_for(self, tenant_id: Optional[str], event: str) -> Optional[Handler]:
+        """Tenant-specific handler override for an event, if configured"""
+        tenant = self._tenants.get(tenant_id) if tenant_id is not None else None
+        return tenant.handlers.get(event) if tenant is not None else None
@@ -0,0 +1,97 @@
+"""
+Backfill checks: export row mapping, and a checkpointed run that resumes after an interruption
+
+    python test_backfill.py
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import backfill
+import main
+
+CAMPAIGN_EVENTS = frozenset(main.EVENT_HANDLERS)
+
+
+def test_map_row():
+    """Export spellings map to handler events and fields; unsupported events are skipped"""
+    event, data = backfill.map_row(
+        {"Event Type": "Hard Bounce", "Recipient": "a@example.com", "Date": "2024-01-01", "Reason": "no such user", "Camp ID": "7"},
+        CAMPAIGN_EVENTS,
+    )
+    assert event == "hard_bounced"
+    assert data == {"email": "a@example.com", "timestamp": "2024-01-01", "bounce_reason": "no such user", "campaign_id": "7"}
+    # Captured webhook bodies nest the payload
+    assert backfill.map_row({"event": "click", "data": {"email": "a@example.com", "URL": "https://x"}}, CAMPAIGN_EVENTS) == (
+        "clicked", {"email": "a@example.com", "link_url": "https://x"}
+    )
+    # The campaign app has no first_opening handler, so unique opens fall back to opened
+    assert backfill.map_row({"event": "uniqueOpened", "email": "a@example.com"}, CAMPAIGN_EVENTS)[0] == "opened"
+    assert backfill.map_row({"event": "mystery", "email": "a@example.com"}, CAMPAIGN_EVENTS) is None
+    print("✅ row mapping")
+
+
+def write_exports(directory: str, rows: int):
+    csv_path = os.path.join(directory, "export.csv")
+    with open(csv_path, "w") as f:
+        f.write("event,email,date,campaign id\n")
+        for n in range(rows):
+            f.write(f"{'opened' if n % 3 else 'delivered'},user{n}@example.com,2024-01-01T00:00:{n % 60:02d},{n}\n")
+        f.write("mystery,skip@example.com,2024-01-01,0\n")
+    jsonl_path = os.path.join(directory, "export.jsonl")
+    with open(jsonl_path, "w") as f:
+        for n in range(rows, rows + 50):
+            f.write(json.dumps({"event": "clicked", "email": f"user{n}@example.com", "campaign_id": n}) + "\n")
+    return [csv_path, jsonl_path]
+
+
+def run_backfill(files, checkpoint: str, fail_after=None):
+    """Run backfill.run with dispatch_batch recorded; raise after fail_after batches to simulate a crash"""
+    seen = []
+
+    def dispatch_batch(events):
+        if fail_after is not None and len(seen) >= fail_after:
+            raise RuntimeError("interrupted")
+        seen.append([data["campaign_id"] for _, data in events])
+        return len(events)
+
+    main.pipeline.dispatch_batch = dispatch_batch
+    args = argparse.Namespace(
+        files=files, app="campaign", format=None, workers=2, chunk_bytes=4096,
+        checkpoint=checkpoint, report_every=60.0, app_log_level="WARNING",
+    )
+    try:
+        result = backfill.run(args)
+    except RuntimeError:
+        result = None
+    finally:
+        del main.pipeline.dispatch_batch
+    return result, [int(campaign_id) for batch in seen for campaign_id in batch]
+
+
+def test_checkpoint_resume():
+    """An interrupted run resumes after the last completed chunk, so every row is dispatched once and in order"""
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_exports(directory, 1000)
+        checkpoint = os.path.join(directory, "checkpoint.json")
+
+        result, first = run_backfill(files, checkpoint, fail_after=3)
+        assert result is None and len(first) > 0
+        with open(checkpoint) as f:
+            assert list(json.load(f)) == [os.path.abspath(files[0])]
+
+        result, second = run_backfill(files, checkpoint)
+        assert first + second == list(range(1050))
+        assert result["dispatched"] == len(second) and result["skipped"] == 1
+
+        # Everything is checkpointed, so a third run has nothing left to do
+        result, third = run_backfill(files, checkpoint)
+        assert third == [] and result["dispatched"] == 0
+    print("✅ checkpoint and resume")
+
+
+if __name__ == "__main__":
+    test_map_row()
+    test_checkpoint_resume()
+    print("\n✨ All backfill tests passed!")
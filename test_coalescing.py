@@ -0,0 +1,78 @@
+"""
+Coalescing checks: repeats collapse inside the window, later events flush held records early
+
+    python test_coalescing.py
+"""
+import time
+
+from coalescing import EventCoalescer, HashedTimingWheel
+
+
+def make_coalescer():
+    emitted = []
+    coalescer = EventCoalescer({"opened": 5.0, "clicked": 2.0}, lambda event, data: emitted.append((event, data)))
+    # The wheel starts at the current monotonic time; offsets below are relative to it
+    return coalescer, emitted, time.monotonic()
+
+
+def test_wheel():
+    """Keys expire on the first advance a tick past their deadline, including after a long stall"""
+    wheel = HashedTimingWheel(0.1, 5.0, now=0.0)
+    wheel.schedule("a", 1.0, 0.0)
+    wheel.schedule("b", 4.95, 0.0)
+    assert wheel.advance(0.95) == []
+    assert [key for key, _ in wheel.advance(1.15)] == ["a"]
+    # A stall longer than a revolution still expires b exactly once
+    wheel.schedule("c", 2.0, 30.0)
+    assert [key for key, _ in wheel.advance(31.0)] == ["b"]
+    assert [key for key, _ in wheel.advance(32.5)] == ["c"]
+    assert wheel.drain() == []
+    print("✅ timing wheel")
+
+
+def test_window():
+    """Repeats inside the window become one record with a count and the first and last timestamps"""
+    coalescer, emitted, t0 = make_coalescer()
+    data = {"campaign_id": 1, "email": "a@example.com"}
+    for n in range(5):
+        assert coalescer.offer("opened", dict(data, timestamp=f"t{n}"), now=t0 + n * 0.5)
+    assert coalescer.offer("clicked", dict(data, timestamp="c0"), now=t0)
+    assert not coalescer.offer("hard_bounce", {"campaign_id": 1, "email": "b@example.com"}, now=t0)
+
+    assert coalescer.flush_expired(now=t0 + 2.15) == 1
+    assert emitted[0][0] == "clicked" and emitted[0][1]["count"] == 1
+    assert coalescer.flush_expired(now=t0 + 4.9) == 0
+    assert coalescer.flush_expired(now=t0 + 5.15) == 1
+    event, record = emitted[1]
+    assert event == "opened" and record["count"] == 5
+    assert (record["first_timestamp"], record["last_timestamp"]) == ("t0", "t4")
+    assert coalescer.stats() == {"pending": 0, "absorbed": 4, "emitted": 2}
+    print("✅ coalescing window")
+
+
+def test_early_flush():
+    """A later event flushes the recipient's held records first; a reopened window keeps its own deadline"""
+    coalescer, emitted, t0 = make_coalescer()
+    data = {"campaign_id": 1, "email": "a@example.com"}
+    coalescer.offer("opened", dict(data), now=t0)
+    coalescer.offer("opened", {"campaign_id": 1, "email": "other@example.com"}, now=t0)
+    assert not coalescer.offer("unsubscribed", dict(data), now=t0 + 1.0)
+    assert [(event, record["email"]) for event, record in emitted] == [("opened", "a@example.com")]
+
+    # Reopened at 2.0: the stale entry due at 5.0 must not emit it before 7.0
+    coalescer.offer("opened", dict(data), now=t0 + 2.0)
+    coalescer.offer("opened", dict(data), now=t0 + 3.0)
+    assert coalescer.flush_expired(now=t0 + 5.15) == 1
+    assert [record["email"] for _, record in emitted[1:]] == ["other@example.com"]
+    assert coalescer.pending == 1
+    assert coalescer.flush_expired(now=t0 + 7.15) == 1
+    assert emitted[-1][1]["email"] == "a@example.com" and emitted[-1][1]["count"] == 2
+    assert coalescer.flush_all() == 0
+    print("✅ early flush")
+
+
+if __name__ == "__main__":
+    test_wheel()
+    test_window()
+    test_early_flush()
+    print("\n✨ All coalescing tests passed!")
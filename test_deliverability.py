@@ -0,0 +1,153 @@
+"""
+Deliverability checks: windowed rates, threshold alerts with cooldowns, domain eviction and the admin-only route
+
+    python test_deliverability.py
+"""
+import asyncio
+import threading
+
+import httpx
+
+import pipeline as pipeline_module
+from deliverability import DeliverabilityMonitor, WebhookAlert, parse_thresholds
+from handler_registry import HandlerRegistry
+from pipeline import WebhookPipeline
+
+
+def make_monitor(**kwargs):
+    alerts = []
+    monitor = DeliverabilityMonitor(
+        thresholds=parse_thresholds("hard_bounced=0.05,spam=0.003"),
+        alert=alerts.append,
+        min_volume=100,
+        **kwargs
+    )
+    return monitor, alerts
+
+
+def send(monitor, domain: str, delivered: int, hard_bounced: int, now: float):
+    for n in range(delivered):
+        monitor.observe("delivered", {"email": f"u{n}@{domain}"}, now=now)
+    for n in range(hard_bounced):
+        monitor.observe("hard_bounced", {"email": f"b{n}@{domain}"}, now=now)
+
+
+def test_windows():
+    """Each event counts in the 1, 5 and 60 minute windows until its bucket leaves them"""
+    monitor, _ = make_monitor()
+    send(monitor, "gmail.com", 90, 10, now=0.0)
+    monitor.observe("opened", {"email": "a@gmail.com"}, now=0.0)
+    stats = monitor.domain_stats("Gmail.com", now=30.0)
+    assert stats["1m"]["volume"] == stats["60m"]["volume"] == 100
+    assert stats["5m"]["rates"]["hard_bounced"] == 0.1
+    stats = monitor.domain_stats("gmail.com", now=120.0)
+    assert stats["1m"]["volume"] == 0 and stats["5m"]["volume"] == 100
+    stats = monitor.domain_stats("gmail.com", now=3000.0)
+    assert stats["5m"]["volume"] == 0 and stats["60m"]["volume"] == 100
+    assert monitor.domain_stats("gmail.com", now=7200.0)["60m"]["volume"] == 0
+    print("✅ sliding windows")
+
+
+def test_thresholds():
+    """Alerts need the minimum volume and the threshold rate, then wait out the cooldown per domain and outcome"""
+    monitor, alerts = make_monitor(cooldown=300.0)
+    send(monitor, "gmail.com", 60, 10, now=0.0)
+    assert alerts == []  # 70 events, below min_volume
+    send(monitor, "gmail.com", 30, 0, now=1.0)
+    assert [(alert["domain"], alert["outcome"]) for alert in alerts] == [("gmail.com", "hard_bounced")]
+    assert alerts[0]["volume"] == 100 and alerts[0]["window"] == "5m"
+
+    send(monitor, "gmail.com", 0, 10, now=100.0)
+    send(monitor, "yahoo.com", 95, 5, now=100.0)
+    assert [alert["domain"] for alert in alerts] == ["gmail.com", "yahoo.com"]
+    send(monitor, "gmail.com", 90, 10, now=302.0)
+    assert [alert["domain"] for alert in alerts] == ["gmail.com", "yahoo.com", "gmail.com"]
+    assert monitor.stats() == {"domains": 2, "alerts_fired": 3}
+    print("✅ thresholds and cooldown")
+
+
+def test_eviction():
+    """The least recently seen domain is evicted with its cooldowns; busy domains keep theirs"""
+    monitor, alerts = make_monitor(max_domains=2)
+    send(monitor, "a.com", 90, 10, now=0.0)
+    send(monitor, "b.com", 90, 10, now=0.0)
+    send(monitor, "a.com", 0, 1, now=1.0)
+    send(monitor, "c.com", 1, 0, now=1.0)
+    assert monitor.domain_stats("b.com") is None
+    assert monitor.domain_stats("a.com", now=2.0) is not None
+    # a.com is still cooling down; b.com starts over once it comes back
+    send(monitor, "a.com", 0, 10, now=2.0)
+    send(monitor, "b.com", 90, 10, now=2.0)
+    assert [alert["domain"] for alert in alerts] == ["a.com", "b.com", "b.com"]
+    print("✅ domain eviction")
+
+
+def test_alert_from_thread():
+    """An alert raised off the loop is posted from the loop it was bound to"""
+    posted = []
+
+    class RecordingAlert(WebhookAlert):
+        async def post(self, alert):
+            posted.append((alert, threading.get_ident()))
+
+    async def run():
+        alert = RecordingAlert("http://alerts.invalid/hook")
+        alert.bind(asyncio.get_running_loop())
+        await asyncio.to_thread(alert, {"domain": "gmail.com"})
+        await asyncio.sleep(0.05)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert posted == [({"domain": "gmail.com"}, loop_thread)]
+    print("✅ alerts from lane threads")
+
+
+def test_route():
+    """/stats/deliverability needs the admin token, and unsigned test posts never reach the monitor"""
+    admin_token, pipeline_module.ADMIN_TOKEN = pipeline_module.ADMIN_TOKEN, "admin"
+    pipeline = WebhookPipeline(
+        source="campaign",
+        title="Deliverability test",
+        description="",
+        handlers=HandlerRegistry({"hard_bounced": lambda data: None}),
+        secret="key",
+        webhook_path="/webhook/brevo",
+        test_path="/webhook/brevo/test",
+        scope_field="campaign_id",
+        coalesce_field="campaign_id",
+        lane_keys=("email",),
+        geo_events=(),
+        shed_events=(),
+        ack_messages={"webhook": "Webhook processed", "test": "Test webhook received"},
+    )
+    pipeline.deliverability.min_volume = 1
+    alerts = []
+    pipeline.deliverability.alert = alerts.append
+
+    async def run():
+        transport = httpx.ASGITransport(app=pipeline.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/webhook/brevo/test", json={"event": "hard_bounced", "data": {"email": "a@gmail.com"}}
+            )
+            assert response.status_code == 200
+            assert (await client.get("/stats/deliverability")).status_code == 403
+            response = await client.get("/stats/deliverability", headers={"x-admin-token": "admin"})
+            assert response.status_code == 200
+            return response.json()
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        pipeline_module.ADMIN_TOKEN = admin_token
+    assert result == {"domains": []} and alerts == []
+    print("✅ admin-only route")
+
+
+if __name__ == "__main__":
+    test_windows()
+    test_thresholds()
+    test_eviction()
+    test_alert_from_thread()
+    test_route()
+    print("\n✨ All deliverability tests passed!")
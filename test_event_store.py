@@ -0,0 +1,137 @@
+"""
+Event store checks: concurrent writers and compactions on one directory, erasure and compaction
+
+    python test_event_store.py
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+
+from event_store import EventStore
+
+
+def write_events(directory: str, source: str, writer: int, count: int):
+    """Append count events for a handful of shared addresses, flushing in small batches"""
+    store = EventStore(directory, source, batch_size=7)
+    for n in range(count):
+        store.append("delivered", {"email": f"user{n % 5}@example.com", "message_id": f"{writer}-{n}", "writer": writer})
+    store.close()
+
+
+def test_concurrent_writers():
+    """Processes sharing one log never corrupt each other's offsets"""
+    with tempfile.TemporaryDirectory() as directory:
+        writers = [
+            multiprocessing.Process(target=write_events, args=(directory, "campaign", writer, 400))
+            for writer in range(4)
+        ]
+        for process in writers:
+            process.start()
+        for process in writers:
+            process.join()
+            assert process.exitcode == 0
+
+        store = EventStore(directory, "campaign")
+        events = [event for n in range(5) for event in store.history(f"user{n}@example.com", limit=10_000)]
+        assert len(events) == 4 * 400
+        assert len({event["data"]["message_id"] for event in events}) == 4 * 400
+        store.close()
+    print("✅ concurrent writers")
+
+
+def test_erase_and_compact():
+    """Erased addresses leave the index at once and the log on compaction; other records survive"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = EventStore(directory, "campaign")
+        for n in range(100):
+            store.append("opened", {"email": "erase@example.com" if n % 2 else "keep@example.com", "message_id": str(n)})
+        assert store.erase("Erase@Example.com") == 50
+        assert store.history("erase@example.com") == []
+
+        # Another writer keeps appending while the compaction runs
+        other = EventStore(directory, "campaign", batch_size=3)
+        compacting = threading.Thread(target=lambda: result.update(store.compact()))
+        result = {}
+        compacting.start()
+        for n in range(100, 130):
+            other.append("opened", {"email": "keep@example.com", "message_id": str(n)})
+        other.flush()
+        compacting.join()
+
+        assert result["dropped"] == 50
+        with open(store.log_path, "rb") as f:
+            assert b"erase@example.com" not in f.read()
+        kept = store.history("keep@example.com", limit=10_000)
+        assert [int(event["data"]["message_id"]) for event in kept] == list(range(0, 100, 2)) + list(range(100, 130))
+
+        # A later event for an erased address is stored again
+        store.append("opened", {"email": "erase@example.com", "message_id": "200"})
+        assert len(store.history("erase@example.com")) == 1
+        other.close()
+        store.close()
+    print("✅ erase and compact")
+
+
+def test_erase_before_late_flush():
+    """Records buffered in another process before an erasure stay out of history once flushed"""
+    with tempfile.TemporaryDirectory() as directory:
+        late = EventStore(directory, "transactional")
+        late.append("delivered", {"email": "gone@example.com", "message_id": "1"})
+        store = EventStore(directory, "campaign")
+        store.append("opened", {"email": "gone@example.com", "message_id": "2"})
+        store.erase("gone@example.com")
+        late.flush()
+        assert store.history("gone@example.com") == []
+
+        store.append("opened", {"email": "gone@example.com", "message_id": "3"})
+        assert [event["data"]["message_id"] for event in store.history("gone@example.com")] == ["3"]
+        late.close()
+        store.close()
+    print("✅ erase before a late flush")
+
+
+def compact_in_process(directory: str):
+    EventStore(directory, "campaign").compact()
+
+
+def test_concurrent_compactions():
+    """Compactions of one log from several processes take turns and leave a consistent log"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = EventStore(directory, "campaign", batch_size=50)
+        for n in range(2000):
+            store.append("opened", {"email": f"user{n % 20}@example.com", "message_id": str(n)})
+        store.flush()
+        for n in range(0, 20, 2):
+            store.erase(f"user{n}@example.com")
+
+        workers = [multiprocessing.Process(target=compact_in_process, args=(directory,)) for _ in range(3)]
+        for process in workers:
+            process.start()
+        # Threads of this process share the store while the other processes compact
+        threads = [threading.Thread(target=store.compact)] + [
+            threading.Thread(target=lambda n=n: store.history(f"user{n}@example.com")) for n in range(1, 20, 2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for process in workers:
+            process.join()
+            assert process.exitcode == 0
+
+        assert not [name for name in os.listdir(directory) if name.endswith(".compact")]
+        for n in range(20):
+            history = store.history(f"user{n}@example.com", limit=10_000)
+            assert len(history) == (0 if n % 2 == 0 else 100)
+            assert all(event["email"] == f"user{n}@example.com" for event in history)
+        store.close()
+    print("✅ concurrent compactions")
+
+
+if __name__ == "__main__":
+    test_concurrent_writers()
+    test_erase_and_compact()
+    test_erase_before_late_flush()
+    test_concurrent_compactions()
+    print("\n✨ All event store tests passed!")
@@ -0,0 +1,98 @@
+"""
+Live tail checks: server-side filters, shared frames, wakeups from lane threads and slow subscribers
+
+    python test_event_stream.py
+"""
+import asyncio
+import threading
+
+from event_stream import EventStream, StreamFilter
+
+
+def test_filter():
+    """Event type, scope and recipient domain must all match"""
+    stream_filter = StreamFilter(events="opened, clicked", scope_field="template_id", scope="7", domain="Gmail.com")
+    assert stream_filter.matches("opened", {"template_id": 7, "email": "a@GMAIL.com"})
+    assert not stream_filter.matches("delivered", {"template_id": 7, "email": "a@gmail.com"})
+    assert not stream_filter.matches("opened", {"template_id": 8, "email": "a@gmail.com"})
+    assert not stream_filter.matches("opened", {"template_id": 7, "email": "a@yahoo.com"})
+    assert StreamFilter().matches("anything", {})
+    print("✅ stream filters")
+
+
+async def next_frame(frames) -> bytes:
+    return await asyncio.wait_for(frames.__anext__(), 1.0)
+
+
+def test_subscribers():
+    """Each subscriber gets the matching events published after it connected, encoded once and shared"""
+    async def run():
+        stream = EventStream(capacity=16)
+        stream.publish("opened", {"email": "early@gmail.com"})  # nobody listening yet
+        everything = stream.subscribe(StreamFilter())
+        clicks = stream.subscribe(StreamFilter(events="clicked", domain="gmail.com"))
+        assert await next_frame(everything) == b": connected\n\n"
+        assert await next_frame(clicks) == b": connected\n\n"
+        assert stream.subscribers == 2
+
+        stream.publish("opened", {"email": "a@gmail.com"})
+        stream.publish("clicked", {"email": "b@yahoo.com"})
+        stream.publish("clicked", {"email": "c@gmail.com", "link_url": "https://x"})
+        frames = [await next_frame(everything) for _ in range(3)]
+        assert frames[0] == b'id: 0\nevent: opened\ndata: {"email":"a@gmail.com"}\n\n'
+        click = await next_frame(clicks)
+        assert click == b'id: 2\nevent: clicked\ndata: {"email":"c@gmail.com","link_url":"https://x"}\n\n'
+        assert click is frames[2]
+
+        # Lane threads publish too; the subscriber is woken on the loop
+        await asyncio.to_thread(stream.publish, "clicked", {"email": "d@gmail.com"})
+        assert (await next_frame(clicks)).startswith(b"id: 3\n")
+        await everything.aclose()
+        await clicks.aclose()
+        return stream.stats()
+
+    assert asyncio.run(run()) == {"subscribers": 0, "published": 4, "dropped": 0}
+    print("✅ subscribers and shared frames")
+
+
+def test_slow_subscriber():
+    """A subscriber more than a ring behind is told it was dropped; the publisher never waits"""
+    async def run():
+        stream = EventStream(capacity=4)
+        frames = stream.subscribe(StreamFilter())
+        await next_frame(frames)
+        publisher = threading.Thread(target=lambda: [stream.publish("opened", {"n": n}) for n in range(10)])
+        publisher.start()
+        publisher.join()
+        assert await next_frame(frames) == b'event: dropped\ndata: {"reason":"consumer too slow"}\n\n'
+        try:
+            await next_frame(frames)
+            assert False, "a dropped subscriber must be disconnected"
+        except StopAsyncIteration:
+            pass
+        return stream.stats()
+
+    assert asyncio.run(run()) == {"subscribers": 0, "published": 10, "dropped": 1}
+    print("✅ slow subscribers are dropped")
+
+
+def test_keepalive():
+    """An idle subscriber gets a keepalive comment"""
+    async def run():
+        stream = EventStream(keepalive=0.05)
+        frames = stream.subscribe(StreamFilter())
+        await next_frame(frames)
+        frame = await next_frame(frames)
+        await frames.aclose()
+        return frame
+
+    assert asyncio.run(run()) == b": keepalive\n\n"
+    print("✅ keepalive")
+
+
+if __name__ == "__main__":
+    test_filter()
+    test_subscribers()
+    test_slow_subscriber()
+    test_keepalive()
+    print("\n✨ All event stream tests passed!")
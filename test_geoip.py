@@ -0,0 +1,89 @@
+"""
+GeoIP checks: range lookups against a linear scan, IPv4/IPv6 edges, and enrichment of opens and clicks
+
+    python test_geoip.py
+"""
+import ipaddress
+import os
+import random
+import tempfile
+
+from geoip import GeoDatabase, GeoEnricher, build
+
+ROWS = [
+    ("1.0.0.0", "1.0.0.255", "AU", 13335, "Cloudflare"),
+    ("8.8.8.0", "8.8.8.255", "US", 15169, "Google"),
+    ("81.2.69.0", "81.2.69.255", "GB", 20712, "Andrews & Arnold"),
+    ("2001:4860::", "2001:4860:ffff:ffff:ffff:ffff:ffff:ffff", "US", 15169, "Google"),
+    ("2a02:2e0::", "2a02:2e0:ffff:ffff:ffff:ffff:ffff:ffff", "DE", 3320, "Deutsche Telekom AG"),
+]
+
+
+def linear_lookup(ip: str):
+    address = ipaddress.ip_address(ip)
+    for start, end, country, asn, org in ROWS:
+        low, high = ipaddress.ip_address(start), ipaddress.ip_address(end)
+        if low.version == address.version and low <= address <= high:
+            return {"country": country, "asn": asn, "as_org": org}
+    return None
+
+
+def test_lookup():
+    """Binary search over the mmap'd ranges agrees with a scan of the source rows"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "geo.db")
+        # Rows may arrive in any order
+        assert build(reversed(ROWS), path) == len(ROWS)
+        database = GeoDatabase(path, cache_size=16)
+        probes = [
+            "1.0.0.0", "1.0.0.255", "1.0.1.0", "0.255.255.255", "8.8.8.8", "81.2.69.160",
+            "2001:4860:4860::8888", "2a02:2e0:3fe:1001::", "2001:4861::", "::1", "255.255.255.255",
+        ]
+        rng = random.Random(5)
+        probes += [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(500)]
+        probes += [f"8.8.8.{rng.randrange(256)}" for _ in range(50)]
+        for ip in probes:
+            assert database.lookup(ip) == linear_lookup(ip), ip
+        assert database.lookup("not an ip") is None
+        assert database.cache_info()["size"] <= 16
+        database.close()
+    print("✅ range lookups")
+
+
+def test_enrich():
+    """Only the configured events gain geo; an existing geo field and missing IPs are left alone"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "geo.db")
+        build(ROWS, path)
+        database = GeoDatabase(path)
+        enricher = GeoEnricher(database, ["opened", "clicked"])
+
+        opened = {"email": "a@example.com", "ip_address": "8.8.8.8"}
+        enricher.enrich("opened", opened)
+        assert opened["geo"] == {"country": "US", "asn": 15169, "as_org": "Google"}
+        # Handlers get a copy, never the cached entry
+        opened["geo"]["country"] = "XX"
+        clicked = {"ip_address": "8.8.8.8"}
+        enricher.enrich("clicked", clicked)
+        assert clicked["geo"]["country"] == "US"
+
+        unknown = {"ip_address": "10.0.0.1"}
+        enricher.enrich("opened", unknown)
+        assert unknown["geo"] is None
+        delivered = {"ip_address": "8.8.8.8"}
+        enricher.enrich("delivered", delivered)
+        assert "geo" not in delivered
+        preset = {"ip_address": "8.8.8.8", "geo": "kept"}
+        enricher.enrich("opened", preset)
+        assert preset["geo"] == "kept"
+        no_ip = {}
+        enricher.enrich("opened", no_ip)
+        assert "geo" not in no_ip
+        database.close()
+    print("✅ enrichment")
+
+
+if __name__ == "__main__":
+    test_lookup()
+    test_enrich()
+    print("\n✨ All GeoIP tests passed!")
@@ -0,0 +1,139 @@
+"""
+Top-K checks: Space-Saving error bounds, merged sketches, windows, and the admin-only routes
+
+    python test_heavy_hitters.py
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+from collections import Counter
+
+import httpx
+
+import pipeline as pipeline_module
+from handler_registry import HandlerRegistry
+from heavy_hitters import HeavyHitters, SpaceSaving, merge_exports
+from pipeline import WebhookPipeline
+
+
+def zipf_stream(seed: int, length: int, items: int = 5000):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(items)]
+    return [f"item{n}" for n in rng.choices(range(items), weights=weights, k=length)]
+
+
+def check_bounds(sketch: SpaceSaving, truth: Counter):
+    """count - error <= true count <= count, error <= total / capacity, and no heavy item is missing"""
+    bound = sketch.total / sketch.capacity
+    reported = {entry["item"]: entry for entry in sketch.top(sketch.capacity)}
+    for item, entry in reported.items():
+        assert entry["count"] - entry["error"] <= truth[item] <= entry["count"], item
+        assert entry["error"] <= bound
+    for item, count in truth.items():
+        if count > bound:
+            assert item in reported, item
+
+
+def test_error_bounds():
+    stream = zipf_stream(1, 50_000)
+    sketch = SpaceSaving(64)
+    for item in stream:
+        sketch.add(item)
+    assert sketch.total == len(stream) and len(sketch) == 64
+    check_bounds(sketch, Counter(stream))
+    print("✅ Space-Saving error bounds")
+
+
+def test_merge():
+    """Merged sketches keep the bounds for the combined stream, also through export documents"""
+    first, second = zipf_stream(2, 30_000), zipf_stream(3, 20_000)
+    left, right = SpaceSaving(64), SpaceSaving(64)
+    for item in first:
+        left.add(item)
+    for item in second:
+        right.add(item)
+    merged = left.merge(right)
+    assert merged.total == 50_000
+    check_bounds(merged, Counter(first) + Counter(second))
+
+    exports = []
+    for stream in (first, second):
+        hitters = HeavyHitters("campaign_id", capacity=64)
+        for n, item in enumerate(stream):
+            hitters.observe("clicked", {"link_url": item, "campaign_id": 7, "email": f"u{n}@example.com"})
+        exports.append(hitters.export())
+    combined = merge_exports(exports)
+    links = SpaceSaving.from_dict(combined["windows"]["link"])
+    assert links.total == 50_000
+    assert [entry["item"] for entry in links.top(3)] == [entry["item"] for entry in merged.top(3)]
+    print("✅ merged sketches")
+
+
+def test_dimensions_and_window():
+    """Values are read from the first present field per dimension; buckets older than the window drop out"""
+    hitters = HeavyHitters("campaign_id", capacity=8, bucket_seconds=60, buckets=10)
+    hitters.observe("hard_bounced", {"email": "a@Gmail.com", "error_code": 550, "bounce_reason": "no such user"}, now=0.0)
+    hitters.observe("opened", {"email": "b@gmail.com", "error_code": 421}, now=0.0)
+    hitters.observe("blocked", {"email": "c@yahoo.com", "block_reason": "policy", "campaign_id": 1}, now=300.0)
+
+    domains = hitters.window("domain", 10, now=300.0)
+    assert {entry["item"]: entry["count"] for entry in domains.top()} == {"gmail.com": 2, "yahoo.com": 1}
+    # Only hard_bounced, soft_bounced, ... carry error codes
+    assert hitters.window("error_code", 10, now=300.0).top() == [{"item": "550", "count": 1, "error": 0}]
+    reasons = {entry["item"] for entry in hitters.window("reason", 10, now=300.0).top()}
+    assert reasons == {"no such user", "policy"}
+    assert hitters.query("reason", scope="1")["top"][0]["item"] == "policy"
+    # Ten minutes in, a six-minute window still holds the blocked event but not the first two
+    assert hitters.window("domain", 6, now=600.0).total == 1
+    print("✅ dimensions and window")
+
+
+def test_routes():
+    """The top-K routes need the admin token, and unsigned test posts are not counted"""
+    admin_token, pipeline_module.ADMIN_TOKEN = pipeline_module.ADMIN_TOKEN, "admin"
+    pipeline = WebhookPipeline(
+        source="campaign",
+        title="Top-K test",
+        description="",
+        handlers=HandlerRegistry({"clicked": lambda data: None}),
+        secret="key",
+        webhook_path="/webhook/brevo",
+        test_path="/webhook/brevo/test",
+        scope_field="campaign_id",
+        coalesce_field="campaign_id",
+        lane_keys=("email",),
+        geo_events=(),
+        shed_events=(),
+        ack_messages={"webhook": "Webhook processed", "test": "Test webhook received"},
+    )
+
+    async def run():
+        transport = httpx.ASGITransport(app=pipeline.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for path in ("/webhook/brevo", "/webhook/brevo/test"):
+                body = json.dumps({"event": "clicked", "data": {"email": "a@example.com", "link_url": path}}).encode()
+                signature = hmac.new(b"key", body, hashlib.sha256).hexdigest()
+                response = await client.post(path, content=body, headers={"x-brevo-signature": signature})
+                assert response.status_code == 200
+            assert (await client.get("/stats/top?dimension=link")).status_code == 403
+            assert (await client.get("/stats/top/export")).status_code == 403
+            response = await client.get("/stats/top?dimension=link", headers={"x-admin-token": "admin"})
+            assert response.status_code == 200
+            return response.json()
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        pipeline_module.ADMIN_TOKEN = admin_token
+    assert [entry["item"] for entry in result["top"]] == ["/webhook/brevo"]
+    print("✅ admin-only routes")
+
+
+if __name__ == "__main__":
+    test_error_bounds()
+    test_merge()
+    test_dimensions_and_window()
+    test_routes()
+    print("\n✨ All top-K tests passed!")
@@ -0,0 +1,79 @@
+"""
+Watchdog checks: loop lag measurement, slow-handler stacks, and a disabled budget
+
+    python test_loop_watchdog.py
+"""
+import asyncio
+import time
+
+from loop_watchdog import HandlerWatchdog, LatencyWindow, LoopLagMonitor
+
+
+def slow_handler(data):
+    time.sleep(data["sleep"])
+
+
+def test_latency_window():
+    window = LatencyWindow(size=100)
+    assert window.percentiles()["samples"] == 0
+    for value in range(1000):
+        window.add(float(value))
+    stats = window.percentiles()
+    # Only the last 100 samples are kept
+    assert stats["samples"] == 100 and stats["max"] == 999.0 and stats["p50"] == 949.0
+    print("✅ latency window")
+
+
+def test_loop_lag():
+    """A blocking call on the loop shows up as lag of about its duration"""
+    monitor = LoopLagMonitor(interval=0.01)
+
+    async def run():
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.05)
+        time.sleep(0.1)
+        await asyncio.sleep(0.03)
+        task.cancel()
+
+    asyncio.run(run())
+    assert monitor.stats()["max"] >= 80
+    print(f"✅ loop lag ({monitor.stats()['max']:.0f} ms)")
+
+
+def test_slow_handler():
+    """Calls over budget are reported with the stack captured while they ran; stats() leaves the stack out"""
+    watchdog = HandlerWatchdog(budget=0.02)
+    watchdog.start()
+    try:
+        watchdog.invoke("opened", slow_handler, {"sleep": 0.0})
+        watchdog.invoke("clicked", slow_handler, {"sleep": 0.1})
+    finally:
+        watchdog.stop()
+    assert watchdog.slow_count == 1
+    report = watchdog.slow_reports()[0]
+    assert report["event"] == "clicked" and report["handler"] == "slow_handler"
+    assert report["duration_ms"] >= 100
+    assert "slow_handler" in report["stack"]
+    stats = watchdog.stats()
+    assert stats["durations_ms"]["samples"] == 2
+    assert "stack" not in stats["recent_slow"][0]
+    print("✅ slow handler")
+
+
+def test_disabled():
+    """A budget of 0 starts no thread and flags nothing, but durations are still measured"""
+    watchdog = HandlerWatchdog(budget=0)
+    watchdog.start()
+    assert watchdog._thread is None
+    watchdog.invoke("opened", slow_handler, {"sleep": 0.01})
+    assert watchdog.slow_count == 0
+    assert watchdog.stats()["durations_ms"]["samples"] == 1
+    print("✅ disabled watchdog")
+
+
+if __name__ == "__main__":
+    test_latency_window()
+    test_loop_lag()
+    test_slow_handler()
+    test_disabled()
+    print("\n✨ All watchdog tests passed!")
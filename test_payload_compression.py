@@ -0,0 +1,142 @@
+"""
+Body archive checks: round trips across dictionary retrains, concurrent writers and erasure by recipient
+
+    python test_payload_compression.py
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+
+import httpx
+
+import pipeline as pipeline_module
+from handler_registry import HandlerRegistry
+from payload_compression import DictionaryCompressor, PayloadArchive, replay
+from pipeline import WebhookPipeline
+
+
+def body(n: int, event: str = "clicked") -> bytes:
+    return json.dumps({
+        "event": event,
+        "data": {
+            "email": f"user{n % 50}@example.com",
+            "campaign_id": n % 7,
+            "link_url": f"https://shop.example.com/products/{n}?utm_source=brevo",
+            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        },
+    }).encode()
+
+
+def test_round_trip():
+    """Records written before and after a retrain replay byte for byte, and a reopened compressor still reads them"""
+    with tempfile.TemporaryDirectory() as directory:
+        dictionaries = os.path.join(directory, "dictionaries")
+        compressor = DictionaryCompressor(dictionaries, dict_size=4096, min_samples=200)
+        archive = PayloadArchive(directory, "campaign", compressor)
+        bodies = [body(n, "clicked" if n % 4 else "opened") for n in range(1000)]
+        for raw in bodies[:500]:
+            archive.append(json.loads(raw)["event"], raw)
+        assert compressor.train("clicked") is not None
+        before = archive.stats()["stored_bytes"]
+        for raw in bodies[500:]:
+            archive.append(json.loads(raw)["event"], raw)
+        archive.close()
+
+        # The second half compresses its clicks with the new dictionary
+        assert archive.stats()["stored_bytes"] - before < before * 0.8
+        reopened = DictionaryCompressor(dictionaries)
+        assert [raw for _, _, raw in replay(archive.path, reopened)] == bodies
+        assert [raw for _, _, raw in replay(archive.path, reopened, "opened")] == bodies[::4]
+    print("✅ round trip across retrains")
+
+
+def test_concurrent_writers():
+    """Archives in several workers share one file; batches never interleave"""
+    with tempfile.TemporaryDirectory() as directory:
+        # One compressor each, as in separate worker processes
+        compressor = DictionaryCompressor(os.path.join(directory, "dictionaries"))
+        archives = [PayloadArchive(directory, "campaign", DictionaryCompressor(compressor.directory)) for _ in range(4)]
+
+        def write(worker: int):
+            archive = archives[worker]
+            for n in range(300):
+                archive.append("clicked", body(worker * 1000 + n))
+                if n % 25 == 0:
+                    archive.flush()
+            archive.flush()
+
+        threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        replayed = [json.loads(raw)["data"]["link_url"] for _, _, raw in replay(archives[0].path, compressor)]
+        assert sorted(replayed) == sorted(json.loads(body(n))["data"]["link_url"] for worker in range(4) for n in range(worker * 1000, worker * 1000 + 300))
+    print("✅ concurrent writers")
+
+
+def test_erase():
+    """Erasure drops only the recipient's bodies, including buffered ones, and later appends still land"""
+    with tempfile.TemporaryDirectory() as directory:
+        compressor = DictionaryCompressor(os.path.join(directory, "dictionaries"))
+        archive = PayloadArchive(directory, "campaign", compressor)
+        for n in range(200):
+            archive.append("clicked", body(n))
+            if n == 99:
+                archive.flush()
+        assert archive.erase("User7@Example.com ") == 4
+        archive.append("opened", body(7, "opened"))
+        archive.close()
+        recipients = [json.loads(raw)["data"]["email"] for _, _, raw in replay(archive.path, compressor)]
+        assert len(recipients) == 197 and recipients.count("user7@example.com") == 1
+        assert archive.erase("nobody@example.com") == 0
+        assert [name for name in os.listdir(directory) if name.endswith(".erase")] == []
+    print("✅ erasure by recipient")
+
+
+def test_erase_route():
+    """DELETE /events/history also erases archived bodies when only the archive is enabled"""
+    admin_token, pipeline_module.ADMIN_TOKEN = pipeline_module.ADMIN_TOKEN, "admin"
+    pipeline = WebhookPipeline(
+        source="campaign",
+        title="Archive test",
+        description="",
+        handlers=HandlerRegistry({"clicked": lambda data: None}),
+        secret="key",
+        webhook_path="/webhook/brevo",
+        test_path="/webhook/brevo/test",
+        scope_field="campaign_id",
+        coalesce_field="campaign_id",
+        lane_keys=("email",),
+        geo_events=(),
+        shed_events=(),
+        ack_messages={"webhook": "Webhook processed", "test": "Test webhook received"},
+    )
+
+    async def run(directory: str):
+        pipeline.body_archive = PayloadArchive(directory, "campaign", DictionaryCompressor(os.path.join(directory, "dictionaries")))
+        for n in range(3):
+            pipeline.body_archive.append("clicked", body(n * 50))
+        transport = httpx.ASGITransport(app=pipeline.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.delete("/events/history?email=user0@example.com")).status_code == 403
+            response = await client.delete("/events/history?email=user0@example.com", headers={"x-admin-token": "admin"})
+        return response.status_code, response.json()
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            status, content = asyncio.run(run(directory))
+    finally:
+        pipeline_module.ADMIN_TOKEN = admin_token
+    assert status == 200 and content == {"email": "user0@example.com", "erased": 0, "bodies_erased": 3}
+    print("✅ erase route")
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_concurrent_writers()
+    test_erase()
+    test_erase_route()
+    print("\n✨ All body archive tests passed!")
@@ -0,0 +1,76 @@
+"""
+Rate limit checks: token bucket refill and burst, per-key eviction, and CoDel shedding
+
+    python test_rate_limit.py
+"""
+from rate_limit import CoDelShedder, KeyedRateLimiter, TokenBucket, parse_rate
+
+
+def test_parse_rate():
+    assert parse_rate("") is None
+    assert parse_rate("100,200") == (100.0, 200.0)
+    assert parse_rate("50") == (50.0, 50.0)
+    print("✅ parse rate")
+
+
+def test_token_bucket():
+    """A full bucket allows burst requests at once, then rate per second"""
+    bucket = TokenBucket(rate=10, burst=5, now=0.0)
+    assert sum(bucket.allow(now=0.0) for _ in range(10)) == 5
+    assert not bucket.allow(now=0.05)
+    assert bucket.allow(now=0.1)
+    # Idle time never fills the bucket past burst
+    assert sum(bucket.allow(now=100.0) for _ in range(10)) == 5
+    print("✅ token bucket")
+
+
+def test_keyed_limiter():
+    """Keys are limited independently; the least recently used key is evicted past max_keys"""
+    limiter = KeyedRateLimiter(rate=1, burst=2, max_keys=2)
+    assert limiter.allow("a", now=0.0) and limiter.allow("a", now=0.0)
+    assert not limiter.allow("a", now=0.0)
+    assert limiter.allow("b", now=0.0)
+    assert limiter.allow("c", now=0.0)
+    assert len(limiter) == 2
+    # "a" was evicted, so it comes back with a full bucket
+    assert limiter.allow("a", now=0.0)
+    print("✅ keyed limiter")
+
+
+def test_codel():
+    """Shedding starts after a full interval above target, ramps up, and stops once the delay recovers"""
+    shedder = CoDelShedder(["opened", "clicked"], target=0.005, interval=0.1)
+    now = 0.0
+    shed = 0
+    while now < 0.1:
+        shedder.observe(0.02, now=now)
+        shed += shedder.should_shed("opened", now=now)
+        now += 0.001
+    assert shed == 0 and not shedder.dropping
+
+    # Inside the dropping state: drops come due at interval / sqrt(count)
+    gaps = []
+    last = None
+    while now < 1.0:
+        shedder.observe(0.02, now=now)
+        assert not shedder.should_shed("hard_bounce", now=now)
+        if shedder.should_shed("opened", now=now):
+            if last is not None:
+                gaps.append(now - last)
+            last = now
+        now += 0.001
+    assert shedder.dropping and len(gaps) > 3
+    assert gaps[-1] < gaps[0]
+
+    shedder.observe(0.001, now=now)
+    assert not shedder.dropping
+    assert not shedder.should_shed("opened", now=now)
+    print(f"✅ CoDel shedding ({shedder.shed_count} shed)")
+
+
+if __name__ == "__main__":
+    test_parse_rate()
+    test_token_bucket()
+    test_keyed_limiter()
+    test_codel()
+    print("\n✨ All rate limit tests passed!")
@@ -0,0 +1,78 @@
+"""
+Precomputed response checks: cached bodies match json.dumps, follow registry changes, and health reports readiness
+
+    python test_response_cache.py
+"""
+import json
+
+from handler_registry import HandlerRegistry
+from response_cache import ReadinessSignals, ResponseCache
+
+
+def handle(data):
+    pass
+
+
+def make_cache(max_queue_depth: int = 0):
+    registry = HandlerRegistry({"opened": handle, "clicked": handle})
+    signals = ReadinessSignals()
+    cache = ResponseCache(
+        service="Brevo Webhook Handler",
+        running_message="Brevo Webhook Handler is running",
+        endpoints={"webhook": "/webhook"},
+        registry=registry,
+        ack_messages={"webhook": "Webhook processed", "test": "Test webhook received successfully"},
+        signals=signals,
+        max_queue_depth=max_queue_depth,
+    )
+    return registry, signals, cache
+
+
+def test_bodies():
+    """Acknowledgements and the root body decode to what the routes used to build per request"""
+    registry, _, cache = make_cache()
+    assert json.loads(cache.ack("opened").body) == {"success": True, "message": "Webhook processed", "event": "opened"}
+    assert json.loads(cache.ack("opened", "test").body)["message"] == "Test webhook received successfully"
+    # Unknown and missing events are rendered on the fly
+    assert json.loads(cache.ack("spam\"quoted").body)["event"] == "spam\"quoted"
+    assert json.loads(cache.ack(None).body)["event"] is None
+    root = json.loads(cache.root().body)
+    assert root["supported_events"] == ["opened", "clicked"]
+    print("✅ cached bodies")
+
+
+def test_registry_change():
+    """Registering a handler rebuilds the root body and adds a cached acknowledgement"""
+    registry, _, cache = make_cache()
+    registry["hard_bounce"] = handle
+    assert "hard_bounce" in json.loads(cache.root().body)["supported_events"]
+    assert cache.ack("hard_bounce").body is cache._acks["webhook"]["hard_bounce"]
+    del registry["clicked"]
+    assert "clicked" not in json.loads(cache.root().body)["supported_events"]
+    print("✅ registry changes")
+
+
+def test_health_signals():
+    """Health turns 503 past the queue depth limit and reports the handler latency average"""
+    _, signals, cache = make_cache(max_queue_depth=2)
+    signals.adjust_depth(2)
+    signals.observe_latency(10.0)
+    response = cache.health()
+    body = json.loads(response.body)
+    assert response.status_code == 200 and body["status"] == "OK"
+    assert body["queue_depth"] == 2
+    assert abs(body["handler_latency_ms"] - 2.0) < 1e-9
+
+    signals.adjust_depth(1)
+    response = cache.health()
+    assert response.status_code == 503 and json.loads(response.body)["status"] == "DEGRADED"
+    signals.adjust_depth(-3)
+    assert cache.health().status_code == 200
+    print("✅ health signals")
+
+
+if __name__ == "__main__":
+    test_bodies()
+    test_registry_change()
+    test_health_signals()
+    print("\n✨ All response cache tests passed!")
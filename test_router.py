@@ -0,0 +1,82 @@
+"""
+Router checks: consistent-hash key movement, signed forwarding to the owning node and the admin node routes
+
+    python test_router.py
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+
+import httpx
+
+import router
+from router import HashRing
+
+
+def test_ring():
+    """Each node owns a share of the keys; adding a node moves keys only to it, and removing it moves them back"""
+    ring = HashRing(["http://a", "http://b", "http://c"])
+    assert abs(sum(ring.shares().values()) - 1.0) < 1e-9
+    keys = [f"user{n}@example.com" for n in range(20000)]
+    before = {key: ring.node_for(key) for key in keys}
+    ring.add("http://d")
+    moved = [key for key in keys if ring.node_for(key) != before[key]]
+    assert all(ring.node_for(key) == "http://d" for key in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.35
+    ring.remove("http://d")
+    assert all(ring.node_for(key) == before[key] for key in keys)
+    assert HashRing().node_for("a@example.com") is None
+    print("✅ hash ring")
+
+
+def test_routes():
+    """Verified webhooks reach the node owning their key with the trust token; node changes need the admin token"""
+    forwarded = []
+
+    def node(request: httpx.Request) -> httpx.Response:
+        forwarded.append((request.url.host, json.loads(request.content)["data"]["email"], request.headers.get("x-router-token")))
+        return httpx.Response(200, json={"status": "success"})
+
+    saved = router.BREVO_WEBHOOK_SECRET, router.ADMIN_TOKEN, router.ROUTER_TRUST_TOKEN, router.client
+    router.BREVO_WEBHOOK_SECRET, router.ADMIN_TOKEN, router.ROUTER_TRUST_TOKEN = "key", "admin", "trust"
+    admin = {"x-admin-token": "admin"}
+
+    async def post(client, email: str, secret: str = "key", path: str = "/webhook/brevo"):
+        body = json.dumps({"event": "delivered", "data": {"email": email}}).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return (await client.post(path, content=body, headers={"x-brevo-signature": signature})).status_code
+
+    async def run():
+        router.client = httpx.AsyncClient(transport=httpx.MockTransport(node))
+        transport = httpx.ASGITransport(app=router.app)
+        async with router.client, httpx.AsyncClient(transport=transport, base_url="http://router") as client:
+            assert await post(client, "a@example.com") == 503  # no nodes yet
+            assert (await client.get("/router/nodes")).status_code == 403
+            for bad in ({"nodes": ["http://n1"]}, ["http://n1", 3], [""]):
+                assert (await client.put("/router/nodes", json=bad, headers=admin)).status_code == 400
+            response = await client.put("/router/nodes", json=["http://n1/", "http://n2"], headers=admin)
+            assert response.status_code == 200 and response.json()["members"] == ["http://n1", "http://n2"]
+
+            emails = [f"user{n}@example.com" for n in range(20)]
+            for email in emails:
+                assert await post(client, email) == 200
+            assert await post(client, "a@example.com", secret="wrong") == 401
+            assert await post(client, "a@example.com", path="/tenants/acme/webhook/brevo") == 404
+            assert (await client.get("/health")).status_code == 200
+            await client.put("/router/nodes", json=[], headers=admin)
+            return emails
+
+    try:
+        emails = asyncio.run(run())
+    finally:
+        router.BREVO_WEBHOOK_SECRET, router.ADMIN_TOKEN, router.ROUTER_TRUST_TOKEN, router.client = saved
+    ring = HashRing(["http://n1", "http://n2"])
+    assert forwarded == [(ring.node_for(email)[len("http://"):], email, "trust") for email in emails]
+    print("✅ forwarding and node routes")
+
+
+if __name__ == "__main__":
+    test_ring()
+    test_routes()
+    print("\n✨ All router tests passed!")
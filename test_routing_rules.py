@@ -0,0 +1,123 @@
+"""
+Routing rule checks: compiled first-match agrees with a linear scan, validation and reload, and rule actions in the pipeline
+
+    python test_routing_rules.py
+"""
+import json
+import os
+import random
+import tempfile
+import time
+
+from bench_routing import linear_match, random_event, random_rule
+from handler_registry import HandlerRegistry
+from pipeline import WebhookPipeline
+from routing_rules import RoutingRules
+
+RULES = [
+    {"name": "ignore-gmail-opens", "events": ["opened"], "match": {"domain": "Gmail.com"}, "action": "drop"},
+    {"name": "vip", "events": ["hard_bounced", "opened"], "match": {"tags": "vip"}, "action": "handler", "handler": "json:dumps"},
+    {"name": "archive-550", "match": {"error_code": [550, 551]}, "action": "sink", "sinks": ["event_store"]},
+]
+
+
+def write_rules(path: str, rules, age: float = 0.0):
+    with open(path, "w") as f:
+        json.dump({"rules": rules}, f)
+    # Rewrites within one mtime tick would look unchanged
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_against_linear_scan():
+    """Random rule sets pick the same first match as evaluating every rule in order"""
+    random.seed(43)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.json")
+        for count in (1, 50, 400):
+            rules = [random_rule(index) for index in range(count)]
+            write_rules(path, rules)
+            compiled = RoutingRules(path, reload_interval=3600)
+            assert len(compiled) == count
+            matched = 0
+            for _ in range(3000):
+                sample = random_event()
+                # Matching events are rare with random data; borrow a rule's values half the time
+                if random.random() < 0.5:
+                    rule = random.choice(rules)
+                    for field, wanted in rule["match"].items():
+                        value = random.choice(wanted) if isinstance(wanted, list) else wanted
+                        if field == "domain":
+                            sample["data"]["email"] = f"someone@{value.upper()}"
+                        elif field == "tags":
+                            sample["data"]["tags"] = ["other", value]
+                        else:
+                            sample["data"][field] = value
+                    sample["event"] = random.choice(rule.get("events") or [sample["event"]])
+                expected = linear_match(rules, sample["event"], sample["data"])
+                rule = compiled.match(sample["event"], sample["data"])
+                assert (rule.name if rule is not None else None) == (f"rule{expected}" if expected is not None else None)
+                matched += expected is not None
+            assert matched > 0
+    print("✅ compiled rules match a linear scan")
+
+
+def test_validation_and_reload():
+    """Case-insensitive domains, list fields and wildcard rules; a broken file keeps the previous rules"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.json")
+        write_rules(path, RULES, age=60)
+        rules = RoutingRules(path, reload_interval=0)
+        assert rules.match("opened", {"email": "a@GMAIL.com"}).name == "ignore-gmail-opens"
+        assert rules.match("clicked", {"email": "a@gmail.com"}) is None
+        vip = rules.match("opened", {"email": "a@yahoo.com", "tags": ["news", "vip"]})
+        assert vip.name == "vip" and vip.handler is json.dumps
+        assert rules.match("blocked", {"error_code": 551}).sinks == frozenset({"event_store"})
+        assert rules.match("opened", {"email": "a@yahoo.com", "error_code": "550"}).name == "archive-550"
+        assert rules.stats()["hits"] == {"handler": 1, "sink": 2, "drop": 1}
+
+        broken = ([{"action": "explode"}], [{"action": "sink", "sinks": ["nowhere"]}], [{"action": "handler"}])
+        for age, entries in zip((50, 40, 30), broken):
+            write_rules(path, entries, age=age)
+            assert len(rules) == 3 and rules.match("opened", {"email": "a@gmail.com"}) is not None
+        write_rules(path, RULES[2:])
+        assert rules.match("opened", {"email": "a@gmail.com"}) is None and len(rules) == 1
+    print("✅ validation and reload")
+
+
+def test_pipeline_actions():
+    """Dropped events reach no handler or sink; sink rules skip the handler and record only in their sinks"""
+    handled = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.json")
+        write_rules(path, RULES)
+        pipeline = WebhookPipeline(
+            source="campaign",
+            title="Routing test",
+            description="",
+            handlers=HandlerRegistry({event: (lambda data, event=event: handled.append((event, data["email"]))) for event in ("opened", "hard_bounced")}),
+            secret="key",
+            webhook_path="/webhook/brevo",
+            test_path="/webhook/brevo/test",
+            scope_field="campaign_id",
+            coalesce_field="campaign_id",
+            lane_keys=("email",),
+            geo_events=(),
+            shed_events=(),
+            ack_messages={"webhook": "Webhook processed", "test": "Test webhook received"},
+        )
+        pipeline.routing_rules = RoutingRules(path)
+        pipeline.run_handler("opened", {"email": "a@gmail.com"})
+        pipeline.run_handler("opened", {"email": "b@yahoo.com"})
+        pipeline.run_handler("hard_bounced", {"email": "c@yahoo.com", "error_code": 550})
+    assert handled == [("opened", "b@yahoo.com")]
+    # Only the unmatched open reached the stats
+    assert pipeline.heavy_hitters.window("domain", 60).total == 1
+    print("✅ rule actions in the pipeline")
+
+
+if __name__ == "__main__":
+    test_against_linear_scan()
+    test_validation_and_reload()
+    test_pipeline_actions()
+    print("\n✨ All routing rule tests passed!")
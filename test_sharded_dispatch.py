@@ -0,0 +1,74 @@
+"""
+Dispatch lane checks: per-key ordering under work stealing, and intake that never blocks the loop
+
+    python test_sharded_dispatch.py
+"""
+import random
+import threading
+import time
+
+from sharded_dispatch import ShardedDispatcher
+
+
+def test_per_key_order():
+    """Events of one key are handled in submission order, even when slots are stolen"""
+    seen = {}
+    lock = threading.Lock()
+
+    def run(event, data):
+        # Uneven handler times keep some lanes busy while others go idle and steal
+        if data["seq"] % 7 == 0:
+            time.sleep(0.0005)
+        with lock:
+            seen.setdefault(data["email"], []).append(data["seq"])
+
+    dispatcher = ShardedDispatcher(8, run, key_fields=("email",), slots_per_lane=4, batch=4)
+    rng = random.Random(7)
+    # A few hot keys and a long tail, interleaved
+    keys = [f"hot{n}@example.com" for n in range(4)] * 50 + [f"user{n}@example.com" for n in range(400)]
+    sequences = {}
+    for _ in range(5):
+        rng.shuffle(keys)
+        for key in keys:
+            sequences[key] = sequences.get(key, -1) + 1
+            dispatcher.submit("opened", {"email": key, "seq": sequences[key]})
+    assert dispatcher.drain(timeout=30)
+    stats = dispatcher.stats()
+    dispatcher.stop()
+
+    assert stats["errors"] == 0
+    assert sum(stats["processed"]) == len(keys) * 5
+    for key, handled in seen.items():
+        assert handled == list(range(sequences[key] + 1)), key
+    print(f"✅ per-key order ({sum(stats['stolen'])} slots stolen)")
+
+
+def test_nonblocking_submit():
+    """With block=False a full dispatcher still takes the event without waiting; full() reports the overload"""
+    release = threading.Event()
+    handled = []
+
+    def run(event, data):
+        release.wait()
+        handled.append(data["seq"])
+
+    dispatcher = ShardedDispatcher(1, run, key_fields=("email",), max_pending=10)
+    for seq in range(10):
+        dispatcher.submit("opened", {"email": "a@example.com", "seq": seq})
+    assert dispatcher.full()
+
+    started = time.perf_counter()
+    dispatcher.submit("opened", {"email": "a@example.com", "seq": 10}, block=False)
+    assert time.perf_counter() - started < 0.5
+
+    release.set()
+    assert dispatcher.drain(timeout=10)
+    assert not dispatcher.full()
+    dispatcher.stop()
+    assert handled == list(range(11))
+    print("✅ non-blocking submit")
+
+
+if __name__ == "__main__":
+    test_per_key_order()
+    test_nonblocking_submit()
@@ -0,0 +1,117 @@
+"""
+Tenant checks: per-tenant secrets, event filters, unknown tenants and hot reload of the registry
+
+    python test_tenants.py
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+
+import httpx
+
+from handler_registry import HandlerRegistry
+from pipeline import WebhookPipeline
+from tenants import TenantRegistry
+
+
+def write_registry(path: str, tenants, age: float = 0.0):
+    with open(path, "w") as f:
+        json.dump({"tenants": tenants}, f)
+    # Rewrites within one mtime tick would look unchanged to the registry
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def sign(secret: str, body: bytes) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_registry_reload():
+    """Tenants without a secret for the app are skipped; a broken file keeps the previous table"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tenants.json")
+        write_registry(path, [
+            {"id": "acme", "secrets": {"campaign": "acme-key"}, "rate_limit": {"rate": 1, "burst": 2}},
+            {"id": "globex", "secrets": {"transactional": "globex-key"}},
+        ], age=60)
+        registry = TenantRegistry(path, "campaign", reload_interval=0)
+        assert registry.ids() == ["acme"]
+        bucket = registry.get("acme").bucket
+
+        write_registry(path, [
+            {"id": "acme", "secrets": {"campaign": "acme-key-2"}, "rate_limit": {"rate": 1, "burst": 2}},
+            {"id": "initech", "secrets": {"campaign": "initech-key"}},
+        ])
+        assert registry.get("acme").secret == "acme-key-2"
+        assert registry.get("initech") is not None
+        # An unchanged rate limit keeps the bucket and its fill level
+        assert registry.get("acme").bucket is bucket
+
+        with open(path, "w") as f:
+            f.write("{not json")
+        os.utime(path, (time.time() + 60, time.time() + 60))
+        assert registry.get("initech") is not None
+    print("✅ registry reload")
+
+
+def test_routes():
+    """Each tenant signs with its own secret, events outside its filter are acked unhandled, unknown ids get 404"""
+    handled = []
+    handlers = HandlerRegistry({
+        "opened": lambda data: handled.append(("opened", data.get("tenant_id"))),
+        "clicked": lambda data: handled.append(("clicked", data.get("tenant_id"))),
+    })
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tenants.json")
+        write_registry(path, [{"id": "acme", "secrets": {"campaign": "acme-key"}, "events": ["opened"]}])
+        pipeline = WebhookPipeline(
+            source="campaign",
+            title="Tenant test",
+            description="",
+            handlers=handlers,
+            secret="global-key",
+            webhook_path="/webhook/brevo",
+            test_path="/webhook/brevo/test",
+            scope_field="campaign_id",
+            coalesce_field="campaign_id",
+            lane_keys=("email",),
+            geo_events=(),
+            shed_events=(),
+            ack_messages={"webhook": "Webhook processed", "test": "Test webhook received"},
+        )
+        pipeline.tenant_registry = TenantRegistry(path, "campaign")
+
+        async def post(client, url, event, secret):
+            body = json.dumps({"event": event, "data": {"email": "a@example.com"}}).encode()
+            return (await client.post(url, content=body, headers={"x-brevo-signature": sign(secret, body)})).status_code
+
+        async def run():
+            transport = httpx.ASGITransport(app=pipeline.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                assert await post(client, "/tenants/acme/webhook/brevo", "opened", "acme-key") == 200
+                assert await post(client, "/tenants/acme/webhook/brevo", "clicked", "acme-key") == 200
+                assert await post(client, "/tenants/acme/webhook/brevo", "opened", "global-key") == 401
+                assert await post(client, "/tenants/nope/webhook/brevo", "opened", "acme-key") == 404
+                assert await post(client, "/webhook/brevo", "opened", "global-key") == 200
+                # The header names the tenant on the shared path too
+                body = json.dumps({"event": "opened", "data": {"email": "a@example.com"}}).encode()
+                response = await client.post(
+                    "/webhook/brevo", content=body,
+                    headers={"x-brevo-signature": sign("acme-key", body), "x-tenant-id": "acme"}
+                )
+                assert response.status_code == 200
+
+        asyncio.run(run())
+        assert handled == [("opened", "acme"), ("opened", None), ("opened", "acme")]
+        assert pipeline.metrics.get("webhook_filtered", tenant="acme") == 1
+    print("✅ tenant routes")
+
+
+if __name__ == "__main__":
+    test_registry_reload()
+    test_routes()
+    print("\n✨ All tenant tests passed!")
@@ -0,0 +1,124 @@
+"""
+Workload checks: reproducible streams, message lifecycles, duplicates and late events, and signed bodies the apps accept
+
+    python test_workload.py
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import httpx
+
+from handler_registry import HandlerRegistry
+from pipeline import WebhookPipeline
+from workload import Workload, Zipf, signed_lines
+
+# The defaults of `python workload.py generate`
+DEFAULTS = dict(
+    seed=7, duration=3600, events=None, start="2024-05-01T00:00:00+00:00", rate=50, diurnal=0.6, peak_hour=14,
+    recipients=1_000_000, recipient_skew=0.9, campaigns=500, campaign_skew=1.1, duplicates=0.02, reorder=0.01,
+    reorder_window=300, p_hard_bounce=0.01, p_soft_bounce=0.03, p_soft_recovers=0.6, p_open=0.25, reopens=0.8,
+    p_click=0.15, p_unsubscribe=0.01, p_spam=0.001, p_blocked=0.003, p_invalid=0.001, p_error=0.0005,
+)
+
+
+def workload(app: str, **overrides) -> Workload:
+    return Workload(app, argparse.Namespace(**{**DEFAULTS, **overrides}))
+
+
+def test_reproducible():
+    """A seed fixes the whole stream; another seed gives another one"""
+    first = list(workload("campaign", events=2000).events())
+    assert first == list(workload("campaign", events=2000).events())
+    assert first != list(workload("campaign", events=2000, seed=8).events())
+    assert len(first) == 2000
+    print("✅ reproducible streams")
+
+
+def test_zipf():
+    """Rank frequencies follow rank ** -s"""
+    zipf = Zipf(1000, 1.0, random.Random(1))
+    counts = Counter(zipf.sample() for _ in range(100_000))
+    assert min(counts) >= 1 and max(counts) <= 1000
+    harmonic = sum(1 / rank for rank in range(1, 1001))
+    assert abs(counts[1] / 100_000 - 1 / harmonic) < 0.01
+    assert abs(counts[1] / counts[2] - 2) < 0.2
+    print("✅ Zipf sampling")
+
+
+def test_lifecycles():
+    """Arrival order is non-decreasing; per message, payload times follow the lifecycle order"""
+    for app, first_event in (("campaign", "delivered"), ("transactional", "sent")):
+        stream = workload(app, duration=1800, rate=20, reorder=0.1, duplicates=0.1)
+        messages = defaultdict(list)
+        emitted = []
+        for emit, event, data in stream.events():
+            emitted.append(emit)
+            messages[data["message_id"]].append((datetime.fromisoformat(data["timestamp"]), event))
+        assert emitted == sorted(emitted) and emitted[-1] <= 1800
+        assert 0.05 < stream.duplicates / len(emitted) < 0.15
+        assert 0.05 < stream.reordered / (len(emitted) - stream.duplicates) < 0.15
+
+        rank = {"sent": 0, "soft_bounced": 1, "delivered": 2, "hard_bounced": 2, "opened": 3, "first_opening": 3, "clicked": 4}
+        for events in messages.values():
+            names = [event for _, event in sorted(events)]
+            # Opens and clicks only follow a delivery; a hard bounce ends the message
+            if "opened" in names:
+                assert "delivered" in names
+            if "hard_bounced" in names:
+                assert set(names) <= {"sent", "hard_bounced"}
+            lifecycle = [rank[name] for name in names if name in rank and name not in ("opened", "clicked")]
+            assert lifecycle == sorted(lifecycle)
+            opens = [at for at, event in events if event == "opened"]
+            delivered = [at for at, event in events if event == "delivered"]
+            if opens:
+                assert min(opens) >= max(delivered)
+        starts = Counter(names[0] for names in ([event for _, event in sorted(events)] for events in messages.values()))
+        assert starts.most_common(1)[0][0] == first_event
+    print("✅ lifecycles, duplicates and late events")
+
+
+def test_signed_lines():
+    """Generated lines carry the app's path and a signature the app accepts"""
+    handled = []
+    pipeline = WebhookPipeline(
+        source="transactional",
+        title="Workload test",
+        description="",
+        handlers=HandlerRegistry({event: handled.append for event in ("sent", "delivered", "soft_bounced", "hard_bounced", "opened", "first_opening", "clicked")}),
+        secret="key",
+        webhook_path="/webhook/brevo/transactional",
+        test_path="/webhook/brevo/transactional/test",
+        scope_field="template_id",
+        coalesce_field="template_id",
+        lane_keys=("message_id",),
+        geo_events=(),
+        shed_events=(),
+        ack_messages={"webhook": "Webhook processed", "test": "Test webhook received"},
+    )
+    lines = list(signed_lines(workload("transactional", events=200), "key"))
+    assert {line["path"] for line in lines} == {"/webhook/brevo/transactional"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=pipeline.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statuses = Counter()
+            for line in lines:
+                response = await client.post(line["path"], content=line["body"].encode(), headers={"x-brevo-signature": line["signature"]})
+                statuses[response.status_code] += 1
+            return statuses
+
+    assert asyncio.run(run()) == {200: 200}
+    assert len(handled) == sum(json.loads(line["body"])["event"] in pipeline.handlers for line in lines) > 0
+    print("✅ signed lines")
+
+
+if __name__ == "__main__":
+    test_reproducible()
+    test_zipf()
+    test_lifecycles()
+    test_signed_lines()
+    print("\n✨ All workload tests passed!")
@@ -1,32 +1,20 @@
-from fastapi import FastAPI, Request, HTTPException, Depends
-from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import hashlib
-import hmac
-import json
 import os
-from datetime import datetime
 from typing import Dict, Any
-from dotenv import load_dotenv
 import logging
 
-# Load environment variables
-load_dotenv()
+from config import HANDLER_PLUGINS, HOST, RELOAD
+from handler_registry import HandlerRegistry
+from pipeline import WebhookPipeline
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize FastAPI app
-app = FastAPI(
-    title="Brevo Transactional Webhook Handler",
-    description="Webhook handler for Brevo transactional email events",
-    version="1.0.0"
-)
-
 # Configuration
 PORT = int(os.getenv("TRANSACTIONAL_PORT", 3001))  # Different port from campaign webhook
 BREVO_WEBHOOK_SECRET = os.getenv("BREVO_TRANSACTIONAL_WEBHOOK_SECRET", "your_transactional_webhook_secret_here")
+SHED_EVENTS = [e for e in os.getenv("SHED_EVENTS", "opened,clicked,first_opening").split(",") if e]
 
 # Check if webhook secret is properly configured
 if BREVO_WEBHOOK_SECRET == "your_transactional_webhook_secret_here":
@@ -37,30 +25,6 @@ class TransactionalWebhookEvent(BaseModel):
     event: str
     data: Dict[str, Any]
 
-# Webhook signature verification dependency
-async def verify_webhook_signature(request: Request):
-    """Verify Brevo transactional webhook signature"""
-    signature = request.headers.get("x-brevo-signature")
-    
-    if not signature or not BREVO_WEBHOOK_SECRET:
-        raise HTTPException(status_code=401, detail="Missing signature or transactional webhook secret")
-    
-    # Get request body
-    body = await request.body()
-    
-    # Create expected signature
-    expected_signature = hmac.new(
-        BREVO_WEBHOOK_SECRET.encode(),
-        body,
-        hashlib.sha256
-    ).hexdigest()
-    
-    # Compare signatures
-    if not hmac.compare_digest(signature, expected_signature):
-        raise HTTPException(status_code=401, detail="Invalid signature")
-    
-    return body
-
 # Event handlers for different transactional events
 class TransactionalEventHandlers:
     @staticmethod
@@ -82,7 +46,9 @@ class TransactionalEventHandlers:
             "timestamp": data.get("timestamp"),
             "link_url": data.get("link_url"),
             "user_agent": data.get("user_agent"),
-            "ip_address": data.get("ip_address")
+            "ip_address": data.get("ip_address"),
+            "geo": data.get("geo"),
+            "count": data.get("count", 1)
         })
         # Add your click tracking logic here
     
@@ -106,7 +72,7 @@ class TransactionalEventHandlers:
             "error_code": data.get("error_code")
         })
         # Add your soft bounce handling logic here
-        # Consider retrying later
+        # Repeated soft bounces are escalated by the bounce tracker (SOFT_BOUNCE_THRESHOLD)
     
     @staticmethod
     def handle_spam(data: Dict[str, Any]):
@@ -125,7 +91,8 @@ class TransactionalEventHandlers:
             "message_id": data.get("message_id"),
             "timestamp": data.get("timestamp"),
             "user_agent": data.get("user_agent"),
-            "ip_address": data.get("ip_address")
+            "ip_address": data.get("ip_address"),
+            "geo": data.get("geo")
         })
         # Add your first opening tracking logic here
     
@@ -148,7 +115,9 @@ class TransactionalEventHandlers:
             "message_id": data.get("message_id"),
             "timestamp": data.get("timestamp"),
             "user_agent": data.get("user_agent"),
-            "ip_address": data.get("ip_address")
+            "ip_address": data.get("ip_address"),
+            "geo": data.get("geo"),
+            "count": data.get("count", 1)
         })
         # Add your open tracking logic here
     
@@ -198,7 +167,7 @@ class TransactionalEventHandlers:
         # Remove email from your mailing list
 
 # Event handler mapping for transactional events
-TRANSACTIONAL_EVENT_HANDLERS = {
+TRANSACTIONAL_EVENT_HANDLERS = HandlerRegistry({
     "sent": TransactionalEventHandlers.handle_sent,
     "clicked": TransactionalEventHandlers.handle_clicked,
     "delivered": TransactionalEventHandlers.handle_delivered,
@@ -211,105 +180,33 @@ TRANSACTIONAL_EVENT_HANDLERS = {
     "blocked": TransactionalEventHandlers.handle_blocked,
     "error": TransactionalEventHandlers.handle_error,
     "unsubscribed": TransactionalEventHandlers.handle_unsubscribed
-}
-
-@app.post("/webhook/brevo/transactional/test")
-async def brevo_transactional_webhook_test(request: Request):
-    """Test transactional webhook endpoint without signature verification"""
-    try:
-        # Parse JSON body
-        webhook_data = await request.json()
-        event = webhook_data.get("event")
-        # For transactional webhooks, the data is often in the root of the payload
-        data = webhook_data.get("data", webhook_data)
-        
-        logger.info("🎯 Received Brevo transactional webhook test event: %s", event)
-        logger.info("📊 Event data: %s", json.dumps(data, indent=2))
-        
-        # Check if we have a handler for this event
-        if event in TRANSACTIONAL_EVENT_HANDLERS:
-            TRANSACTIONAL_EVENT_HANDLERS[event](data)
-        else:
-            logger.warning("⚠️ No handler found for transactional event: %s", event)
-        
-        # Always respond with 200 OK to acknowledge receipt
-        return JSONResponse(
-            status_code=200,
-            content={
-                "success": True,
-                "message": "Transactional test webhook received successfully",
-                "event": event
-            }
-        )
-        
-    except Exception as e:
-        logger.error("❌ Error processing transactional test webhook: %s", str(e))
-        raise HTTPException(status_code=500, detail="Internal server error")
+})
 
-@app.post("/webhook/brevo/transactional")
-async def brevo_transactional_webhook(
-    request: Request,
-    body: bytes = Depends(verify_webhook_signature)
-):
-    """Main webhook endpoint for Brevo transactional email events"""
-    try:
-        # Parse JSON body
-        webhook_data = json.loads(body.decode())
-        event = webhook_data.get("event")
-        data = webhook_data.get("data", {})
-        
-        logger.info("🎯 Received Brevo transactional webhook event: %s", event)
-        logger.info("📊 Event data: %s", json.dumps(data, indent=2))
-        
-        # Check if we have a handler for this event
-        if event in TRANSACTIONAL_EVENT_HANDLERS:
-            TRANSACTIONAL_EVENT_HANDLERS[event](data)
-        else:
-            logger.warning("⚠️ No handler found for transactional event: %s", event)
-        
-        # Always respond with 200 OK to acknowledge receipt
-        return JSONResponse(
-            status_code=200,
-            content={
-                "success": True,
-                "message": "Transactional webhook received successfully",
-                "event": event
-            }
-        )
-        
-    except json.JSONDecodeError as e:
-        logger.error("❌ Invalid JSON in transactional webhook payload: %s", str(e))
-        raise HTTPException(status_code=400, detail="Invalid JSON payload")
-    except Exception as e:
-        logger.error("❌ Error processing transactional webhook: %s", str(e))
-        raise HTTPException(status_code=500, detail="Internal server error")
-
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return JSONResponse(
-        status_code=200,
-        content={
-            "status": "OK",
-            "timestamp": datetime.now().isoformat(),
-            "service": "Brevo Transactional Webhook Handler"
-        }
-    )
+# Handlers contributed by installed packages, imported on their first event
+if HANDLER_PLUGINS:
+    TRANSACTIONAL_EVENT_HANDLERS.load_entry_points("brevo_webhooks.transactional_handlers")
 
-@app.get("/")
-async def root():
-    """Root endpoint with API information"""
-    return JSONResponse(
-        status_code=200,
-        content={
-            "message": "Brevo Transactional Webhook Handler is running",
-            "endpoints": {
-                "webhook": "POST /webhook/brevo/transactional",
-                "health": "GET /health"
-            },
-            "supported_events": list(TRANSACTIONAL_EVENT_HANDLERS.keys())
-        }
-    )
+# Routes and dispatch shared with the campaign app
+pipeline = WebhookPipeline(
+    source="transactional",
+    title="Brevo Transactional Webhook Handler",
+    description="Webhook handler for Brevo transactional email events",
+    handlers=TRANSACTIONAL_EVENT_HANDLERS,
+    secret=BREVO_WEBHOOK_SECRET,
+    webhook_path="/webhook/brevo/transactional",
+    test_path="/webhook/brevo/transactional/test",
+    scope_field="template_id",
+    coalesce_field="message_id",
+    lane_keys=("message_id", "email"),
+    geo_events=("opened", "clicked", "first_opening"),
+    shed_events=SHED_EVENTS,
+    ack_messages={
+        "webhook": "Transactional webhook received successfully",
+        "test": "Transactional test webhook received successfully"
+    },
+    test_data_at_root=True
+)
+app = pipeline.app
 
 if __name__ == "__main__":
     import uvicorn
@@ -318,10 +215,11 @@ if __name__ == "__main__":
     logger.info("❤️ Health check: http://localhost:%s/health", PORT)
     logger.info("📋 Supported transactional events: %s", ", ".join(TRANSACTIONAL_EVENT_HANDLERS.keys()))
     
+    # Reload needs an import string and re-imports the app in a worker; otherwise serve the app built above
     uvicorn.run(
-        "transactional_main:app",
-        host="0.0.0.0",
+        "transactional_main:app" if RELOAD else app,
+        host=HOST,
         port=PORT,
-        reload=True,
+        reload=RELOAD,
         log_level="info"
     )
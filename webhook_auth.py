@@ -0,0 +1,70 @@
+"""
+Webhook authentication shared by the app pipelines and the front router
+
+Resolves the tenant a request names, applies the per-source and per-tenant
+rate limits and checks the Brevo HMAC-SHA256 signature against the global
+or the tenant's secret. Rejections are counted in the caller's metrics.
+"""
+import hashlib
+import hmac
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from metrics import Metrics
+from rate_limit import KeyedRateLimiter
+
+if TYPE_CHECKING:
+    from tenants import Tenant, TenantRegistry
+
+
+def resolve_tenant(request: Request, registry: Optional["TenantRegistry"], metrics: Metrics) -> Optional["Tenant"]:
+    """Tenant named by the route path or the X-Tenant-ID header, if any"""
+    tenant_id = request.path_params.get("tenant_id") or request.headers.get("x-tenant-id")
+    if tenant_id is None:
+        return None
+
+    tenant = registry.get(tenant_id) if registry is not None else None
+    if tenant is None:
+        metrics.incr("webhook_rejected", reason="unknown_tenant")
+        raise HTTPException(status_code=404, detail="Unknown tenant")
+    return tenant
+
+
+async def verify_webhook(
+    request: Request,
+    secret: str,
+    registry: Optional["TenantRegistry"],
+    metrics: Metrics,
+    source_limiter: Optional[KeyedRateLimiter] = None,
+) -> Tuple[bytes, Optional["Tenant"]]:
+    """Verify the Brevo webhook signature with the global or the tenant's secret; returns the body and tenant"""
+    # Per-source rate limit, checked before spending time on the HMAC
+    if source_limiter is not None:
+        source = request.client.host if request.client else "unknown"
+        if not source_limiter.allow(source):
+            metrics.incr("webhook_rejected", reason="source_rate_limited")
+            raise HTTPException(status_code=429, detail="Rate limit exceeded")
+
+    signature = request.headers.get("x-brevo-signature")
+    tenant = resolve_tenant(request, registry, metrics)
+    if tenant is not None:
+        secret = tenant.secret
+    tenant_label = tenant.id if tenant is not None else None
+
+    if not signature or not secret:
+        metrics.incr("webhook_rejected", tenant=tenant_label, reason="missing_signature")
+        raise HTTPException(status_code=401, detail="Missing signature or webhook secret")
+
+    body = await request.body()
+    expected_signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, expected_signature):
+        metrics.incr("webhook_rejected", tenant=tenant_label, reason="invalid_signature")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    # Apply the tenant's rate limit
+    if tenant is not None and not tenant.allow():
+        metrics.incr("webhook_rejected", tenant=tenant_label, reason="rate_limited")
+        raise HTTPException(status_code=429, detail="Tenant rate limit exceeded")
+
+    return body, tenant
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Synthetic, production-shaped webhook traffic for the campaign and transactional apps
+
+Messages start at a diurnal rate: a cosine around ``--rate`` that peaks at
+``--peak-hour``. Each message goes to a Zipf-distributed recipient and
+campaign or template, and lives through a sampled lifecycle:
+
+    campaign       delivered | soft_bounced (maybe delivered later) | hard_bounced
+                   -> opened* -> clicked* -> unsubscribe / spam
+    transactional  blocked | invalid_email | error, or
+                   sent -> delivered | soft_bounced | hard_bounced
+                   -> first_opening + opened* -> clicked* -> unsubscribed / spam
+
+Events are emitted in arrival order. Some arrive twice (provider retries),
+and some arrive late, after events that happened later; their payload
+timestamps stay true. Every body is signed the way the test scripts sign
+theirs (``create_signature``).
+
+    python workload.py generate --app campaign --duration 86400 --out day.jsonl
+    python workload.py send --app transactional --target http://localhost:3001 --speed 60
+    python workload.py send --input day.jsonl --target http://localhost:3000 --speed 0
+
+Each JSONL line is {"t": seconds since start, "path": ..., "signature": ..., "body": raw JSON}.
+"""
+import argparse
+import asyncio
+import bisect
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+from test_webhook import create_signature
+
+APPS = {
+    "campaign": ("/webhook/brevo", "BREVO_WEBHOOK_SECRET", "your_webhook_secret_here"),
+    "transactional": ("/webhook/brevo/transactional", "BREVO_TRANSACTIONAL_WEBHOOK_SECRET", "your_transactional_webhook_secret_here"),
+}
+# Recipient domains: a few mailbox providers carry most of the traffic, then a long tail of company domains
+PROVIDERS = [("gmail.com", 0.34), ("yahoo.com", 0.09), ("outlook.com", 0.08), ("hotmail.com", 0.07), ("icloud.com", 0.05), ("orange.fr", 0.03), ("gmx.de", 0.03)]
+COMPANY_DOMAINS = 5000
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    "Microsoft Office/16.0 (Windows NT 10.0; Microsoft Outlook 16.0.17425; Pro)",
+    "Mozilla/5.0 (Windows NT 5.1; rv:11.0) Gecko Firefox/11.0 (via ggpht.com GoogleImageProxy)",
+]
+SOFT_BOUNCES = [("Mailbox full", "452"), ("Mailbox temporarily unavailable", "450"), ("Greylisted, try again later", "451")]
+HARD_BOUNCES = [("Invalid email address", "550"), ("Domain not found", "553"), ("User unknown", "551")]
+TAGS = ["welcome", "password-reset", "receipt", "shipping", "digest"]
+
+
+class Zipf:
+    """Ranks 1..n with P(rank) proportional to rank ** -s, sampled by bisecting cumulative weights"""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(rank ** -s for rank in range(1, n + 1)))
+        self.total = self.cumulative[-1]
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self.cumulative, self.rng.random() * self.total) + 1
+
+
+class Workload:
+    """Event stream of one app, in arrival order: (seconds since start, event, data)"""
+
+    def __init__(self, app: str, args: argparse.Namespace):
+        self.app = app
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.start = datetime.fromisoformat(args.start) if args.start else datetime.now(timezone.utc).replace(microsecond=0)
+        if self.start.tzinfo is None:
+            self.start = self.start.replace(tzinfo=timezone.utc)
+        self.recipients = Zipf(args.recipients, args.recipient_skew, self.rng)
+        self.sources = Zipf(args.campaigns, args.campaign_skew, self.rng)
+        tail = (1 - sum(weight for _, weight in PROVIDERS)) / COMPANY_DOMAINS
+        self.domains = [domain for domain, _ in PROVIDERS] + [f"company{index}.com" for index in range(COMPANY_DOMAINS)]
+        self.domain_weights = list(itertools.accumulate([weight for _, weight in PROVIDERS] + [tail] * COMPANY_DOMAINS))
+        self._pending: List[Tuple[float, int, str, Dict[str, Any], bool]] = []
+        self._sequence = itertools.count()
+        self.messages = 0
+        self.duplicates = 0
+        self.reordered = 0
+
+    def rate(self, t: float) -> float:
+        """Messages per second at t, following the time of day"""
+        moment = self.start + timedelta(seconds=t)
+        hour = moment.hour + moment.minute / 60 + moment.second / 3600
+        return self.args.rate * (1 + self.args.diurnal * math.cos(2 * math.pi * (hour - self.args.peak_hour) / 24))
+
+    def email(self, rank: int) -> str:
+        # The same recipient always lands on the same domain
+        position = (zlib.crc32(str(rank).encode()) / 0xFFFFFFFF) * self.domain_weights[-1]
+        return f"user{rank}@{self.domains[min(bisect.bisect_left(self.domain_weights, position), len(self.domains) - 1)]}"
+
+    def _schedule(self, at: float, event: str, data: Dict[str, Any]):
+        emit = at
+        if self.rng.random() < self.args.reorder:
+            emit += self.rng.uniform(1, self.args.reorder_window)
+            self.reordered += 1
+        data["timestamp"] = (self.start + timedelta(seconds=at)).isoformat()
+        heapq.heappush(self._pending, (emit, next(self._sequence), event, data, False))
+
+    def _later(self, seconds: float) -> float:
+        """Lognormal delay with the given median, for human reactions spread over hours"""
+        return seconds * math.exp(self.rng.gauss(0, 1.2))
+
+    def _message(self, t: float):
+        rng, args = self.rng, self.args
+        self.messages += 1
+        email = self.email(self.recipients.sample())
+        source = self.sources.sample()
+        message_id = f"<{rng.getrandbits(64):016x}.{self.messages}@smtp-relay.mailin.fr>"
+        base: Dict[str, Any] = {"email": email, "message_id": message_id}
+        if self.app == "campaign":
+            base["campaign_id"] = str(source)
+        else:
+            base["template_id"] = f"template_{source:03d}"
+            base["tags"] = [TAGS[source % len(TAGS)]]
+
+        def event(at: float, name: str, **fields):
+            self._schedule(at, name, {**base, **fields})
+
+        if self.app == "transactional":
+            roll = rng.random()
+            if roll < args.p_blocked:
+                return event(t, "blocked", block_reason="Email address is blacklisted", block_type="blacklist")
+            if roll < args.p_blocked + args.p_invalid:
+                return event(t, "invalid_email", error_reason="Invalid email format", error_code="400")
+            if roll < args.p_blocked + args.p_invalid + args.p_error:
+                return event(t, "error", error_message="Template rendering failed", error_code="500")
+            event(t, "sent", subject=f"Your {base['tags'][0]} email")
+
+        t += rng.expovariate(1 / 5)
+        roll = rng.random()
+        if roll < args.p_hard_bounce:
+            reason, code = rng.choice(HARD_BOUNCES)
+            return event(t, "hard_bounced", bounce_reason=reason, error_code=code)
+        if roll < args.p_hard_bounce + args.p_soft_bounce:
+            reason, code = rng.choice(SOFT_BOUNCES)
+            event(t, "soft_bounced", bounce_reason=reason, error_code=code)
+            if rng.random() >= args.p_soft_recovers:
+                return
+            t += rng.expovariate(1 / 1800)
+        event(t, "delivered")
+        delivered = t
+
+        if rng.random() < args.p_spam:
+            event(delivered + self._later(3600), "spam", reason="User marked email as spam")
+        if rng.random() >= args.p_open:
+            return
+        agent, ip = rng.choice(USER_AGENTS), f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        opens = sorted(delivered + self._later(3600) for _ in range(1 + int(rng.expovariate(1 / args.reopens))))
+        if self.app == "transactional":
+            event(opens[0], "first_opening", user_agent=agent, ip_address=ip)
+        for at in opens:
+            event(at, "opened", user_agent=agent, ip_address=ip)
+        if rng.random() < args.p_click:
+            for _ in range(1 + int(rng.expovariate(2))):
+                link = f"https://shop.example.com/{rng.choice(['product', 'cart', 'promo'])}/{rng.randint(1, 500)}"
+                event(rng.choice(opens) + rng.expovariate(1 / 60), "clicked", link_url=link, user_agent=agent, ip_address=ip)
+        if rng.random() < args.p_unsubscribe:
+            unsubscribe = "unsubscribe" if self.app == "campaign" else "unsubscribed"
+            event(opens[0] + rng.expovariate(1 / 120), unsubscribe, unsubscribe_url=f"https://example.com/unsubscribe?token={rng.getrandbits(48):012x}")
+
+    def events(self) -> Iterator[Tuple[float, str, Dict[str, Any]]]:
+        rng, args = self.rng, self.args
+        peak = args.rate * (1 + args.diurnal)
+        next_message = rng.expovariate(peak)
+        emitted = 0
+        while args.events is None or emitted < args.events:
+            # Start messages (thinned Poisson process) until the next pending event is due
+            while next_message <= args.duration and (not self._pending or next_message <= self._pending[0][0]):
+                if rng.random() * peak <= self.rate(next_message):
+                    self._message(next_message)
+                next_message += rng.expovariate(peak)
+            if not self._pending or self._pending[0][0] > args.duration:
+                return
+            emit, _, event, data, duplicate = heapq.heappop(self._pending)
+            if not duplicate and rng.random() < args.duplicates:
+                self.duplicates += 1
+                heapq.heappush(self._pending, (emit + rng.expovariate(1 / 30), next(self._sequence), event, data, True))
+            emitted += 1
+            yield emit, event, data
+
+
+def signed_lines(workload: Workload, secret: str) -> Iterator[Dict[str, Any]]:
+    path = APPS[workload.app][0]
+    for emit, event, data in workload.events():
+        payload = {"event": event, "data": data}
+        yield {
+            "t": round(emit, 3),
+            "path": path,
+            "signature": create_signature(payload, secret),
+            "body": json.dumps(payload, separators=(",", ":")),
+        }
+
+
+def read_lines(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def send(lines: Iterator[Dict[str, Any]], target: str, speed: float, concurrency: int) -> Dict[str, Any]:
+    """POST each line at its offset divided by speed (0 sends as fast as possible), concurrency in flight"""
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=target.rstrip("/"), limits=limits, timeout=30.0) as client:
+
+        async def post(line: Dict[str, Any]):
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    line["path"],
+                    content=line["body"].encode(),
+                    headers={"Content-Type": "application/json", "X-Brevo-Signature": line["signature"]},
+                )
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            finally:
+                latencies.append(time.perf_counter() - started)
+                semaphore.release()
+
+        started = time.perf_counter()
+        for line in lines:
+            if speed > 0:
+                delay = line["t"] / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await semaphore.acquire()
+            task = asyncio.create_task(post(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "sent": count,
+        "seconds": round(elapsed, 2),
+        "per_second": round(count / elapsed, 1) if elapsed else 0.0,
+        "statuses": {str(status): number for status, number in statuses.items()},
+        "p50_ms": round(latencies[count // 2] * 1000, 2) if count else 0.0,
+        "p99_ms": round(latencies[min(count - 1, int(count * 0.99))] * 1000, 2) if count else 0.0,
+    }
+
+
+def summarize(workload: Workload, counts: Counter) -> str:
+    shares = ", ".join(f"{event} {number}" for event, number in counts.most_common())
+    return (
+        f"📦 {sum(counts.values())} {workload.app} events from {workload.messages} messages "
+        f"({workload.duplicates} duplicates, {workload.reordered} late): {shares}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate signed, production-shaped Brevo webhook traffic")
+    parser.add_argument("command", choices=["generate", "send"])
+    parser.add_argument("--app", choices=sorted(APPS), default="campaign")
+    parser.add_argument("--secret", help="signing secret (default: the app's secret from the environment)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="JSONL output of generate (default: stdout)")
+    parser.add_argument("--input", help="JSONL stream to send instead of generating one")
+    parser.add_argument("--target", default="http://localhost:3000", help="base URL of the app for send")
+    parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per wall second; 0 sends flat out")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight for send")
+    shape = parser.add_argument_group("traffic shape")
+    shape.add_argument("--duration", type=float, default=3600, help="simulated seconds")
+    shape.add_argument("--events", type=int, help="stop after this many events")
+    shape.add_argument("--start", help="simulated start time, ISO 8601 (default: now, UTC)")
+    shape.add_argument("--rate", type=float, default=50, help="mean messages started per second")
+    shape.add_argument("--diurnal", type=float, default=0.6, help="amplitude of the daily rate curve, 0..1")
+    shape.add_argument("--peak-hour", type=float, default=14, help="UTC hour of the daily peak")
+    shape.add_argument("--recipients", type=int, default=1_000_000)
+    shape.add_argument("--recipient-skew", type=float, default=0.9, help="Zipf exponent of recipients")
+    shape.add_argument("--campaigns", type=int, default=500, help="campaigns or templates")
+    shape.add_argument("--campaign-skew", type=float, default=1.1, help="Zipf exponent of campaigns/templates")
+    shape.add_argument("--duplicates", type=float, default=0.02, help="share of events delivered twice")
+    shape.add_argument("--reorder", type=float, default=0.01, help="share of events delivered late")
+    shape.add_argument("--reorder-window", type=float, default=300, help="max lateness in seconds")
+    lifecycle = parser.add_argument_group("message lifecycle")
+    lifecycle.add_argument("--p-hard-bounce", type=float, default=0.01)
+    lifecycle.add_argument("--p-soft-bounce", type=float, default=0.03)
+    lifecycle.add_argument("--p-soft-recovers", type=float, default=0.6, help="soft bounces delivered on retry")
+    lifecycle.add_argument("--p-open", type=float, default=0.25)
+    lifecycle.add_argument("--reopens", type=float, default=0.8, help="mean extra opens per opener")
+    lifecycle.add_argument("--p-click", type=float, default=0.15, help="clicks per opener")
+    lifecycle.add_argument("--p-unsubscribe", type=float, default=0.01, help="unsubscribes per opener")
+    lifecycle.add_argument("--p-spam", type=float, default=0.001)
+    lifecycle.add_argument("--p-blocked", type=float, default=0.003, help="transactional only")
+    lifecycle.add_argument("--p-invalid", type=float, default=0.001, help="transactional only")
+    lifecycle.add_argument("--p-error", type=float, default=0.0005, help="transactional only")
+    args = parser.parse_args()
+
+    load_dotenv()
+    _, secret_variable, default_secret = APPS[args.app]
+    secret = args.secret or os.getenv(secret_variable, default_secret)
+    workload = Workload(args.app, args)
+    counts: Counter = Counter()
+
+    def counted(lines: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for line in lines:
+            counts[json.loads(line["body"])["event"]] += 1
+            yield line
+
+    lines = counted(read_lines(args.input) if args.input else signed_lines(workload, secret))
+    if args.command == "generate":
+        out = open(args.out, "w") if args.out else sys.stdout
+        try:
+            for line in lines:
+                out.write(json.dumps(line, separators=(",", ":")) + "\n")
+        finally:
+            if args.out:
+                out.close()
+        print(summarize(workload, counts), file=sys.stderr)
+        return 0
+
+    result = asyncio.run(send(lines, args.target, args.speed, args.concurrency))
+    if not args.input:
+        print(summarize(workload, counts), file=sys.stderr)
+    print(json.dumps(result))
+    return 0 if set(result["statuses"]) <= {"200"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())